@@ -0,0 +1,230 @@
+#!/usr/bin/python
+
+"""
+Sets of (partial) assignments stored as bitmasks.
+
+An assignment to the fields f_0, ..., f_{n-1} is stored as a pair of integers
+(value, care): bit i of 'care' is set iff f_i is assigned, and bit i of 'value'
+is set iff f_i is assigned true. Total assignments have all care bits set and
+their value is the row index of truth_table, so satisfying rows can be stored
+without decoding them.
+
+Filtering by partial assignments looks assignments up in an index keyed by
+the values of the fields assigned by the constraint, converting between field
+orders moves runs of bits at once.
+"""
+
+from truth_table import iter_rows
+from instrumentation import stats
+from itertools import compress, repeat
+from operator import is_not
+
+# bits of the first fields of an assignment, extended as needed
+_BITS = [1 << i for i in range(64)]
+
+def encode_assignment(assignment):
+    """
+    get the (value, care) masks of an assignment (a namedtuple, or any sequence of True/False/None)
+
+    >>> encode_assignment((True, None, False))
+    (1, 5)
+    """
+    while len(_BITS) < len(assignment):
+        _BITS.append(1 << len(_BITS))
+
+    value = sum(compress(_BITS, assignment))
+    if None in assignment:
+        return value, sum(compress(_BITS, map(is_not, assignment, repeat(None))))
+    return value, (1 << len(assignment)) - 1
+
+# values of the 8 fields of every possible byte of a total assignment
+_BYTE_VALUES = [tuple(bool(byte >> bit & 1) for bit in range(8)) for byte in range(256)]
+# values of 8 fields keyed by their value byte | care byte << 8, filled when needed
+_PARTIAL_BYTE_VALUES = {}
+
+def decode_assignment(value, care, n_fields):
+    """
+    get the field values of the masks as tuple, unassigned fields are None
+
+    >>> decode_assignment(1, 5, 3)
+    (True, None, False)
+    """
+    n_bytes = (n_fields + 7) // 8
+    values = ()
+    if care == (1 << n_fields) - 1:
+        for byte in value.to_bytes(n_bytes, 'little'):
+            values += _BYTE_VALUES[byte]
+        return values[:n_fields]
+
+    for value_byte, care_byte in zip(value.to_bytes(n_bytes, 'little'), care.to_bytes(n_bytes, 'little')):
+        key = value_byte | care_byte << 8
+        byte_values = _PARTIAL_BYTE_VALUES.get(key)
+        if byte_values is None:
+            byte_values = _PARTIAL_BYTE_VALUES[key] = tuple(
+                (value_byte >> bit & 1 == 1) if care_byte >> bit & 1 else None for bit in range(8))
+        values += byte_values
+    return values[:n_fields]
+
+def _bit_moves(fields, new_fields):
+    """
+    get the moves of bits from the positions of the fields in 'fields' to their positions in 'new_fields', as
+    pairs (mask, shift) for every run of fields keeping their distance, and the mask of the moved fields in
+    'fields'
+
+    >>> _bit_moves(['a', 'b', 'c', 'd'], ['b', 'c', 'x', 'a'])
+    ([(1, 3), (6, -1)], 7)
+    """
+    positions = {name: i for i, name in enumerate(new_fields)}
+    moves = []
+    moved = 0
+    for i, name in enumerate(fields):
+        if name not in positions:
+            continue
+
+        shift = positions[name] - i
+        if moves and moves[-1][1] == shift and moves[-1][2] == i - 1:
+            moves[-1][0] |= 1 << i
+            moves[-1][2] = i
+        else:
+            moves.append([1 << i, shift, i])
+        moved |= 1 << i
+
+    return [(mask, shift) for mask, shift, _ in moves], moved
+
+def _apply_moves(mask, moves):
+    res = 0
+    for run, shift in moves:
+        res |= (mask & run) << shift if shift >= 0 else (mask & run) >> -shift
+    return res
+
+class AssignmentSet:
+    """
+    set of (partial) assignments to the given fields, stored as (value, care) masks
+
+    >>> s = AssignmentSet.from_assignments([(True, False), (False, True), (True, True)], ['x', 'z'])
+    >>> len(s), (1, 3) in s
+    (3, True)
+    >>> sorted(s.filter(AssignmentSet(['x'], [(1, 1)])).to_assignments())
+    [Assignment(x=True, z=False), Assignment(x=True, z=True)]
+    >>> sorted(s.convert(['z', 'y']).to_assignments())
+    [Assignment(z=False, y=None), Assignment(z=True, y=None)]
+    """
+    def __init__(self, fields, masks=()):
+        self.fields = tuple(fields)
+        self.masks = set(masks)
+        # per care mask of the constraints: dict from the values of the cared fields to the matching masks
+        self._indices = {}
+
+    @classmethod
+    def from_assignments(cls, assignments, fields=None):
+        """
+        get the set of assignments given as namedtuples or sequences of field values, which are ordered by
+        'fields' (the fields of the namedtuples by default)
+        """
+        assignments = iter(assignments)
+        if fields is None:
+            first = next(assignments, None)
+            if first is None:
+                return cls(())
+            fields = first._fields
+            return cls(fields, [encode_assignment(first)] + [encode_assignment(ass) for ass in assignments])
+        return cls(fields, [encode_assignment(ass) for ass in assignments])
+
+    @classmethod
+    def from_table(cls, table, atoms):
+        """
+        get the set of assignments to 'atoms' in the rows set in a truth table
+
+        >>> AssignmentSet.from_table(0b1101, ['a', 'b']).masks == {(0, 3), (2, 3), (3, 3)}
+        True
+        """
+        care = (1 << len(atoms)) - 1
+        return cls(atoms, [(row, care) for row in iter_rows(table, len(atoms))])
+
+    def __len__(self):
+        return len(self.masks)
+
+    def __iter__(self):
+        return iter(self.masks)
+
+    def __contains__(self, masks):
+        return masks in self.masks
+
+    def add(self, masks):
+        self.masks.add(masks)
+        self._indices.clear()
+
+    def to_assignments(self, assignment_type=None):
+        """
+        decode the set to namedtuples of the given type, which need to have the fields of the set in the same
+        order. By default a new type named 'Assignment' is created.
+        """
+        if assignment_type is None:
+            from collections import namedtuple
+            assignment_type = namedtuple('Assignment', self.fields, defaults=(None,) * len(self.fields))
+
+        if stats.enabled:
+            stats.count('assignments_materialized', len(self.masks))
+
+        make = assignment_type._make
+        n_fields = len(self.fields)
+        return {make(decode_assignment(value, care, n_fields)) for value, care in self.masks}
+
+    def convert(self, fields):
+        """
+        get the set of the assignments to the new fields, fields not in this set are unassigned. Assignments
+        which agree on the remaining fields get merged.
+        """
+        if stats.enabled:
+            stats.count('set_operations', len(self.masks))
+
+        fields = tuple(fields)
+        if fields == self.fields:
+            return AssignmentSet(fields, self.masks)
+
+        moves, _ = _bit_moves(self.fields, fields)
+        return AssignmentSet(fields, {(_apply_moves(value, moves), _apply_moves(care, moves))
+                                      for value, care in self.masks})
+
+    def _index(self, care):
+        index = self._indices.get(care)
+        if index is None:
+            index = self._indices[care] = {}
+            for masks in self.masks:
+                if masks[1] & care == care:
+                    index.setdefault(masks[0] & care, []).append(masks)
+        return index
+
+    def filter(self, constraints):
+        """
+        get the subset of the assignments, which have the same values for all fields assigned by one of the
+        constraints (an assignment set). Constraints assigning fields not in this set match nothing.
+        """
+        if constraints.fields != self.fields:
+            _, moved = _bit_moves(constraints.fields, self.fields)
+            constraints = AssignmentSet(constraints.fields, [masks for masks in constraints
+                                                             if masks[1] & ~moved == 0]).convert(self.fields)
+
+        if stats.enabled:
+            stats.count('set_operations', len(constraints) + len(self.masks))
+
+        # constraints sharing their assigned fields are looked up in an index, single ones get tested directly
+        groups = {}
+        for value, care in constraints:
+            groups.setdefault(care, []).append(value)
+
+        res = set()
+        for care, values in groups.items():
+            if len(values) > 1 or care in self._indices:
+                index = self._index(care)
+                for value in values:
+                    res.update(index.get(value, ()))
+            else:
+                value = values[0]
+                res.update(masks for masks in self.masks if masks[1] & care == care and (masks[0] ^ value) & care == 0)
+        return AssignmentSet(self.fields, res)
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,173 @@
+#!/usr/bin/python
+
+"""
+Runs the checks and conversions of ppl-tool on a stream of formulas, optionally
+spread across a pool of worker processes.
+
+Every input line is either a formula or a JSON object with the keys 'formula',
+optionally 'equivalent_to' and 'id'. Every result is a JSON object, results are
+produced in input order.
+"""
+
+import collections
+import itertools
+import json
+import multiprocessing
+
+from instrumentation import stats
+
+# available checks/conversions, named like the options of ppl-tool
+CHECKS = ('is_satisfiable', 'is_valid', 'to_nnf', 'to_dnf', 'to_cnf')
+
+# number of lines sent to a worker at once
+CHUNK_SIZE = 64
+# number of chunks per worker, which may be in flight before the results get consumed
+CHUNKS_IN_FLIGHT = 2
+
+# parser, formatter and the provider of the checks (utils or a formula_cache.FormulaCache) of the current
+# (worker) process
+_parser = None
+_formatter = None
+_api = None
+
+def _init_worker(unicode=True, cache_path=None, collect_stats=False, memory_cache=False):
+    global _parser, _formatter, _api
+
+    if collect_stats:
+        stats.enable()
+
+    import formula_parser
+    import formula_formatter
+
+    _parser = formula_parser.FormulaParser()
+    _formatter = formula_formatter.get_formatter(unicode=unicode)
+
+    if cache_path is None and not memory_cache:
+        import utils
+        _api = utils
+    else:
+        import formula_cache
+        _api = formula_cache.FormulaCache(path=cache_path)
+
+def parse_request(line):
+    """
+    get the request from an input line
+
+    >>> parse_request('a∧b')
+    {'formula': 'a∧b'}
+    >>> parse_request('{"formula": "a", "equivalent_to": "~~a"}')
+    {'formula': 'a', 'equivalent_to': '~~a'}
+    """
+    line = line.strip()
+
+    if line.startswith('{'):
+        request = json.loads(line)
+        if not isinstance(request, dict) or 'formula' not in request:
+            raise ValueError("JSON request without 'formula'")
+        return request
+    else:
+        return {'formula': line}
+
+def run_request(request, checks, equivalent_to=None, minimize=False):
+    """
+    run the given checks on the formula of a request, 'minimize' is passed on to the DNF and CNF conversions
+
+    >>> _init_worker()
+    >>> run_request({'formula': 'a=>b'}, ['is_valid', 'to_cnf'], equivalent_to='~a+b')
+    {'formula': 'a=>b', 'valid': False, 'CNF': '(¬a∨b)', 'equivalent': True}
+    >>> run_request({'formula': '(a*b)+(a*~b)'}, ['to_dnf'], minimize=True)
+    {'formula': '(a∧b)∨(a∧¬b)', 'DNF': 'a'}
+    """
+    result = {'id': request['id']} if 'id' in request else {}
+
+    def format(formula):
+        return stats.timed('format', _formatter.format, formula)
+
+    f = stats.timed('parse', _parser.parse, request['formula'])
+    result['formula'] = format(f)
+
+    if 'is_satisfiable' in checks:
+        result['satisfiable'] = stats.timed('satisfiable', _api.is_satisfiable, f)
+    if 'is_valid' in checks:
+        result['valid'] = stats.timed('valid', _api.is_valid, f)
+    if 'to_nnf' in checks:
+        result['NNF'] = format(stats.timed('NNF', _api.to_NNF, f))
+    if 'to_dnf' in checks:
+        result['DNF'] = format(stats.timed('DNF', _api.to_DNF, f, minimize=minimize))
+    if 'to_cnf' in checks:
+        result['CNF'] = format(stats.timed('CNF', _api.to_CNF, f, minimize=minimize))
+
+    other = request.get('equivalent_to', equivalent_to)
+    if other is not None:
+        other_f = stats.timed('parse', _parser.parse, other)
+        result['equivalent'] = stats.timed('equivalent', _api.are_equivalent, f, other_f)
+
+    return result
+
+def _run_line(line_no, line, checks, equivalent_to, minimize):
+    try:
+        result = run_request(parse_request(line), checks, equivalent_to, minimize)
+    except Exception as e:
+        result = {'error': f"{type(e).__name__}: {e}"}
+
+    return {'line': line_no, **result}
+
+def _run_chunk(chunk, checks, equivalent_to, minimize):
+    return [_run_line(line_no, line, checks, equivalent_to, minimize) for line_no, line in chunk]
+
+# run a chunk in a worker process and hand the stats collected meanwhile over to the main process
+def _run_chunk_in_worker(chunk, checks, equivalent_to, minimize):
+    results = _run_chunk(chunk, checks, equivalent_to, minimize)
+
+    collected = stats.as_dict() if stats.enabled else None
+    stats.reset()
+
+    return results, collected
+
+def run_batch(lines, checks, jobs=1, unicode=True, equivalent_to=None, minimize=False, cache_path=None):
+    """
+    run the checks on every non-empty line and yield the results in input order
+
+    With jobs > 1 the lines are processed by a pool of worker processes, each with its own parser. Input is
+    only read ahead by a bounded number of chunks, so memory stays constant for unbounded streams. If
+    'cache_path' is given, all processes share the results in this database (see formula_cache). If
+    instrumentation is enabled, the stats of the workers get merged into the ones of this process.
+
+    >>> [r.get('valid', r.get('error', '')[:14]) for r in run_batch(['a+~a', '', '(a', 'a'], ['is_valid'])]
+    [True, 'ParseError: ex', False]
+    """
+    numbered = ((line_no, line) for line_no, line in enumerate(lines, 1) if line.strip())
+    chunks = iter(lambda: list(itertools.islice(numbered, CHUNK_SIZE)), [])
+
+    if jobs <= 1:
+        _init_worker(unicode, cache_path)
+        for chunk in chunks:
+            yield from _run_chunk(chunk, checks, equivalent_to, minimize)
+        return
+
+    def collect(pending):
+        results, collected = pending.popleft().get()
+        if collected is not None:
+            stats.merge(collected)
+        return results
+
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(unicode, cache_path, stats.enabled)) as pool:
+        pending = collections.deque()
+
+        for chunk in chunks:
+            pending.append(pool.apply_async(_run_chunk_in_worker, (chunk, checks, equivalent_to, minimize)))
+            if len(pending) >= jobs * CHUNKS_IN_FLIGHT:
+                yield from collect(pending)
+
+        while pending:
+            yield from collect(pending)
+
+def write_results(results, fileobj):
+    for result in results:
+        fileobj.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
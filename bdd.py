@@ -0,0 +1,542 @@
+#!/usr/bin/python
+
+"""
+Reduced ordered binary decision diagrams with complement edges.
+
+A function is an integer edge: 'node << 1 | complemented'. Node 0 is the
+terminal, so the edge TRUE is 0 and FALSE is 1, and negation is 'edge ^ 1'.
+The high edge of a node is never complemented, which makes every function
+representable by exactly one edge: equivalence is a comparison of integers,
+validity and satisfiability are comparisons with the constants.
+"""
+
+from syntax import *
+from traversal import children, fold, iter_nodes
+import weakref
+
+TRUE = 0
+FALSE = 1
+
+# number of entries of the computed table of ite, a power of two
+CACHE_SIZE = 1 << 16
+# sifting stops moving a variable in one direction, once the diagram grew by this factor
+MAX_GROWTH = 1.2
+# number of nodes of the shared manager, above which its garbage is collected before the next check
+NODE_LIMIT = 1 << 20
+
+class BDD:
+    """
+    Manager of a shared ROBDD with a unique table and a lossy computed table for ite
+
+    Variables are identified by their names and tested in the order given by 'order', variables added later
+    get appended to the order. 'reorder' improves the order by sifting.
+
+    >>> bdd = BDD(['a', 'b'])
+    >>> f = bdd.from_formula(Implication(Literal('a'), Literal('b')))
+    >>> f == bdd.from_formula(Or([Literal('a', negated=True), Literal('b')]))
+    True
+    >>> bdd.from_formula(Or([Literal('a'), Literal('a', negated=True)])) == TRUE
+    True
+    >>> bdd.from_formula(And([Literal('a'), False])) == FALSE
+    True
+    >>> bdd.to_formula(f)
+    Or(And(Literal(a), Literal(b)), Literal(!a))
+    >>> bdd.to_DNF(f ^ 1)
+    Or(And(Literal(a), Literal(!b)))
+    """
+    def __init__(self, order=(), cache_size=CACHE_SIZE):
+        # per variable
+        self.names = []
+        self._indices = {}
+        self._levels = []
+        self._nodes_of = []
+        # variables by level
+        self.order = []
+
+        # per node, node 0 is the terminal
+        self._var = [None]
+        self._low = [TRUE]
+        self._high = [TRUE]
+        self._free = []
+
+        self._unique = {}
+        self._cache = [None] * cache_size
+        self._cache_mask = cache_size - 1
+        # edges of already converted formulas, which are hash-consed
+        self._edges = weakref.WeakKeyDictionary()
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        for name in order:
+            self.add_variable(name)
+
+    def add_variable(self, name):
+        """
+        get the index of a variable, which gets added at the bottom of the order if it is new
+        """
+        index = self._indices.get(name)
+
+        if index is None:
+            index = self._indices[name] = len(self.names)
+            self.names.append(name)
+            self._levels.append(len(self.order))
+            self._nodes_of.append(set())
+            self.order.append(index)
+
+        return index
+
+    def var(self, name):
+        """
+        get the function of a single variable
+        """
+        return self._mk(self.add_variable(name), FALSE, TRUE)
+
+    def __len__(self):
+        return len(self._unique)
+
+    def _level(self, edge):
+        node = edge >> 1
+        return self._levels[self._var[node]] if node else len(self.order)
+
+    def _mk(self, var, low, high):
+        if low == high:
+            return low
+
+        # keep the high edge regular
+        complemented = high & 1
+        if complemented:
+            low ^= 1
+            high ^= 1
+
+        key = (var, low, high)
+        node = self._unique.get(key)
+
+        if node is None:
+            if self._free:
+                node = self._free.pop()
+                self._var[node] = var
+                self._low[node] = low
+                self._high[node] = high
+            else:
+                node = len(self._var)
+                self._var.append(var)
+                self._low.append(low)
+                self._high.append(high)
+            self._unique[key] = node
+            self._nodes_of[var].add(node)
+
+        return node << 1 | complemented
+
+    def _cofactors(self, edge, level):
+        # the cofactors of edge wrt. the variable at the given level, edge is independent of deeper variables
+        node = edge >> 1
+        if node and self._levels[self._var[node]] == level:
+            complemented = edge & 1
+            return self._low[node] ^ complemented, self._high[node] ^ complemented
+        return edge, edge
+
+    # normalize the arguments of ite, returns either (result, None) or the standard triple and the sign
+    def _ite_normalize(self, f, g, h):
+        if f == TRUE or g == h:
+            return g, None
+        elif f == FALSE:
+            return h, None
+
+        if g == f:
+            g = TRUE
+        elif g == f ^ 1:
+            g = FALSE
+        if h == f:
+            h = FALSE
+        elif h == f ^ 1:
+            h = TRUE
+
+        if g == h:
+            return g, None
+        elif g == TRUE and h == FALSE:
+            return f, None
+        elif g == FALSE and h == TRUE:
+            return f ^ 1, None
+
+        # ite(~f, g, h) = ite(f, h, g) and ite(f, ~g, ~h) = ~ite(f, g, h)
+        if f & 1:
+            f, g, h = f ^ 1, h, g
+        sign = g & 1
+
+        return (f, g ^ sign, h ^ sign), sign
+
+    def ite(self, f, g, h):
+        """
+        get the function 'if f then g else h'
+
+        >>> bdd = BDD(['a', 'b'])
+        >>> a, b = bdd.var('a'), bdd.var('b')
+        >>> bdd.ite(a, b, FALSE) == bdd.ite(b, a, FALSE)
+        True
+        >>> bdd.ite(a, b ^ 1, b) == bdd.ite(b, a ^ 1, a)
+        True
+        """
+        cache = self._cache
+        mask = self._cache_mask
+
+        results = []
+        # frames are either the arguments of a call, or the combination of the results of both cofactors
+        stack = [(f, g, h, None, None)]
+
+        while stack:
+            f, g, h, var, sign = stack.pop()
+
+            if var is not None:
+                low = results.pop()
+                high = results.pop()
+                result = self._mk(var, low, high)
+                cache[hash((f, g, h)) & mask] = (f, g, h, result)
+                results.append(result ^ sign)
+                continue
+
+            args, sign = self._ite_normalize(f, g, h)
+            if sign is None:
+                results.append(args)
+                continue
+
+            f, g, h = args
+            entry = cache[hash(args) & mask]
+            if entry is not None and entry[0] == f and entry[1] == g and entry[2] == h:
+                self.cache_hits += 1
+                results.append(entry[3] ^ sign)
+                continue
+            self.cache_misses += 1
+
+            level = min(self._level(f), self._level(g), self._level(h))
+            f_low, f_high = self._cofactors(f, level)
+            g_low, g_high = self._cofactors(g, level)
+            h_low, h_high = self._cofactors(h, level)
+
+            stack.append((f, g, h, self.order[level], sign))
+            stack.append((f_low, g_low, h_low, None, None))
+            stack.append((f_high, g_high, h_high, None, None))
+
+        return results[0]
+
+    def apply_and(self, f, g):
+        return self.ite(f, g, FALSE)
+
+    def apply_or(self, f, g):
+        return self.ite(f, TRUE, g)
+
+    def apply_xor(self, f, g):
+        return self.ite(f, g ^ 1, g)
+
+    def from_formula(self, formula):
+        """
+        get the function of a formula. Edges of formula nodes are remembered, so subformulas shared between
+        formulas get built only once.
+        """
+        edges = self._edges
+
+        def combine(node, results):
+            # constants are the terminal edges, bools can not be keys of the weak dictionary
+            if type(node) == bool:
+                return TRUE if node else FALSE
+
+            edge = edges.get(node)
+            if edge is not None:
+                return edge
+
+            if type(node) == Literal:
+                edge = self.var(node.name) ^ node.negated
+            elif type(node) == And:
+                edge = TRUE
+                for child in results:
+                    edge = self.apply_and(edge, child)
+            elif type(node) == Or:
+                edge = FALSE
+                for child in results:
+                    edge = self.apply_or(edge, child)
+            elif type(node) == Negation:
+                edge = results[0] ^ 1
+            elif type(node) == Implication:
+                edge = self.ite(results[0], results[1], TRUE)
+            else:
+                edge = self.ite(results[0], results[1], results[1] ^ 1)
+
+            edges[node] = edge
+            return edge
+
+        return fold(formula, combine, lambda node: () if type(node) == bool or node in edges else children(node))
+
+    # regular children of a node
+    def _node_children(self, node):
+        return (self._low[node] >> 1, self._high[node] >> 1) if node else ()
+
+    def nodes(self, roots):
+        """
+        get the set of the nodes reachable from the given edges, including the terminal
+        """
+        res = set()
+        for root in roots:
+            if root >> 1 not in res:
+                res.update(iter_nodes(root >> 1, self._node_children))
+        return res
+
+    def size(self, roots):
+        """
+        get the number of inner nodes of the diagram of the given edges
+
+        >>> bdd = BDD(['a', 'b', 'c'])
+        >>> bdd.size([bdd.from_formula(Or([And([Literal('a'), Literal('b')]), Literal('c')]))])
+        3
+        """
+        return len(self.nodes(roots)) - 1
+
+    def iter_cubes(self, edge):
+        """
+        iterate over the paths to TRUE as cubes (value, care) over the indices of the variables (see
+        minimize), the cubes are pairwise disjoint
+
+        >>> bdd = BDD(['a', 'b'])
+        >>> sorted(bdd.iter_cubes(bdd.apply_or(bdd.var('a'), bdd.var('b'))))
+        [(1, 1), (2, 3)]
+        """
+        stack = [(edge, 0, 0)]
+
+        while stack:
+            edge, value, care = stack.pop()
+            node = edge >> 1
+
+            if not node:
+                if edge == TRUE:
+                    yield value, care
+                continue
+
+            bit = 1 << self._var[node]
+            complemented = edge & 1
+            stack.append((self._low[node] ^ complemented, value, care | bit))
+            stack.append((self._high[node] ^ complemented, value | bit, care | bit))
+
+    def _cube_literals(self, cube):
+        value, care = cube
+        return [Literal(self.names[var], negated=not value >> var & 1)
+                for var in self.order if care >> var & 1]
+
+    def to_DNF(self, edge):
+        """
+        get a DNF of a function with one term per path to TRUE
+        """
+        return Or([And(self._cube_literals(cube)) for cube in self.iter_cubes(edge)])
+
+    def to_formula(self, edge):
+        """
+        get a formula of a function, which shares subformulas like the diagram shares nodes. Constant functions
+        are the empty conjunction (TRUE) and the empty disjunction (FALSE).
+
+        >>> bdd = BDD(['a', 'b'])
+        >>> bdd.to_formula(bdd.apply_xor(bdd.var('a'), bdd.var('b')))
+        Or(And(Literal(a), Literal(!b)), And(Literal(!a), Literal(b)))
+        """
+        def edge_children(edge):
+            node = edge >> 1
+            if not node:
+                return ()
+            return (self._high[node] ^ edge & 1, self._low[node] ^ edge & 1)
+
+        def combine(edge, results):
+            if edge == TRUE:
+                return And([])
+            elif edge == FALSE:
+                return Or([])
+
+            name = self.names[self._var[edge >> 1]]
+            terms = []
+            for (child, sub), negated in zip(zip(edge_children(edge), results), (False, True)):
+                if child == TRUE:
+                    terms.append(Literal(name, negated))
+                elif child != FALSE:
+                    terms.append(And([Literal(name, negated), sub]))
+
+            return terms[0] if len(terms) == 1 else Or(terms)
+
+        return fold(edge, combine, edge_children)
+
+    def collect_garbage(self, roots=()):
+        """
+        free all nodes, which are not reachable from 'roots' or from the edges of converted formulas, which
+        are still alive. Other edges must not be used afterwards.
+        """
+        live = self.nodes(list(roots) + list(self._edges.values()))
+
+        for node in range(1, len(self._var)):
+            var = self._var[node]
+            if var is not None and node not in live:
+                del self._unique[(var, self._low[node], self._high[node])]
+                self._nodes_of[var].discard(node)
+                self._var[node] = None
+                self._free.append(node)
+
+        self._cache = [None] * len(self._cache)
+
+    def clear(self):
+        """
+        free all nodes, the computed table and the edges of converted formulas, the variables keep their order.
+        Edges must not be used afterwards.
+
+        >>> bdd = BDD(['a', 'b'])
+        >>> f = bdd.from_formula(And([Literal('a'), Literal('b')]))
+        >>> len(bdd), bdd.clear(), len(bdd), bdd.order
+        (3, None, 0, [0, 1])
+        >>> bdd.from_formula(And([Literal('a'), Literal('b')])) == bdd.apply_and(bdd.var('a'), bdd.var('b'))
+        True
+        """
+        self._var = [None]
+        self._low = [TRUE]
+        self._high = [TRUE]
+        self._free = []
+        self._nodes_of = [set() for _ in self.names]
+
+        self._unique = {}
+        self._cache = [None] * len(self._cache)
+        self._edges = weakref.WeakKeyDictionary()
+
+    def _swap(self, level):
+        # exchange the variables at 'level' and 'level + 1' in place, every node keeps its function
+        x, y = self.order[level], self.order[level + 1]
+        var = self._var
+        low_of = self._low
+        high_of = self._high
+
+        for node in list(self._nodes_of[x]):
+            low, high = low_of[node], high_of[node]
+            if var[low >> 1] != y and var[high >> 1] != y:
+                continue
+
+            low_low, low_high = self._cofactors(low, level + 1)
+            high_low, high_high = self._cofactors(high, level + 1)
+
+            new_low = self._mk(x, low_low, high_low)
+            new_high = self._mk(x, low_high, high_high)
+
+            del self._unique[(x, low, high)]
+            self._nodes_of[x].discard(node)
+            var[node], low_of[node], high_of[node] = y, new_low, new_high
+            self._unique[(y, new_low, new_high)] = node
+            self._nodes_of[y].add(node)
+
+        self.order[level], self.order[level + 1] = y, x
+        self._levels[x], self._levels[y] = level + 1, level
+
+    def reorder(self, roots, max_growth=MAX_GROWTH):
+        """
+        improve the variable order for the given edges by sifting: every variable in turn is moved through all
+        levels and left at the one, where the diagram is smallest. Unreachable nodes are freed first (see
+        collect_garbage). Returns the new size.
+
+        >>> bdd = BDD(['a1', 'a2', 'b1', 'b2'])
+        >>> f = bdd.from_formula(And([Equivalence(Literal('a1'), Literal('b1')), Equivalence(Literal('a2'), Literal('b2'))]))
+        >>> bdd.size([f])
+        8
+        >>> bdd.reorder([f])
+        5
+        >>> [bdd.names[var] for var in bdd.order]
+        ['a1', 'b1', 'a2', 'b2']
+        >>> f == bdd.from_formula(And([Equivalence(Literal('b2'), Literal('a2')), Equivalence(Literal('b1'), Literal('a1'))]))
+        True
+        """
+        roots = list(roots) + list(self._edges.values())
+        self.collect_garbage(roots)
+
+        counts = [0] * len(self.names)
+        for node in self.nodes(roots):
+            if node:
+                counts[self._var[node]] += 1
+
+        best_size = self.size(roots)
+        last = len(self.order) - 1
+
+        for x in sorted(range(len(self.names)), key=counts.__getitem__, reverse=True):
+            best_level = start = self._levels[x]
+
+            # visit the nearer end first
+            ends = (last, 0) if last - start < start else (0, last)
+            for end in ends:
+                step = 1 if end > self._levels[x] else -1
+                limit = best_size * max_growth
+                while self._levels[x] != end:
+                    level = self._levels[x]
+                    self._swap(level if step > 0 else level - 1)
+                    size = self.size(roots)
+                    if size < best_size:
+                        best_size, best_level = size, self._levels[x]
+                    elif size > limit:
+                        break
+
+            while self._levels[x] < best_level:
+                self._swap(self._levels[x])
+            while self._levels[x] > best_level:
+                self._swap(self._levels[x] - 1)
+
+        self.collect_garbage(roots)
+
+        return best_size
+
+# manager shared by the checks below, so repeated queries on related formulas reuse its tables
+_manager = None
+
+def default_manager():
+    """
+    get the manager shared by the checks. Once it holds more than NODE_LIMIT nodes, the nodes of formulas,
+    which are no longer alive, are freed, and if that does not halve it, all of them.
+    """
+    global _manager
+
+    if _manager is None:
+        _manager = BDD()
+    elif len(_manager) > NODE_LIMIT:
+        _manager.collect_garbage()
+        if len(_manager) > NODE_LIMIT // 2:
+            _manager.clear()
+    return _manager
+
+def reset():
+    """
+    drop the shared manager with all its nodes
+    """
+    global _manager
+
+    _manager = None
+
+def is_satisfiable(formula, manager=None):
+    """
+    check if a formula is satisfiable using a BDD
+
+    >>> is_satisfiable(And([Literal('x'), Literal('x', negated=True)]))
+    False
+    """
+    manager = default_manager() if manager is None else manager
+    return manager.from_formula(formula) != FALSE
+
+def is_valid(formula, manager=None):
+    """
+    check if a formula is valid using a BDD
+
+    >>> is_valid(Or([Literal('x'), Negation(Literal('x'))]))
+    True
+    """
+    manager = default_manager() if manager is None else manager
+    return manager.from_formula(formula) == TRUE
+
+def are_equivalent(formula1, formula2, manager=None):
+    """
+    check if two formulas are equivalent using a BDD
+
+    >>> are_equivalent(Implication(Literal('a'), Literal('b')), Implication(Negation(Literal('b')), Negation(Literal('a'))))
+    True
+    """
+    manager = default_manager() if manager is None else manager
+    return manager.from_formula(formula1) == manager.from_formula(formula2)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
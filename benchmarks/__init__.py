@@ -0,0 +1,7 @@
+"""
+Benchmarks of the formula tools on standard formula families.
+
+Run from the root of the repository with 'python -m benchmarks', see
+'python -m benchmarks --help' for the size sweep, the JSON output and the
+comparison against a baseline.
+"""
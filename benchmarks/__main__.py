@@ -0,0 +1,31 @@
+import argparse
+import sys
+
+from benchmarks.families import FAMILIES
+from benchmarks import runner
+
+arg_parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Benchmark the formula tools on standard formula families")
+arg_parser.add_argument('--families', nargs='+', choices=sorted(FAMILIES), help="families to run (default: all)")
+arg_parser.add_argument('--operations', nargs='+', choices=runner.OPERATIONS, default=runner.OPERATIONS, help="operations to time (default: all)")
+arg_parser.add_argument('--sizes', nargs='+', type=int, help="sizes to sweep instead of the defaults of the families")
+arg_parser.add_argument('--repeat', type=int, default=3, help="number of timed repetitions, the fastest one counts")
+arg_parser.add_argument('--output', '-o', metavar="FILE", help="write the results as JSON to FILE")
+arg_parser.add_argument('--baseline', metavar="FILE", help="compare against the results in FILE and fail on regressions")
+arg_parser.add_argument('--time-threshold', type=float, default=runner.TIME_THRESHOLD, help="relative slowdown counting as regression")
+arg_parser.add_argument('--memory-threshold', type=float, default=runner.MEMORY_THRESHOLD, help="relative growth of peak memory counting as regression")
+args = arg_parser.parse_args()
+
+def progress(record):
+    print(f"{record['family']:>18} {record['size']:>6} {record['operation']:>15} {record['seconds']:12.6f}s {record['peak_bytes'] / 1024:12.1f}KiB")
+
+records = runner.run_suite(args.families, args.operations, args.sizes, args.repeat, progress)
+
+if args.output:
+    runner.save_results(records, args.output)
+
+if args.baseline:
+    regressions = runner.compare(records, runner.load_results(args.baseline), args.time_threshold, args.memory_threshold)
+    for record, metric, old, value in regressions:
+        print(f"regression: {record['family']} {record['size']} {record['operation']} {metric}: {old:g} -> {value:g}")
+    if regressions:
+        sys.exit(1)
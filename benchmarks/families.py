@@ -0,0 +1,99 @@
+#!/usr/bin/python
+
+"""
+Seeded generators of standard formula families, each taking a size parameter.
+"""
+
+from syntax import *
+import random
+
+# clause/variable ratio of the satisfiability phase transition of random 3-CNF
+PHASE_TRANSITION_RATIO = 4.26
+
+def random_kcnf(n_vars, k=3, ratio=PHASE_TRANSITION_RATIO, seed=0):
+    """
+    get a random k-CNF with round(ratio * n_vars) clauses of k distinct variables each
+
+    >>> cnf = random_kcnf(10, seed=1)
+    >>> len(cnf.children), {len(clause.children) for clause in cnf.children}
+    (43, {3})
+    >>> cnf is random_kcnf(10, seed=1)
+    True
+    """
+    rng = random.Random(seed)
+
+    return And([Or([Literal('x%d' % var, negated=rng.random() < 0.5) for var in rng.sample(range(n_vars), k)])
+                for _ in range(round(ratio * n_vars))])
+
+def pigeonhole(n_holes):
+    """
+    get the (unsatisfiable) statement, that n_holes + 1 pigeons sit in n_holes holes without sharing one
+
+    >>> pigeonhole(1)
+    And(Or(Literal(p0_0)), Or(Literal(p1_0)), Or(Literal(!p0_0), Literal(!p1_0)))
+    """
+    pigeons = range(n_holes + 1)
+    holes = range(n_holes)
+
+    every_pigeon_sits = [Or([Literal('p%d_%d' % (pigeon, hole)) for hole in holes]) for pigeon in pigeons]
+    no_hole_shared = [Or([Literal('p%d_%d' % (pigeon, hole), negated=True), Literal('p%d_%d' % (other, hole), negated=True)])
+                      for hole in holes for pigeon in pigeons for other in pigeons if pigeon < other]
+
+    return And(every_pigeon_sits + no_hole_shared)
+
+def parity_chain(n_vars):
+    """
+    get a chain of exclusive ors over n_vars variables, which is true iff an odd number of them is true
+
+    >>> parity_chain(3)
+    Negation(Equivalence(Negation(Equivalence(Literal(x0), Literal(x1))), Literal(x2)))
+    """
+    formula = Literal('x0')
+    for var in range(1, n_vars):
+        formula = Negation(Equivalence(formula, Literal('x%d' % var)))
+
+    return formula
+
+def implication_chain(depth):
+    """
+    get the right-nested implication x0=>(x1=>(...=>x<depth>))
+
+    >>> implication_chain(2)
+    Implication(Literal(x0), Implication(Literal(x1), Literal(x2)))
+    """
+    formula = Literal('x%d' % depth)
+    for var in reversed(range(depth)):
+        formula = Implication(Literal('x%d' % var), formula)
+
+    return formula
+
+def equivalence_tree(n_leaves, seed=0):
+    """
+    get a balanced tree of equivalences over n_leaves randomly negated variables
+
+    >>> equivalence_tree(3)
+    Equivalence(Literal(x0), Equivalence(Literal(x1), Literal(!x2)))
+    """
+    rng = random.Random(seed)
+    level = [Literal('x%d' % var, negated=rng.random() < 0.5) for var in range(n_leaves)]
+
+    while len(level) > 1:
+        paired = [Equivalence(level[i], level[i + 1]) for i in range(len(level) % 2, len(level) - 1, 2)]
+        level = level[:len(level) % 2] + paired
+
+    return level[0]
+
+# generators by name and the default sizes of their sweeps
+FAMILIES = {
+    'random_kcnf': (random_kcnf, (10, 20, 40, 80)),
+    'pigeonhole': (pigeonhole, (3, 4, 5, 6)),
+    'parity_chain': (parity_chain, (8, 12, 16, 64)),
+    'implication_chain': (implication_chain, (10, 100, 1000, 10000)),
+    'equivalence_tree': (equivalence_tree, (8, 12, 16, 256)),
+}
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
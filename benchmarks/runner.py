@@ -0,0 +1,170 @@
+#!/usr/bin/python
+
+"""
+Times the operations of the formula tools on the formula families and compares
+the results against a baseline.
+
+Results are lists of records {'family', 'size', 'operation', 'seconds',
+'peak_bytes'}: 'seconds' is the fastest of several repetitions, 'peak_bytes'
+the peak of the memory allocated by python during one more run.
+"""
+
+import gc
+import json
+import platform
+import time
+import tracemalloc
+
+from benchmarks.families import FAMILIES
+
+# conversions via truth tables are skipped for formulas with more atoms than this
+TRUTH_TABLE_LIMIT = 14
+# relative slowdown and memory growth, which count as regression by default
+TIME_THRESHOLD = 0.25
+MEMORY_THRESHOLD = 0.25
+# results faster than this are never reported as regression, their timings are too noisy
+MIN_SECONDS = 0.001
+
+def _letters(index):
+    """
+    get a name of letters only for an index, the parser does not accept other characters in atoms
+
+    >>> [_letters(i) for i in (0, 25, 26, 27 * 26)]
+    ['a', 'z', 'aa', 'aaa']
+    """
+    name = ''
+    index += 1
+    while index:
+        index, digit = divmod(index - 1, 26)
+        name = chr(ord('a') + digit) + name
+    return name
+
+# the input of every operation is prepared once: parsing gets the formatted text, all others the formula
+def _operations():
+    import formula_cache
+    import formula_formatter
+    import formula_parser
+    import utils
+
+    parser = formula_parser.FormulaParser()
+    formatter = formula_formatter.get_formatter(unicode=False)
+
+    def parser_input(formula):
+        atoms = sorted(utils.get_atoms(formula))
+        return formatter.format(formula_cache.rename_atoms(formula, {name: _letters(i) for i, name in enumerate(atoms)}))
+
+    return {
+        'parse': (parser_input, parser.parse),
+        'format': (None, formatter.format),
+        'to_NNF': (None, utils.to_NNF),
+        'tseitsin': (None, utils.tseitsin),
+        'to_CNF': (None, utils.to_CNF),
+        'to_DNF': (None, utils.to_DNF),
+        'is_satisfiable': (None, utils.is_satisfiable),
+    }
+
+OPERATIONS = ('parse', 'format', 'to_NNF', 'tseitsin', 'to_CNF', 'to_DNF', 'is_satisfiable')
+
+def measure(function, argument, repeat=3):
+    """
+    get the fastest wall time of 'repeat' calls and the peak memory of one more call
+
+    >>> seconds, peak_bytes = measure(sorted, list(range(1000)))
+    >>> seconds > 0 and peak_bytes >= 8000
+    True
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(times), peak
+
+def run_suite(families=None, operations=OPERATIONS, sizes=None, repeat=3, progress=None):
+    """
+    measure the operations on all families over their sizes (or the given ones) and return the records
+
+    >>> [(r['family'], r['size'], r['operation']) for r in run_suite(['pigeonhole'], ['to_NNF'], sizes=[2], repeat=1)]
+    [('pigeonhole', 2, 'to_NNF')]
+    """
+    import utils
+
+    available = _operations()
+    records = []
+
+    for family in families or FAMILIES:
+        generate, default_sizes = FAMILIES[family]
+
+        for size in sizes or default_sizes:
+            formula = generate(size)
+            n_atoms = len(utils.get_atoms(formula))
+
+            for operation in operations:
+                if operation in ('to_CNF', 'to_DNF') and n_atoms > TRUTH_TABLE_LIMIT:
+                    continue
+
+                prepare, function = available[operation]
+                seconds, peak_bytes = measure(function, formula if prepare is None else prepare(formula), repeat)
+
+                record = {'family': family, 'size': size, 'operation': operation,
+                          'seconds': seconds, 'peak_bytes': peak_bytes}
+                records.append(record)
+                if progress is not None:
+                    progress(record)
+
+    return records
+
+def save_results(records, path):
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': records,
+    }
+    with open(path, 'w', encoding='utf-8') as outfile:
+        json.dump(report, outfile, indent=1)
+
+def load_results(path):
+    with open(path, encoding='utf-8') as infile:
+        return json.load(infile)['results']
+
+def compare(records, baseline, time_threshold=TIME_THRESHOLD, memory_threshold=MEMORY_THRESHOLD):
+    """
+    get the regressions of the records wrt. the baseline: tuples (record, metric, baseline value, value) for
+    every metric, which grew by more than its threshold. Records missing in the baseline are ignored.
+
+    >>> base = [{'family': 'f', 'size': 1, 'operation': 'op', 'seconds': 0.5, 'peak_bytes': 1000}]
+    >>> new = [{'family': 'f', 'size': 1, 'operation': 'op', 'seconds': 0.55, 'peak_bytes': 2000}]
+    >>> [(metric, old, value) for _, metric, old, value in compare(new, base)]
+    [('peak_bytes', 1000, 2000)]
+    """
+    previous = {(r['family'], r['size'], r['operation']): r for r in baseline}
+    regressions = []
+
+    for record in records:
+        old = previous.get((record['family'], record['size'], record['operation']))
+        if old is None:
+            continue
+
+        if record['seconds'] >= MIN_SECONDS and record['seconds'] > old['seconds'] * (1 + time_threshold):
+            regressions.append((record, 'seconds', old['seconds'], record['seconds']))
+        if record['peak_bytes'] > old['peak_bytes'] * (1 + memory_threshold):
+            regressions.append((record, 'peak_bytes', old['peak_bytes'], record['peak_bytes']))
+
+    return regressions
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,494 @@
+#!/usr/bin/python
+
+"""
+Integer representation of clauses: atoms get interned into a variable table and
+literals are stored as signed integers like in the DIMACS format.
+"""
+
+from syntax import *
+from traversal import children, fold, iter_nodes
+from array import array
+import collections
+
+class VariableTable:
+    """
+    maps atom names to the variables 1..n and back
+
+    >>> variables = VariableTable(['a', 'b'])
+    >>> variables.literal(Literal('b', negated=True))
+    -2
+    >>> variables.to_literal(1)
+    Literal(a)
+    """
+    def __init__(self, names=()):
+        self.names = [None]
+        self.indices = {}
+
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names) - 1
+
+    def __contains__(self, name):
+        return name in self.indices
+
+    def add(self, name):
+        """
+        get the variable of the given atom, allocating a new one if necessary
+        """
+        index = self.indices.get(name)
+        if index is None:
+            index = len(self.names)
+            self.names.append(name)
+            self.indices[name] = index
+        return index
+
+    def new_variable(self, name=None):
+        """
+        allocate a new variable, helper variables do not need a name
+        """
+        if name in self.indices:
+            raise ValueError(f"variable '{name}' already exists")
+
+        index = len(self.names)
+        self.names.append(name)
+        if name is not None:
+            self.indices[name] = index
+        return index
+
+    def literal(self, literal):
+        index = self.add(literal.name)
+        return -index if literal.negated else index
+
+    def to_literal(self, lit):
+        return Literal(self.names[abs(lit)], negated=(lit < 0))
+
+    def to_assignment(self, model, assignment_type):
+        """
+        convert a model (a sequence of truth values indexed by variable) to an assignment of the given type,
+        atoms not known to the table stay unassigned
+        """
+        return assignment_type(**{name: bool(model[self.indices[name]])
+                                  for name in assignment_type._fields if name in self.indices})
+
+class ClauseStore:
+    """
+    compact storage of integer clauses: the literals of all clauses are kept in one array, every clause
+    terminated by 0 like in DIMACS, together with the offsets at which the clauses start
+
+    >>> store = ClauseStore([[1, -2], [], [3]])
+    >>> len(store), store.n_vars
+    (3, 3)
+    >>> [list(clause) for clause in store]
+    [[1, -2], [], [3]]
+    >>> store.literals
+    array('i', [1, -2, 0, 0, 3, 0])
+    """
+    def __init__(self, clauses=()):
+        self.literals = array('i')
+        self.offsets = array('q', [0])
+        self.n_vars = 0
+
+        self.extend(clauses)
+
+    @classmethod
+    def from_arrays(cls, literals, offsets, n_vars):
+        """
+        get a store using the given arrays (or memoryviews) of 0-terminated literals and clause offsets
+        """
+        store = cls()
+        store.literals = literals
+        store.offsets = offsets
+        store.n_vars = n_vars
+        return store
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        return self.literals[self.offsets[index]:self.offsets[index + 1] - 1]
+
+    def __iter__(self):
+        literals, offsets = self.literals, self.offsets
+        for index in range(len(offsets) - 1):
+            yield literals[offsets[index]:offsets[index + 1] - 1]
+
+    def append(self, clause):
+        self.literals.extend(clause)
+        self.literals.append(0)
+        self.offsets.append(len(self.literals))
+
+        if clause:
+            self.n_vars = max(self.n_vars, max(map(abs, clause)))
+
+    def extend(self, clauses):
+        for clause in clauses:
+            self.append(clause)
+
+    def extend_terminated(self, literals, ends=None, n_vars=None):
+        """
+        append an array of 0-terminated clauses, the last clause may be continued by the next call. The ends
+        of the clauses (the positions behind their zeros) and the largest variable get computed, unless given.
+        """
+        base = len(self.literals)
+        self.literals.extend(literals)
+
+        if ends is None:
+            ends = array('q')
+            end = 0
+            try:
+                while True:
+                    end = literals.index(0, end) + 1
+                    ends.append(end)
+            except ValueError:
+                pass
+        self.offsets.extend(base + end for end in ends)
+
+        if n_vars is None:
+            n_vars = max(max(literals), -min(literals)) if literals else 0
+        self.n_vars = max(self.n_vars, n_vars)
+
+    def close(self):
+        """
+        terminate an unfinished last clause
+        """
+        if len(self.literals) > self.offsets[-1]:
+            self.append(())
+
+# polarities of subformulas: a definition of a helper variable in positive polarity implies the subformula,
+# in negative polarity it is implied by the subformula
+POSITIVE = 1
+NEGATIVE = 2
+BOTH = POSITIVE | NEGATIVE
+
+def _swap(polarity):
+    return (polarity & POSITIVE) << 1 | (polarity & NEGATIVE) >> 1
+
+class TseitinEncoder:
+    """
+    Tseitsin encoding of formulas to integer clauses
+
+    Every distinct subformula gets at most one helper variable: nodes are hash-consed and gates are hashed by
+    their inputs, so e.g. a∧b, b∧a and ¬(¬a∨¬b) share a helper. Nested conjunctions and disjunctions get
+    flattened, negations only flip the sign of literals. In polarity-aware mode (Plaisted-Greenbaum), helpers
+    are only defined in the directions, which the polarity of their occurrences requires.
+
+    The clauses are appended to 'clauses' (anything with an 'append' method, a list by default). Helper
+    variables are allocated in 'variables', named by 'helper_name_format' if given.
+
+    >>> encoder = TseitinEncoder(helper_name_format='t%d')
+    >>> encoder.add(Or([And([Literal('a'), Literal('b')]), Negation(Or([Literal('b', negated=True), Literal('a', negated=True)]))]))
+    >>> encoder.clauses
+    [[-3, 1], [-3, 2], [3, -1, -2], [3]]
+    >>> encoder.variables.names
+    [None, 'a', 'b', 't0']
+    >>> encoder = TseitinEncoder(helper_name_format='x_%d')
+    >>> encoder.add(Or([And([Literal('x_1'), Literal('b')]), Literal('c')]))
+    >>> encoder.add(Or([And([Literal('x_1'), Literal('c')]), Literal('b')]))
+    >>> encoder.variables.names
+    [None, 'x_1', 'b', 'c', 'x_0', 'x_2']
+    >>> encoder = TseitinEncoder(polarity_aware=True)
+    >>> encoder.add(Or([And([Literal('a'), Literal('b')]), Literal('c')]))
+    >>> encoder.clauses
+    [[-4, 1], [-4, 2], [4, 3]]
+    >>> encoder.encode(Negation(And([Literal('b'), Literal('a')])))
+    -4
+    >>> encoder.clauses[3:]
+    [[4, -2, -1]]
+
+    Nodes encoded again by later calls keep their helpers and only get the clauses of the missing polarity:
+
+    >>> encoder = TseitinEncoder(polarity_aware=True)
+    >>> a, b, c = Literal('a'), Literal('b'), Literal('c')
+    >>> encoder.add(Or([And([And([a, b]), c]), Literal('d')]))
+    >>> encoder.add(Or([And([a, b]), Literal('e')]))
+    >>> encoder.add(Or([Negation(And([And([a, b]), c])), Literal('f')]))
+    >>> encoder.clauses
+    [[-5, 1], [-5, 2], [-5, 3], [5, 4], [-7, 1], [-7, 2], [7, 6], [5, -1, -2, -3], [-5, 8]]
+    """
+    def __init__(self, variables=None, clauses=None, polarity_aware=False, helper_name_format=None):
+        self.variables = VariableTable() if variables is None else variables
+        self.clauses = [] if clauses is None else clauses
+        self.polarity_aware = polarity_aware
+        self.helper_name_format = helper_name_format
+        self.n_helpers = 0
+
+        # helper variable, which is always true
+        self._true = None
+        # literals of the encoded nodes and the polarities they are encoded in
+        self._literals = {}
+        self._polarities = {}
+        # inputs of the encoded nodes: flattening depends on the nodes encoded so far, so a node encoded again in
+        # another polarity must keep its first inputs to get the missing clauses for the same helper
+        self._node_inputs = {}
+        # helper variables of gates keyed by their normalized inputs, and the polarities they are defined in
+        self._gates = {}
+        self._defined = {}
+
+    def _new_helper(self):
+        if self.helper_name_format is None:
+            self.n_helpers += 1
+            return self.variables.new_variable()
+
+        # numbers, whose names are taken by atoms, are skipped
+        name = self.helper_name_format % self.n_helpers
+        while name in self.variables:
+            self.n_helpers += 1
+            name = self.helper_name_format % self.n_helpers
+        self.n_helpers += 1
+        return self.variables.new_variable(name)
+
+    def _constant(self):
+        if self._true is None:
+            self._true = self._new_helper()
+            self.clauses.append([self._true])
+        return self._true
+
+    def _and_gate(self, lits, polarity):
+        lits = list(dict.fromkeys(lits))
+        lit_set = set(lits)
+
+        if self._true is not None and self._true in lit_set:
+            lits.remove(self._true)
+            lit_set.remove(self._true)
+        if any(-lit in lit_set for lit in lits):
+            return -self._constant()
+        elif not lits:
+            return self._constant()
+        elif len(lits) == 1:
+            return lits[0]
+
+        key = frozenset(lit_set)
+        helper = self._gates.get(key)
+        if helper is None:
+            helper = self._gates[key] = self._new_helper()
+
+        missing = polarity & ~self._defined.get(helper, 0)
+        if missing & POSITIVE:
+            self.clauses.extend([-helper, lit] for lit in lits)
+        if missing & NEGATIVE:
+            self.clauses.append([helper] + [-lit for lit in lits])
+        self._defined[helper] = self._defined.get(helper, 0) | missing
+
+        return helper
+
+    def _equivalence_gate(self, lhs, rhs, polarity):
+        if lhs == rhs:
+            return self._constant()
+        elif lhs == -rhs:
+            return -self._constant()
+
+        # a<=>b is equivalent to ~a<=>~b and the negation of ~a<=>b
+        sign = -1 if (lhs < 0) != (rhs < 0) else 1
+        lhs, rhs = sorted((abs(lhs), abs(rhs)))
+        if sign < 0:
+            polarity = _swap(polarity)
+
+        key = ('<=>', lhs, rhs)
+        helper = self._gates.get(key)
+        if helper is None:
+            helper = self._gates[key] = self._new_helper()
+
+        missing = polarity & ~self._defined.get(helper, 0)
+        if missing & POSITIVE:
+            self.clauses.extend([[-helper, -lhs, rhs], [-helper, lhs, -rhs]])
+        if missing & NEGATIVE:
+            self.clauses.extend([[helper, lhs, rhs], [helper, -lhs, -rhs]])
+        self._defined[helper] = self._defined.get(helper, 0) | missing
+
+        return sign * helper
+
+    # get the subformulas, a node gets encoded from: nested conjunctions (disjunctions), which are not shared,
+    # are flattened into their parent
+    def _inputs(self, node, parents):
+        if type(node) != And and type(node) != Or:
+            return children(node)
+
+        inputs = []
+        stack = list(reversed(node.children))
+        while stack:
+            child = stack.pop()
+            if type(child) == type(node) and parents[child] == 1 and child not in self._literals:
+                stack.extend(reversed(child.children))
+            else:
+                inputs.append(child)
+        return inputs
+
+    # get the polarities of the inputs of a node in the given polarity
+    def _input_polarities(self, node, inputs, polarity):
+        if type(node) == Negation:
+            return [_swap(polarity)]
+        elif type(node) == Implication:
+            return [_swap(polarity), polarity]
+        elif type(node) == Equivalence:
+            return [BOTH, BOTH]
+        else:
+            return [polarity] * len(inputs)
+
+    def _define(self, node, inputs, polarity):
+        lits = [self._literals[child] for child in inputs]
+
+        if type(node) == Literal:
+            lit = self.variables.literal(node)
+            polarity = BOTH
+        elif type(node) == bool:
+            lit = self._constant() if node else -self._constant()
+            polarity = BOTH
+        elif type(node) == Negation:
+            lit = -lits[0]
+        elif type(node) == And:
+            lit = self._and_gate(lits, polarity)
+        elif type(node) == Or:
+            lit = -self._and_gate([-lit for lit in lits], _swap(polarity))
+        elif type(node) == Implication:
+            lit = -self._and_gate([lits[0], -lits[1]], _swap(polarity))
+        else:
+            lit = self._equivalence_gate(lits[0], lits[1], polarity)
+
+        self._literals[node] = lit
+        self._node_inputs.setdefault(node, inputs)
+        self._polarities[node] = self._polarities.get(node, 0) | polarity
+
+    def _encode(self, formula, polarity, parents):
+        if not self.polarity_aware:
+            polarity = BOTH
+
+        # inputs of all nodes, whose encoding might be incomplete, in post-order
+        inputs = {}
+        def node_inputs(node):
+            if self._polarities.get(node, 0) == BOTH:
+                return ()
+            elif node not in inputs:
+                known = self._node_inputs.get(node)
+                inputs[node] = self._inputs(node, parents) if known is None else known
+            return inputs[node]
+
+        order = []
+        fold(formula, lambda node, results: order.append(node), node_inputs)
+
+        # propagate the missing polarities top-down
+        required = {formula: polarity}
+        for node in reversed(order):
+            missing = required.get(node, 0) & ~self._polarities.get(node, 0)
+            required[node] = missing
+            if missing:
+                for child, child_polarity in zip(inputs[node], self._input_polarities(node, inputs[node], missing)):
+                    required[child] = required.get(child, 0) | child_polarity
+
+        # define the helpers bottom-up
+        for node in order:
+            if required[node]:
+                self._define(node, inputs[node], required[node])
+
+        return self._literals[formula]
+
+    def _register_atoms(self, formula):
+        # atoms get their variables first, so helper names can not shadow them
+        parents = collections.Counter()
+        for node in iter_nodes(formula):
+            if type(node) == Literal:
+                self.variables.add(node.name)
+            parents.update(children(node))
+        return parents
+
+    def encode(self, formula, polarity=POSITIVE):
+        """
+        get a literal, which is equivalent to the formula under the clauses. In polarity-aware mode, the
+        literal only implies the formula (POSITIVE) or is implied by it (NEGATIVE), which is enough for
+        satisfiability of the formula (its negation).
+        """
+        return self._encode(formula, polarity, self._register_atoms(formula))
+
+    def add(self, formula):
+        """
+        add clauses, which are satisfiable iff the formula is, conjunctions at the top-level become separate
+        constraints
+        """
+        parents = self._register_atoms(formula)
+
+        stack = [formula]
+        while stack:
+            conjunct = stack.pop()
+            if type(conjunct) == And:
+                stack.extend(reversed(conjunct.children))
+            elif type(conjunct) == Or or type(conjunct) == Implication:
+                # clauses at the top-level need no helper
+                inputs = self._inputs(conjunct, parents)
+                polarities = self._input_polarities(conjunct, inputs, POSITIVE)
+                lits = [self._encode(child, polarity, parents) for child, polarity in zip(inputs, polarities)]
+                if type(conjunct) == Implication:
+                    lits[0] = -lits[0]
+                lit_set = set(lits)
+                if not any(-lit in lit_set for lit in lits):
+                    self.clauses.append(list(dict.fromkeys(lits)))
+            else:
+                self.clauses.append([self._encode(conjunct, POSITIVE, parents)])
+
+# clauses of a formula consisting of literals only, and of its negation
+def _flat_clauses(formula, variables):
+    if type(formula) == Literal:
+        lit = variables.literal(formula)
+        return [[lit]], [[-lit]]
+    elif type(formula) == Or:
+        lits = [variables.literal(child) for child in formula.children]
+        return [lits], [[-lit] for lit in lits]
+    elif type(formula) == And:
+        lits = [variables.literal(child) for child in formula.children]
+        return [[lit] for lit in lits], [[-lit for lit in lits]]
+    elif type(formula) == Implication:
+        lhs, rhs = variables.literal(formula.lhs), variables.literal(formula.rhs)
+        return [[-lhs, rhs]], [[lhs], [-rhs]]
+    elif type(formula) == Equivalence:
+        lhs, rhs = variables.literal(formula.lhs), variables.literal(formula.rhs)
+        return [[-lhs, rhs], [lhs, -rhs]], [[lhs, rhs], [-lhs, -rhs]]
+    else:
+        raise SyntaxError("formula is not a Tseitsin definition")
+
+def iter_clauses(encoding, variables):
+    """
+    get the integer clauses of the output of 'tseitsin', 'onesided_tseitsin' or 'to_CNF' one by one
+
+    >>> variables = VariableTable()
+    >>> list(iter_clauses(And([Or([Literal('a'), Literal('b', negated=True)]), Literal('b')]), variables))
+    [[1, -2], [2]]
+    """
+    if type(encoding) != And:
+        raise SyntaxError("formula is not a Tseitsin encoding")
+
+    for definition in encoding.children:
+        if type(definition) == Literal:
+            yield [variables.literal(definition)]
+        elif type(definition) == Or:
+            yield [variables.literal(child) for child in definition.children]
+        elif type(definition) in {Implication, Equivalence}:
+            helper = variables.literal(definition.lhs)
+            positive, negative = _flat_clauses(definition.rhs, variables)
+
+            for clause in positive:
+                yield [-helper] + clause
+            if type(definition) == Equivalence:
+                for clause in negative:
+                    yield [helper] + clause
+        else:
+            raise SyntaxError("formula is not a Tseitsin encoding")
+
+def clauses_from_tseitsin(encoding, variables):
+    """
+    convert the output of 'tseitsin' or 'onesided_tseitsin' to a list of integer clauses
+
+    >>> variables = VariableTable()
+    >>> clauses_from_tseitsin(And([Literal('t'), Equivalence(Literal('t'), Or([Literal('a'), Literal('b', negated=True)]))]), variables)
+    [[1], [-1, 2, -3], [1, -2], [1, 3]]
+    >>> variables.names
+    [None, 't', 'a', 'b']
+    """
+    return list(iter_clauses(encoding, variables))
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,243 @@
+#!/usr/bin/python
+
+"""
+Compact integer representation of formulas.
+
+A formula DAG is stored as a node table in flat arrays: every distinct
+subformula is one node with an opcode and its arguments, which are the indices
+of its children, a signed variable (see clauses.VariableTable) for literals or
+0/1 for constants. Children always precede their parents, so the nodes can be
+processed in a single loop over the table without recursion and without a
+Python object per node.
+
+Normal forms are built as integer clauses (see clauses.ClauseStore), cubes of
+truth tables are row bitmasks (see truth_table and minimize). The syntax
+classes are only created at the API boundary by to_formula and
+clauses_to_formula.
+"""
+
+from syntax import *
+from traversal import fold
+from clauses import VariableTable, ClauseStore
+from truth_table import full_mask, column_mask, iter_rows
+from array import array
+
+# opcodes of the nodes
+LITERAL, CONSTANT, NOT, AND, OR, IMPLIES, EQUIVALENT = range(7)
+
+_OPCODES = {Negation: NOT, And: AND, Or: OR, Implication: IMPLIES, Equivalence: EQUIVALENT}
+
+def build_node(op, arguments, nodes, to_literal):
+    """
+    create the syntax node of an opcode and its arguments, children are looked up in 'nodes' by index and
+    literals are created by 'to_literal' from signed variables
+
+    >>> build_node(IMPLIES, [0, 1], [Literal('a'), Literal('b')], None)
+    Implication(Literal(a), Literal(b))
+    """
+    if op == LITERAL:
+        return to_literal(arguments[0])
+    elif op == CONSTANT:
+        return bool(arguments[0])
+    elif op == NOT:
+        return Negation(nodes[arguments[0]])
+    elif op == AND:
+        return And([nodes[child] for child in arguments])
+    elif op == OR:
+        return Or([nodes[child] for child in arguments])
+    elif op == IMPLIES:
+        return Implication(nodes[arguments[0]], nodes[arguments[1]])
+    else:
+        return Equivalence(nodes[arguments[0]], nodes[arguments[1]])
+
+class CompactFormula:
+    """
+    formula DAG as node table: node i has the opcode 'ops[i]' and the arguments
+    'args[offsets[i]:offsets[i + 1]]', 'root' is the node of the formula added last
+
+    >>> compact = CompactFormula.from_formula(Or([And([Literal('a'), Literal('b', negated=True)]), Literal('a')]))
+    >>> list(compact.ops), list(compact.args), compact.variables.names
+    ([0, 0, 3, 4], [1, -2, 0, 1, 2, 0], [None, 'a', 'b'])
+    >>> compact.to_formula()
+    Or(And(Literal(a), Literal(!b)), Literal(a))
+    """
+    def __init__(self, variables=None):
+        self.variables = VariableTable() if variables is None else variables
+        self.ops = array('b')
+        self.args = array('i')
+        self.offsets = array('q', [0])
+        self.root = None
+        # indices of the nodes keyed by opcode and arguments, equal nodes are stored once
+        self._nodes = {}
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __getstate__(self):
+        return self.variables, self.ops, self.args, self.offsets, self.root
+
+    def __setstate__(self, state):
+        self.variables, self.ops, self.args, self.offsets, self.root = state
+        self._nodes = {(op, tuple(self.arguments(index))): index for index, op in enumerate(self.ops)}
+
+    def arguments(self, index):
+        return self.args[self.offsets[index]:self.offsets[index + 1]]
+
+    def add_node(self, op, args=()):
+        """
+        get the index of the node with the given opcode and arguments, appending it if it is new
+        """
+        key = (op, tuple(args))
+        index = self._nodes.get(key)
+        if index is None:
+            index = self._nodes[key] = len(self.ops)
+            self.ops.append(op)
+            self.args.extend(key[1])
+            self.offsets.append(len(self.args))
+        return index
+
+    def add(self, formula):
+        """
+        append the nodes of a formula, which are not in the table yet, and get the index of its root
+        """
+        literal = self.variables.literal
+
+        def combine(node, indices):
+            if type(node) == Literal:
+                return self.add_node(LITERAL, (literal(node),))
+            elif type(node) == bool:
+                return self.add_node(CONSTANT, (int(node),))
+            return self.add_node(_OPCODES[type(node)], indices)
+
+        self.root = fold(formula, combine)
+        return self.root
+
+    @classmethod
+    def from_formula(cls, formula, variables=None):
+        compact = cls(variables)
+        compact.add(formula)
+        return compact
+
+    def to_formula(self, root=None):
+        """
+        get the formula of the node 'root' (by default the root of the table) as syntax classes
+        """
+        if root is None:
+            root = self.root
+
+        to_literal = self.variables.to_literal
+        ops, args, offsets = self.ops, self.args, self.offsets
+        nodes = []
+
+        for index in range(root + 1):
+            nodes.append(build_node(ops[index], args[offsets[index]:offsets[index + 1]], nodes, to_literal))
+
+        return nodes[root]
+
+    def truth_table(self, atoms=None):
+        """
+        get the bit-parallel truth table of the root (see truth_table) wrt. 'atoms', by default the atoms of the
+        variable table ordered by name, together with the atoms
+
+        >>> CompactFormula.from_formula(Implication(Literal('a'), Literal('b'))).truth_table()
+        (13, ['a', 'b'])
+        """
+        names = self.variables.names
+        if atoms is None:
+            atoms = sorted(name for name in names[1:] if name is not None)
+
+        n_atoms = len(atoms)
+        full = full_mask(n_atoms)
+        positions = {name: i for i, name in enumerate(atoms)}
+        # truth tables of the variables, created when first needed
+        columns = [None] * len(names)
+
+        ops, args, offsets = self.ops, self.args, self.offsets
+        tables = []
+        for index in range(self.root + 1):
+            op = ops[index]
+            start, end = offsets[index], offsets[index + 1]
+            if op == LITERAL:
+                lit = args[start]
+                column = columns[abs(lit)]
+                if column is None:
+                    column = columns[abs(lit)] = column_mask(positions[names[abs(lit)]], n_atoms)
+                table = column ^ full if lit < 0 else column
+            elif op == CONSTANT:
+                table = full if args[start] else 0
+            elif op == NOT:
+                table = tables[args[start]] ^ full
+            elif op == AND:
+                table = full
+                for child in args[start:end]:
+                    table &= tables[child]
+            elif op == OR:
+                table = 0
+                for child in args[start:end]:
+                    table |= tables[child]
+            elif op == IMPLIES:
+                table = (tables[args[start]] ^ full) | tables[args[start + 1]]
+            else:
+                table = tables[args[start]] ^ tables[args[start + 1]] ^ full
+            tables.append(table)
+
+        return tables[self.root], atoms
+
+def rows_to_clauses(table, n_atoms, negated=False, clauses=None):
+    """
+    append the rows set in a truth table as integer cubes over the variables 1..n_atoms (atom i is variable
+    i + 1) to 'clauses' (a new ClauseStore by default). With 'negated' all literals are negated, which turns
+    the violating rows into the clauses of a CNF.
+
+    >>> [list(clause) for clause in rows_to_clauses(0b0110, 2)]
+    [[1, -2], [-1, 2]]
+    """
+    if clauses is None:
+        clauses = ClauseStore()
+
+    # row bit i set means atom i is true, which is the literal i + 1 unless negated
+    signs = [(-1 if negated else 1) * (i + 1) for i in range(n_atoms)]
+    for row in iter_rows(table, n_atoms):
+        clauses.append([sign if row >> i & 1 else -sign for i, sign in enumerate(signs)])
+
+    return clauses
+
+def cubes_to_clauses(cubes, n_atoms, negated=False, clauses=None):
+    """
+    append cubes given as (value, care) masks (see minimize) as integer cubes like rows_to_clauses
+
+    >>> [list(clause) for clause in cubes_to_clauses([(0b01, 0b01), (0b00, 0b10)], 2, negated=True)]
+    [[-1], [2]]
+    """
+    if clauses is None:
+        clauses = ClauseStore()
+
+    signs = [(-1 if negated else 1) * (i + 1) for i in range(n_atoms)]
+    for value, care in cubes:
+        clauses.append([sign if value >> i & 1 else -sign for i, sign in enumerate(signs) if care >> i & 1])
+
+    return clauses
+
+def clauses_to_formula(clauses, variables, outer=And, inner=Or):
+    """
+    convert integer clauses to a formula in CNF (or DNF with outer=Or and inner=And), every literal is
+    created only once
+
+    >>> clauses_to_formula([[1, -2], [2]], VariableTable(['a', 'b']))
+    And(Or(Literal(a), Literal(!b)), Or(Literal(b)))
+    """
+    literals = {}
+
+    def to_literal(lit):
+        literal = literals.get(lit)
+        if literal is None:
+            literal = literals[lit] = variables.to_literal(lit)
+        return literal
+
+    return outer([inner([to_literal(lit) for lit in clause]) for clause in clauses])
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
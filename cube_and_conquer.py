@@ -0,0 +1,178 @@
+#!/usr/bin/python
+
+"""
+Parallel checks by cube-and-conquer.
+
+The assignments of a formula are split into cubes, the 2^k assignments to the
+k atoms occurring most often in it. Every cube is solved by a pool of worker
+processes, each keeping one incremental solver (see sat_solver.Solver) for the
+formula, which gets the cube as assumption. Formulas are sent to the workers as
+node tables (see compact), which pickle compactly at any depth. Searches for a model stop all
+workers at the first model found, counts and sets of satisfying assignments
+are merged from all cubes.
+"""
+
+import collections
+import functools
+import itertools
+import multiprocessing
+
+from syntax import *
+from traversal import iter_nodes
+from compact import CompactFormula
+from instrumentation import stats
+
+# number of cubes per worker, so workers finishing early get more work
+CUBES_PER_JOB = 4
+
+# formula, its sorted atoms and its solver in the current worker process
+_formula = None
+_atoms = None
+_solver = None
+
+def choose_cube_atoms(formula, n_cubes):
+    """
+    get the atoms to split on for at least 'n_cubes' cubes (or all atoms), the most frequent ones first
+
+    >>> choose_cube_atoms(And([Or([Literal('a'), Literal('b')]), Or([Literal('b', negated=True), Literal('c')])]), 2)
+    ['b']
+    """
+    occurrences = collections.Counter(node.name for node in iter_nodes(formula) if type(node) == Literal)
+    n_atoms = min((n_cubes - 1).bit_length(), len(occurrences))
+
+    return sorted(occurrences, key=lambda name: (-occurrences[name], name))[:n_atoms]
+
+def iter_cubes(atoms):
+    """
+    iterate over all assignments to the atoms as dicts
+
+    >>> list(iter_cubes(['a', 'b']))
+    [{'a': False, 'b': False}, {'a': False, 'b': True}, {'a': True, 'b': False}, {'a': True, 'b': True}]
+    """
+    for values in itertools.product((False, True), repeat=len(atoms)):
+        yield dict(zip(atoms, values))
+
+def _init_worker(compact, atoms, collect_stats=False):
+    global _formula, _atoms, _solver
+
+    # forked workers inherit the stats of the main process, which must not be merged back
+    stats.reset()
+    if collect_stats:
+        stats.enable()
+
+    import sat_solver
+
+    _formula = compact.to_formula()
+    _atoms = atoms
+    _solver = sat_solver.Solver(_formula)
+
+# assignments are sent as tuples of values, their namedtuple-types only exist in the creating process
+def _solve_cube(mode, cube):
+    if mode == 'model':
+        result = tuple(_solver.model) if _solver.solve([cube]) else None
+    elif mode == 'models':
+        result = [tuple(model) for model in _solver.iter_models([cube])]
+    else:
+        import model_counter
+        literals = [Literal(name, negated=not value) for name, value in cube.items()]
+        result = model_counter.count_models(And([_formula] + literals), _atoms)
+
+    return result
+
+# solve a cube in a worker process and hand the stats collected meanwhile over to the main process
+def _solve_cube_in_worker(mode, cube):
+    result = _solve_cube(mode, cube)
+
+    collected = stats.as_dict() if stats.enabled else None
+    stats.reset()
+
+    return result, collected
+
+def _solve_cubes(formula, mode, jobs, cube_atoms=None):
+    import utils
+
+    atoms = sorted(utils.get_atoms(formula))
+    if cube_atoms is None:
+        cube_atoms = choose_cube_atoms(formula, jobs * CUBES_PER_JOB)
+
+    initargs = (CompactFormula.from_formula(formula), atoms, stats.enabled)
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=initargs) as pool:
+        for result, collected in pool.imap_unordered(functools.partial(_solve_cube_in_worker, mode),
+                                                     iter_cubes(cube_atoms)):
+            if collected is not None:
+                stats.merge(collected)
+            yield result
+
+def find_model(formula, jobs, cube_atoms=None):
+    """
+    get a satisfying assignment of the formula searched by 'jobs' worker processes, or None if it is
+    unsatisfiable. The cubes are assignments to 'cube_atoms', by default chosen by choose_cube_atoms.
+
+    >>> find_model(And([Literal('a'), Or([Literal('a', negated=True), Literal('b', negated=True)])]), 2)
+    Assignment(a=True, b=False)
+    >>> find_model(Equivalence(Literal('a'), Negation(Literal('a'))), 2) is None
+    True
+    """
+    import utils
+
+    results = _solve_cubes(formula, 'model', jobs, cube_atoms)
+    try:
+        for values in results:
+            if values is not None:
+                return utils.get_assignment_type(sorted(utils.get_atoms(formula)))._make(values)
+        return None
+    finally:
+        # terminates the workers still searching the other cubes
+        results.close()
+
+def is_satisfiable(formula, jobs, cube_atoms=None):
+    return find_model(formula, jobs, cube_atoms) is not None
+
+def is_valid(formula, jobs, cube_atoms=None):
+    """
+    check if the formula is valid by searching a counterexample in parallel
+
+    >>> is_valid(Or([Literal('x'), Implication(Literal('x'), Literal('y'))]), 2)
+    True
+    """
+    return find_model(Negation(formula), jobs, cube_atoms) is None
+
+def are_equivalent(formula1, formula2, jobs, cube_atoms=None):
+    """
+    check if the formulas are equivalent by searching a model of their miter in parallel
+
+    >>> are_equivalent(Implication(Literal('a'), Literal('b')), Or([Literal('a', negated=True), Literal('b')]), 2)
+    True
+    """
+    return find_model(Negation(Equivalence(formula1, formula2)), jobs, cube_atoms) is None
+
+def count_models(formula, jobs, cube_atoms=None):
+    """
+    count the satisfying assignments of the formula as the sum of the counts of all cubes
+
+    >>> count_models(Or([Literal('a'), Literal('b'), Literal('c')]), 2)
+    7
+    """
+    return sum(_solve_cubes(formula, 'count', jobs, cube_atoms))
+
+def get_satisfying_assignments(formula, jobs, cube_atoms=None):
+    """
+    get the set of all satisfying assignments of the formula as the union of the models of all cubes
+
+    >>> sorted(get_satisfying_assignments(Or([Literal('a'), Literal('b')]), 2))
+    [Assignment(a=False, b=True), Assignment(a=True, b=False), Assignment(a=True, b=True)]
+    """
+    import utils
+
+    make = utils.get_assignment_type(sorted(utils.get_atoms(formula)))._make
+    res = {make(values) for models in _solve_cubes(formula, 'models', jobs, cube_atoms) for values in models}
+    if stats.enabled:
+        stats.count('assignments_materialized', len(res))
+
+    return res
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
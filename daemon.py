@@ -0,0 +1,323 @@
+#!/usr/bin/python
+
+"""
+Long-lived server for the checks and conversions of ppl-tool, and its client.
+
+The server (ppl-tool --serve) listens on a Unix domain socket or a TCP port of
+localhost. Clients send requests as lines like the ones of batch mode: a
+formula, or a JSON object with the key 'formula' and optionally 'checks' (names
+from batch.CHECKS), 'equivalent_to', 'minimize', 'write_dimacs' and 'id', or
+with the key 'dimacs' (a CNF in DIMACS format) instead of 'formula'. Requests
+get answered by a pool of worker processes, which keep their parser,
+formatter and result cache (see formula_cache) for the lifetime of the server.
+
+Requests may be pipelined: the server reads on while earlier requests are still
+running and writes every response as soon as it is ready, as a JSON line with
+the number of the request on its connection ('request'), its 'id' if given and
+the time from reading to answering it in seconds ('latency').
+
+This module only imports the standard library modules the client needs, the
+others are imported by the server and the workers.
+"""
+
+import json
+import socket
+import threading
+
+# address of the server, if none is given
+DEFAULT_ADDRESS = 'localhost:7457'
+# maximal length of a request line in bytes, longer requests are answered with an error
+REQUEST_LIMIT = 1 << 26
+# maximal number of requests of a connection in flight, further requests are not read until one is answered
+REQUESTS_IN_FLIGHT = 64
+
+# parser of the requests for DIMACS formulas in the current worker process
+_parser = None
+
+def parse_address(address):
+    """
+    get the (host, port) of a TCP address given as HOST:PORT or PORT, or the path of a Unix domain socket
+
+    >>> parse_address('localhost:7457'), parse_address('7457'), parse_address('/tmp/ppl.sock')
+    (('localhost', 7457), ('localhost', 7457), '/tmp/ppl.sock')
+    """
+    host, _, port = address.rpartition(':')
+    if port.isdigit() and '/' not in address:
+        return host or 'localhost', int(port)
+    return address
+
+def parse_request(line):
+    """
+    get the request from an input line, requests for DIMACS formulas need no 'formula'
+
+    >>> parse_request('{"dimacs": "p cnf 1 1\\\\n1 0\\\\n", "id": 3}')
+    {'dimacs': 'p cnf 1 1\\n1 0\\n', 'id': 3}
+    """
+    if line.lstrip().startswith('{'):
+        request = json.loads(line)
+        if isinstance(request, dict) and 'dimacs' in request:
+            return request
+
+    import batch
+    return batch.parse_request(line)
+
+def _init_worker(unicode=True, cache_path=None, collect_stats=False):
+    global _parser
+
+    import batch
+    import signal
+
+    # interrupts are handled by the server, which shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # results are always cached, in memory if no database is given
+    batch._init_worker(unicode, cache_path, collect_stats, memory_cache=True)
+    _parser = batch._parser
+
+def _parser_ready():
+    return _parser is not None
+
+def _solve_dimacs(text):
+    import io
+    import dimacs
+    import sat_solver
+
+    clauses, variables = dimacs.read_dimacs(io.BytesIO(text.encode('utf-8')))
+    solver = sat_solver.CDCLSolver(len(variables))
+    satisfiable = all(solver.add_clause(clause) for clause in clauses) and solver.solve()
+
+    result = {'satisfiable': satisfiable}
+    if satisfiable:
+        result['model'] = {name: bool(solver.model[index]) for index, name in enumerate(variables.names) if index}
+    return result
+
+def _encode_dimacs(formula):
+    import io
+    import clauses
+    import dimacs
+
+    encoder = clauses.TseitinEncoder()
+    encoder.add(_parser.parse(formula))
+    text = io.StringIO()
+    dimacs.write_dimacs(encoder.clauses, text, encoder.variables)
+    return text.getvalue()
+
+def run_request(request, checks=(), equivalent_to=None, minimize=False):
+    """
+    answer a request in a worker process, 'checks', 'equivalent_to' and 'minimize' are the defaults of the
+    server for requests without them
+
+    >>> _init_worker()
+    >>> run_request({'formula': 'a=>b', 'checks': ['is_satisfiable'], 'id': 'x'}, ['to_cnf'])
+    {'id': 'x', 'formula': 'a=>b', 'satisfiable': True}
+    >>> run_request({'dimacs': 'p cnf 2 2\\n1 0\\n-1 -2 0\\n'})
+    {'satisfiable': True, 'model': {'v1': True, 'v2': False}}
+    >>> run_request({'formula': 'a', 'write_dimacs': True})['dimacs'].splitlines()[:2]
+    ['c var 1 a', 'p cnf 1 1']
+    """
+    import batch
+
+    if 'dimacs' in request:
+        result = {'id': request['id']} if 'id' in request else {}
+        result.update(_solve_dimacs(request['dimacs']))
+        return result
+
+    checks = request.get('checks', checks)
+    unknown = [check for check in checks if check not in batch.CHECKS]
+    if unknown:
+        raise ValueError(f"unknown checks: {', '.join(map(str, unknown))}")
+
+    result = batch.run_request(request, checks, equivalent_to, request.get('minimize', minimize))
+    if request.get('write_dimacs'):
+        result['dimacs'] = _encode_dimacs(request['formula'])
+    return result
+
+# answer a request in a worker process and hand the stats collected meanwhile over to the server. Errors are
+# answered like in batch mode, since not all exceptions survive pickling.
+def _run_request_in_worker(request, checks, equivalent_to, minimize):
+    from instrumentation import stats
+
+    try:
+        result = run_request(request, checks, equivalent_to, minimize)
+    except Exception as e:
+        result = {'error': f"{type(e).__name__}: {e}"}
+
+    collected = stats.as_dict() if stats.enabled else None
+    stats.reset()
+
+    return result, collected
+
+def serve(address=DEFAULT_ADDRESS, checks=(), jobs=1, unicode=True, equivalent_to=None, minimize=False,
+          cache_path=None, ready=None, limit=REQUEST_LIMIT, in_flight=REQUESTS_IN_FLIGHT):
+    """
+    answer requests on 'address' with 'jobs' worker processes until interrupted. 'checks', 'equivalent_to' and
+    'minimize' are the defaults for requests without them, 'cache_path' is the database shared by the workers
+    (see formula_cache). 'ready' is called with the listening server once it accepts connections. Request lines
+    longer than 'limit' bytes are skipped and answered with an error, at most 'in_flight' requests of a
+    connection are queued or running at once.
+    """
+    import asyncio
+    import concurrent.futures
+    import os
+    import signal
+    import time
+    from instrumentation import stats
+
+    async def read_line(reader):
+        # get the next line and None, or None and an error for an overlong line, which gets skipped
+        try:
+            return await reader.readuntil(b'\n'), None
+        except asyncio.IncompleteReadError as e:
+            # the last line may lack its newline
+            return e.partial, None
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+            while True:
+                await reader.readexactly(consumed)
+                try:
+                    await reader.readuntil(b'\n')
+                    break
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError as e:
+                    consumed = e.consumed
+            return None, f"ValueError: request longer than {limit} bytes"
+
+    async def answer(number, line, error, start, pool, writer):
+        loop = asyncio.get_running_loop()
+        if error is not None:
+            result = {'error': error}
+        else:
+            try:
+                request = parse_request(line.decode('utf-8'))
+            except Exception as e:
+                result = {'error': f"{type(e).__name__}: {e}"}
+            else:
+                try:
+                    result, collected = await loop.run_in_executor(pool, _run_request_in_worker, request, checks,
+                                                                   equivalent_to, minimize)
+                except Exception as e:
+                    # e.g. a broken pool, errors of the request itself are answered by the worker
+                    result, collected = {'error': f"{type(e).__name__}: {e}"}, None
+                if collected is not None:
+                    stats.merge(collected)
+
+        latency = time.perf_counter() - start
+        if stats.enabled:
+            stats.count('requests')
+            stats.timings['request'] += latency
+
+        response = {'request': number, **result, 'latency': round(latency, 6)}
+        writer.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+        await writer.drain()
+
+    async def handle(reader, writer, pool):
+        pending = set()
+        slots = asyncio.Semaphore(in_flight)
+        number = 0
+
+        def done(task):
+            pending.discard(task)
+            slots.release()
+
+        try:
+            while True:
+                line, error = await read_line(reader)
+                start = time.perf_counter()
+                if error is None and not line:
+                    break
+                elif error is None and not line.strip():
+                    continue
+                number += 1
+                await slots.acquire()
+                task = asyncio.create_task(answer(number, line, error, start, pool, writer))
+                pending.add(task)
+                task.add_done_callback(done)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            writer.close()
+
+    target = parse_address(address)
+
+    async def main():
+        # stop on SIGINT and SIGTERM, also if the server was started with SIGINT ignored in the background
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, asyncio.current_task().cancel)
+
+        with concurrent.futures.ProcessPoolExecutor(max(jobs, 1), initializer=_init_worker,
+                                                    initargs=(unicode, cache_path, stats.enabled)) as pool:
+            # start the workers now, so the first requests do not wait for them
+            await asyncio.gather(*(loop.run_in_executor(pool, _parser_ready) for _ in range(max(jobs, 1))))
+
+            async def handle_connection(reader, writer):
+                await handle(reader, writer, pool)
+
+            if isinstance(target, str):
+                server = await asyncio.start_unix_server(handle_connection, target, limit=limit)
+            else:
+                server = await asyncio.start_server(handle_connection, *target, limit=limit)
+
+            async with server:
+                if ready is not None:
+                    ready(server)
+                await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        if isinstance(target, str) and os.path.exists(target):
+            os.unlink(target)
+
+def connect(address=DEFAULT_ADDRESS):
+    """
+    open a connection to the server on 'address'
+    """
+    target = parse_address(address)
+    if isinstance(target, str):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(target)
+        except OSError:
+            connection.close()
+            raise
+        return connection
+    return socket.create_connection(target)
+
+def send_requests(lines, address=DEFAULT_ADDRESS):
+    """
+    send request lines (strings, or dicts to be sent as JSON) to the server without waiting for their
+    responses, and yield the responses as dicts in the order they are answered
+    """
+    connection = connect(address)
+
+    def send():
+        try:
+            with connection.makefile('w', encoding='utf-8') as requests:
+                for line in lines:
+                    if isinstance(line, dict):
+                        line = json.dumps(line, ensure_ascii=False)
+                    elif not line.strip():
+                        continue
+                    requests.write(line.rstrip('\n') + '\n')
+        finally:
+            # no more requests, the server answers the pending ones and closes the connection
+            connection.shutdown(socket.SHUT_WR)
+
+    sender = threading.Thread(target=send, daemon=True)
+    sender.start()
+
+    with connection, connection.makefile('r', encoding='utf-8') as responses:
+        for line in responses:
+            yield json.loads(line)
+
+    sender.join()
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
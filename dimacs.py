@@ -0,0 +1,251 @@
+#!/usr/bin/python
+
+"""
+Reading and writing of CNF formulas in the DIMACS format.
+
+Files are read in chunks of a memory-mapped file straight into a ClauseStore, so
+no formula objects get created per clause. The names of the variables are kept
+in comment lines of the form 'c var <index> <name>', so models can get mapped
+back to assignments of the original atoms.
+"""
+
+from array import array
+import mmap
+import os
+import re
+import warnings
+
+try:
+    import numpy
+    _numpy_available = True
+except ImportError:
+    _numpy_available = False
+
+from clauses import ClauseStore, VariableTable, iter_clauses
+
+# approximate number of bytes parsed at once
+CHUNK_SIZE = 1 << 24
+
+# lines, which do not contain clauses: comments, the problem line and the end marker of some benchmark files
+_special_line_re = re.compile(rb'^[ \t\r]*([cp%])([^\n]*)', re.M)
+_variable_name_re = re.compile(r'var[ \t]+(\d+)[ \t]+(\S+)')
+
+class DimacsError(ValueError):
+    """
+    raised if a file is not in the DIMACS CNF format
+    """
+    pass
+
+# split a buffer behind the last complete line in [start, end)
+def _split_point(buffer, start, end):
+    cut = buffer.rfind(b'\n', start, end)
+    if cut < 0:
+        cut = max(buffer.rfind(b' ', start, end), buffer.rfind(b'\t', start, end))
+    return cut + 1 if cut >= 0 else end
+
+# get the content of a binary file in chunks, which end at line boundaries
+def _iter_chunks(fileobj):
+    try:
+        mapped = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        # not a regular file (or an empty one)
+        mapped = None
+
+    if mapped is not None:
+        with mapped:
+            size, pos = len(mapped), 0
+            while pos < size:
+                end = pos + CHUNK_SIZE
+                end = _split_point(mapped, pos, end) if end < size else size
+                yield mapped[pos:end]
+                pos = end
+    else:
+        rest = b''
+        while True:
+            data = fileobj.read(CHUNK_SIZE)
+            if not data:
+                break
+            data = rest + data
+            cut = _split_point(data, 0, len(data))
+            yield data[:cut]
+            rest = data[cut:]
+        if rest:
+            yield rest
+
+def _parse_literals_numpy(data):
+    import numpy as np
+
+    with warnings.catch_warnings():
+        # numpy only warns about unparsable data
+        warnings.simplefilter('error')
+        try:
+            literals = np.fromstring(data, dtype=np.int64, sep=' ')
+        except (ValueError, DeprecationWarning):
+            return None
+
+    n_vars = int(np.abs(literals).max())
+    if n_vars >= 1 << 31:
+        return None
+
+    return array('i', literals.astype(np.int32).tobytes()), array('q', (np.flatnonzero(literals == 0) + 1).tobytes()), n_vars
+
+# get the literals of a piece of clause data, together with the ends of the clauses and the largest variable
+def _parse_literals(data):
+    if not data or data.isspace():
+        return array('i'), array('q'), 0
+    elif _numpy_available:
+        parsed = _parse_literals_numpy(data)
+        if parsed is not None:
+            return parsed
+
+    try:
+        return array('i', map(int, data.split())), None, None
+    except (ValueError, OverflowError) as e:
+        raise DimacsError(f"invalid clause data: {e}") from e
+
+def read_dimacs(file):
+    """
+    read a CNF in DIMACS format from a path or a binary file object, get the clauses and the variables
+
+    Variables, which are not named by a comment, are named 'v<index>'.
+
+    >>> import io
+    >>> clauses, variables = read_dimacs(io.BytesIO(b'c var 2 b\\np cnf 3 2\\n1 -2 0\\n2\\n3 0\\n'))
+    >>> [list(clause) for clause in clauses]
+    [[1, -2], [2, 3]]
+    >>> variables.names
+    [None, 'v1', 'b', 'v3']
+    """
+    if isinstance(file, (str, bytes, os.PathLike)):
+        with open(file, 'rb') as fileobj:
+            return read_dimacs(fileobj)
+
+    store = ClauseStore()
+    names = {}
+    declared = None
+
+    for chunk in _iter_chunks(file):
+        pos, end = 0, len(chunk)
+
+        for m in _special_line_re.finditer(chunk):
+            store.extend_terminated(*_parse_literals(chunk[pos:m.start()]))
+            pos = m.end()
+
+            kind, content = m.group(1), m.group(2).decode('utf-8', 'replace')
+            if kind == b'c':
+                name_match = _variable_name_re.fullmatch(content.strip())
+                if name_match:
+                    names[int(name_match.group(1))] = name_match.group(2)
+            elif kind == b'p':
+                fields = content.split()
+                if declared is not None or len(fields) != 3 or fields[0] != 'cnf' or not all(f.isdigit() for f in fields[1:]):
+                    raise DimacsError(f"invalid problem line 'p{content}'")
+                declared = int(fields[1])
+            else:
+                end = pos = m.start()
+                break
+
+        store.extend_terminated(*_parse_literals(chunk[pos:end]))
+        if end < len(chunk):
+            break
+
+    store.close()
+
+    variables = VariableTable()
+    for index in range(1, max([store.n_vars, declared or 0] + list(names)) + 1):
+        name = names.get(index, f'v{index}')
+        if name in variables:
+            raise DimacsError(f"variable name '{name}' is not unique")
+        variables.add(name)
+
+    return store, variables
+
+def write_dimacs(clauses, fileobj, variables=None):
+    """
+    write integer clauses (a ClauseStore or an iterable of clauses) in DIMACS format to a text file object,
+    the names of the given variables are written as comments
+
+    >>> import sys
+    >>> write_dimacs([[1, -2], [], [2]], sys.stdout, VariableTable(['a', 'b']))
+    c var 1 a
+    c var 2 b
+    p cnf 2 3
+    1 -2 0
+    0
+    2 0
+    """
+    if not isinstance(clauses, ClauseStore):
+        clauses = ClauseStore(clauses)
+
+    n_vars = clauses.n_vars
+    if variables is not None:
+        n_vars = max(n_vars, len(variables))
+        for index, name in enumerate(variables.names[1:], 1):
+            if name is not None:
+                fileobj.write(f"c var {index} {name}\n")
+
+    fileobj.write(f"p cnf {n_vars} {len(clauses)}\n")
+
+    # the terminating zeros end the lines
+    terminators = {0: '0\n'}.get
+    literals = clauses.literals
+    for start in range(0, len(literals), CHUNK_SIZE // 8):
+        chunk = literals[start:start + CHUNK_SIZE // 8]
+        text = ' '.join(map(terminators, chunk, map(str, chunk))).replace('\n ', '\n')
+        fileobj.write(text if text.endswith('\n') else text + ' ')
+
+def write_formula(encoding, fileobj, variables=None):
+    """
+    write the output of 'tseitsin', 'onesided_tseitsin' or 'to_CNF' in DIMACS format, get the variables
+    the atoms got mapped to (see clauses.TseitinEncoder for encoding other formulas)
+
+    >>> import sys
+    >>> variables = write_formula(And([Or([Literal('a'), Literal('b', negated=True)]), Literal('b')]), sys.stdout)
+    c var 1 a
+    c var 2 b
+    p cnf 2 2
+    1 -2 0
+    2 0
+    >>> variables.indices
+    {'a': 1, 'b': 2}
+    """
+    if variables is None:
+        variables = VariableTable()
+
+    write_dimacs(ClauseStore(iter_clauses(encoding, variables)), fileobj, variables)
+
+    return variables
+
+def read_model(lines):
+    """
+    get the model from the output of a SAT solver in the format of the SAT competitions as a list of truth
+    values indexed by variable, or None if the solver did not find one
+
+    >>> read_model(['c comment', 's SATISFIABLE', 'v 1 -2', 'v 3 0'])
+    [None, True, False, True]
+    """
+    satisfiable = False
+    values = {}
+
+    for line in lines:
+        fields = line.split()
+        if not fields:
+            continue
+        elif fields[0] == 's':
+            satisfiable = fields[1:] == ['SATISFIABLE']
+        elif fields[0] == 'v':
+            for lit in map(int, fields[1:]):
+                if lit:
+                    values[abs(lit)] = lit > 0
+
+    if not satisfiable:
+        return None
+
+    return [None] + [values.get(var, False) for var in range(1, max(values, default=0) + 1)]
+
+
+if __name__ == '__main__':
+    import doctest
+    from syntax import *
+
+    doctest.testmod()
@@ -0,0 +1,234 @@
+#!/usr/bin/python
+
+"""
+Memoization of the checks and conversions in utils.
+
+Results are keyed by a canonical fingerprint of the formula, which does not
+change when atoms get renamed or the children of conjunctions and disjunctions
+get reordered. Formulas in results are stored with the canonical atom names
+'v0', 'v1', ... and renamed back to the atoms of the query, so a hit for a
+renamed formula yields an equivalent, but not necessarily identically ordered,
+result. Results are kept in a bounded LRU cache and optionally in an sqlite
+database, which survives process restarts and can be shared between processes.
+"""
+
+from syntax import *
+from traversal import children, fold, iter_nodes
+import collections
+import hashlib
+import os
+import pickle
+import sqlite3
+
+# number of results kept in memory by default
+CACHE_SIZE = 1024
+# seconds to wait for a lock on the database held by another process
+DB_TIMEOUT = 30.0
+
+def _digest(*parts):
+    return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=32).digest()
+
+# digests of all nodes, with atoms replaced by the given labels. Children of And/Or are unordered.
+def _node_digests(formula, label):
+    digests = {}
+
+    def combine(node, child_digests):
+        if type(node) == Literal:
+            digest = _digest('L', label(node.name), node.negated)
+        elif type(node) == bool:
+            digest = _digest('C', node)
+        elif type(node) == And or type(node) == Or:
+            digest = _digest(type(node).__name__, sorted(child_digests))
+        else:
+            digest = _digest(type(node).__name__, child_digests)
+        digests[node] = digest
+        return digest
+
+    fold(formula, combine)
+    return digests
+
+def fingerprint(formula):
+    """
+    get a fingerprint of a formula, which is invariant under renaming of atoms and reordering of the children
+    of conjunctions and disjunctions, together with the mapping of atoms to their canonical names
+
+    Formulas with equal fingerprints are equal after renaming their atoms by the mappings (up to the order of
+    children). Atoms, which can not be told apart by their occurrences, are numbered by their first occurrence,
+    so in rare cases renamed formulas may still get different fingerprints.
+
+    >>> key, mapping = fingerprint(And([Literal('a'), Or([Literal('b', negated=True), Literal('c')])]))
+    >>> key == fingerprint(And([Or([Literal('z'), Literal('y', negated=True)]), Literal('x')]))[0]
+    True
+    >>> key == fingerprint(And([Literal('a'), Or([Literal('b'), Literal('c')])]))[0]
+    False
+    >>> mapping
+    {'c': 'v0', 'b': 'v1', 'a': 'v2'}
+    """
+    # tell atoms apart by the shapes of the nodes they occur in
+    shapes = _node_digests(formula, lambda name: None)
+    contexts = collections.defaultdict(list)
+    if type(formula) == Literal:
+        contexts[formula.name].append(_digest(None, formula.negated))
+    for node in iter_nodes(formula):
+        for child in children(node):
+            if type(child) == Literal:
+                contexts[child.name].append(_digest(shapes[node], child.negated))
+    colors = {name: _digest(sorted(occurrences)) for name, occurrences in contexts.items()}
+    shapes = _node_digests(formula, colors.get)
+
+    # number the atoms in the order of a traversal, which visits unordered children sorted by shape
+    def sorted_children(node):
+        if type(node) == And or type(node) == Or:
+            return sorted(node.children, key=shapes.__getitem__)
+        return children(node)
+
+    mapping = {}
+    for node in iter_nodes(formula, sorted_children):
+        if type(node) == Literal and node.name not in mapping:
+            mapping[node.name] = 'v%d' % len(mapping)
+
+    key = _node_digests(formula, mapping.get)[formula].hex()
+    return key, mapping
+
+def rename_atoms(formula, mapping):
+    """
+    replace the atoms of a formula by the names given in 'mapping'
+
+    >>> rename_atoms(Implication(Literal('a'), Negation(Literal('b'))), {'a': 'x', 'b': 'y'})
+    Implication(Literal(x), Negation(Literal(y)))
+    >>> rename_atoms(And([Literal('a'), True]), {'a': 'x'})
+    And(Literal(x), True)
+    """
+    def combine(node, results):
+        if type(node) == Literal:
+            return Literal(mapping[node.name], node.negated)
+        elif type(node) == bool:
+            return node
+        elif type(node) == And or type(node) == Or:
+            return type(node)(results)
+        else:
+            return type(node)(*results)
+
+    return fold(formula, combine)
+
+class FormulaCache:
+    """
+    caching front-end of the utils API with LRU eviction after 'maxsize' results. If 'path' is given, results
+    are also stored in an sqlite database at this path.
+
+    >>> cache = FormulaCache()
+    >>> cache.is_valid(Or([Literal('a'), Literal('a', negated=True)]))
+    True
+    >>> cache.is_valid(Or([Literal('b', negated=True), Literal('b')]))
+    True
+    >>> cache.to_CNF(Implication(Literal('p'), Literal('q')))
+    And(Or(Literal(!p), Literal(q)))
+    >>> cache.to_CNF(Implication(Literal('r'), Literal('s')))
+    And(Or(Literal(!r), Literal(s)))
+    >>> cache.hits, cache.misses
+    (2, 2)
+    >>> cache.is_satisfiable(And([Literal('a'), False])), cache.to_NNF(And([Literal('a'), True]))
+    (False, And(Literal(a), True))
+    """
+    def __init__(self, maxsize=CACHE_SIZE, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self._results = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._db = None
+        self._db_pid = None
+
+    def _connection(self):
+        # connections must not be shared with forked worker processes
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=DB_TIMEOUT)
+            self._db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB)')
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _remember(self, key, value):
+        self._results[key] = value
+        self._results.move_to_end(key)
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def _lookup(self, key, compute):
+        if key in self._results:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return self._results[key]
+
+        if self.path is not None:
+            row = self._connection().execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                value = pickle.loads(row[0])
+                self._remember(key, value)
+                return value
+
+        self.misses += 1
+        value = compute()
+        self._remember(key, value)
+
+        if self.path is not None:
+            with self._connection() as db:
+                db.execute('INSERT OR REPLACE INTO results VALUES (?, ?)', (key, pickle.dumps(value)))
+
+        return value
+
+    def _check(self, name, formula, check):
+        key, _ = fingerprint(formula)
+        return self._lookup(f"{name}:{key}", lambda: check(formula))
+
+    def _conversion(self, name, formula, convert):
+        key, mapping = fingerprint(formula)
+        result = self._lookup(f"{name}:{key}", lambda: rename_atoms(convert(formula), mapping))
+        return rename_atoms(result, {canonical: name for name, canonical in mapping.items()})
+
+    def to_NNF(self, formula):
+        import utils
+        return self._conversion('NNF', formula, utils.to_NNF)
+
+    def to_DNF(self, formula, minimize=False):
+        import utils
+        return self._conversion('DNF-min' if minimize else 'DNF', formula, lambda f: utils.to_DNF(f, minimize=minimize))
+
+    def to_CNF(self, formula, minimize=False):
+        import utils
+        return self._conversion('CNF-min' if minimize else 'CNF', formula, lambda f: utils.to_CNF(f, minimize=minimize))
+
+    def is_satisfiable(self, formula, jobs=1):
+        import utils
+        return self._check('satisfiable', formula, lambda f: utils.is_satisfiable(f, jobs=jobs))
+
+    def is_valid(self, formula, jobs=1):
+        import utils
+        return self._check('valid', formula, lambda f: utils.is_valid(f, jobs=jobs))
+
+    def are_equivalent(self, formula1, formula2, jobs=1):
+        import utils
+        # a conjunction of both formulas renames them consistently and ignores their order
+        return self._check('equivalent', And([formula1, formula2]), lambda both: utils.are_equivalent(*both.children, jobs=jobs))
+
+    def stats(self):
+        """
+        get the numbers of hits (of them served from disk), misses and results in memory
+        """
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'size': len(self._results)}
+
+    def clear(self):
+        self._results.clear()
+        if self.path is not None:
+            with self._connection() as db:
+                db.execute('DELETE FROM results')
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,273 @@
+#!/usr/bin/python
+
+"""
+Compiles formulas to specialized python functions for bulk evaluation.
+"""
+
+from syntax import *
+from traversal import children, fold, iter_nodes
+import collections
+import weakref
+
+# subexpressions nested deeper than this get evaluated into local variables of their own,
+# which keeps the generated code within the limits of python's compiler
+MAX_EXPRESSION_DEPTH = 50
+# lazily evaluated subexpressions are nested functions, nesting them deeper than this would exceed the
+# recursion limit, so deeper ones get evaluated eagerly
+MAX_LAZY_DEPTH = 100
+
+# templates of the generated expressions, either with short-circuiting boolean operators
+# or with bitwise operators working on whole columns of values at once
+_LOGICAL_OPS = {
+    'not': '(not %s)',
+    'and': ' and ', 'or': ' or ', 'true': 'True', 'false': 'False',
+    'impl': '(not %s or %s)',
+    'equiv': '((not %s) == (not %s))',
+    'short_circuit': True,
+}
+_BITWISE_OPS = {
+    'not': '(%s ^ ones)',
+    'and': ' & ', 'or': ' | ', 'true': 'ones', 'false': '(ones ^ ones)',
+    'impl': '((%s ^ ones) | %s)',
+    'equiv': '(%s ^ %s ^ ones)',
+    'short_circuit': False,
+}
+
+# children of a node, which get evaluated whenever the node does, in spite of short-circuiting
+def _strict_children(node):
+    if type(node) == And or type(node) == Or:
+        return node.children[:1]
+    elif type(node) == Implication:
+        return (node.lhs,)
+    return children(node)
+
+def _strict_nodes(formula):
+    """
+    get the nodes, which get evaluated on every evaluation of the formula with short-circuiting operators
+
+    >>> a, b, c = Literal('a'), Literal('b'), Literal('c')
+    >>> sorted(map(repr, _strict_nodes(Or([a, Implication(b, c)]))))
+    ['Literal(a)', 'Or(Literal(a), Implication(Literal(b), Literal(c)))']
+    """
+    strict = {formula}
+    stack = [formula]
+    while stack:
+        for child in _strict_children(stack.pop()):
+            if child not in strict:
+                strict.add(child)
+                stack.append(child)
+    return strict
+
+def _generate_source(formula, positions, access, ops):
+    # count the parents of every node, shared nodes are evaluated only once
+    parents = collections.Counter(child for node in iter_nodes(formula) for child in children(node))
+
+    # shared and deep nodes get names: the ones evaluated on every path are assigned before the result is
+    # computed, the others are nested functions called at their first use, which memoize their values in '_m',
+    # so short-circuiting skips them like inline subexpressions
+    strict = _strict_nodes(formula) if ops['short_circuit'] else None
+    statements = []
+
+    # get the expression, its nesting depth and the nesting depth of the lazy functions it calls for a node
+    def generate(node, child_results):
+        depth = max((child_depth for _, child_depth, _ in child_results), default=0) + 1
+        lazy_depth = max((child_lazy_depth for _, _, child_lazy_depth in child_results), default=0)
+        child_exprs = [expr for expr, _, _ in child_results]
+
+        if type(node) == Literal:
+            if node.name not in positions:
+                raise ValueError("atom '%s' is not assigned" % node.name)
+            expr = access % positions[node.name]
+            if node.negated:
+                expr = ops['not'] % expr
+        elif type(node) == bool:
+            expr = ops['true'] if node else ops['false']
+        elif type(node) == And:
+            expr = '(%s)' % ops['and'].join(child_exprs) if child_exprs else ops['true']
+        elif type(node) == Or:
+            expr = '(%s)' % ops['or'].join(child_exprs) if child_exprs else ops['false']
+        elif type(node) == Negation:
+            expr = ops['not'] % child_exprs[0]
+        elif type(node) == Implication:
+            expr = ops['impl'] % tuple(child_exprs)
+        else:
+            expr = ops['equiv'] % tuple(child_exprs)
+
+        if type(node) == Literal or (parents[node] <= 1 and depth < MAX_EXPRESSION_DEPTH):
+            return expr, depth, lazy_depth
+
+        index = len(statements)
+        if strict is None or node in strict or lazy_depth >= MAX_LAZY_DEPTH:
+            statements.append('    _n%d = %s\n' % (index, expr))
+            return '_n%d' % index, 1, 0
+
+        statements.append('    def _n%d():\n        _m[%d] = value = %s\n        return value\n' % (index, index, expr))
+        return '(_m[%d] if %d in _m else _n%d())' % (index, index, index), 1, lazy_depth + 1
+
+    expr, _, _ = fold(formula, generate)
+
+    memo = '    _m = {}\n' if any(statement.startswith('    def ') for statement in statements) else ''
+    return 'def _formula(v, ones):\n%s%s    return %s\n' % (memo, ''.join(statements), expr)
+
+def _build_function(formula, positions, access, ops):
+    namespace = {}
+    exec(compile(_generate_source(formula, positions, access, ops), '<formula>', 'exec'), namespace)
+    return namespace['_formula']
+
+class CompiledFormula:
+    """
+    A formula compiled to python functions of the values of its atoms.
+
+    Values can be given as a sequence (e.g. an assignment, whose fields are ordered like 'atoms') or as an
+    integer, whose bit i holds the value of the i-th atom.
+
+    >>> compiled = compile_formula(Implication(Literal('a'), Literal('b')), ['a', 'b'])
+    >>> compiled((True, False)), compiled(0b10)
+    (False, True)
+    >>> compiled.evaluate_many([(False, False), (True, False), (True, True)])
+    [True, False, True]
+    """
+    def __init__(self, formula, atoms, functions=None):
+        self.formula = formula
+        self.atoms = tuple(atoms)
+        self._positions = {name: i for i, name in enumerate(self.atoms)}
+        # generated functions by kind, shared with the cache of compile_formula, which must not reference
+        # the formula
+        self._functions = {} if functions is None else functions
+        self._sequence_function = self._function('sequence', 'v[%d]', _LOGICAL_OPS)
+
+    def _function(self, kind, access, ops):
+        function = self._functions.get(kind)
+        if function is None:
+            function = self._functions[kind] = _build_function(self.formula, self._positions, access, ops)
+        return function
+
+    def __call__(self, values):
+        if isinstance(values, int):
+            return self.evaluate_row(values)
+        else:
+            return self._sequence_function(values, True)
+
+    def evaluate_row(self, row):
+        """
+        evaluate the formula on an assignment encoded as bit-vector
+        """
+        return bool(self._function('row', '(v >> %d & 1)', _LOGICAL_OPS)(row, True))
+
+    def evaluate_columns(self, columns, ones):
+        """
+        evaluate the formula bit-parallel on columns of values (one per atom), 'ones' is the column of all
+        true values. Works for integers (see truth_table) and NumPy boolean arrays.
+
+        >>> compiled = compile_formula(Or([Literal('a'), Literal('b', negated=True)]), ['a', 'b'])
+        >>> bin(compiled.evaluate_columns([0b1010, 0b1100], 0b1111))
+        '0b1011'
+        """
+        return self._function('columns', 'v[%d]', _BITWISE_OPS)(columns, ones)
+
+    def evaluate_many(self, assignments):
+        """
+        evaluate the formula on many assignments in one call. A 2-dimensional NumPy array with one row per
+        assignment gets evaluated column-wise and yields a boolean array, any other iterable a list.
+        """
+        if getattr(assignments, 'ndim', None) == 2:
+            import numpy as np
+
+            matrix = np.asarray(assignments, dtype=bool)
+            columns = [matrix[:, i] for i in range(matrix.shape[1])]
+            ones = np.ones(matrix.shape[0], dtype=bool)
+
+            return self.evaluate_columns(columns, ones) & ones
+
+        return [self._sequence_function(values, True) for values in assignments]
+
+# generated functions of the compiled formulas by formula and order of atoms. Formulas are weak keys, so the
+# cache does not keep them alive.
+_compiled = weakref.WeakKeyDictionary()
+
+# formulas evaluated once by 'evaluate'
+_evaluated = weakref.WeakSet()
+
+def compile_formula(formula, atoms=None):
+    """
+    compile a formula wrt. the given order of atoms (by default sorted by name)
+
+    The generated functions are cached as long as the formula is alive, so compiling the same formula again
+    is cheap.
+
+    >>> compile_formula(And([Literal('a'), Negation(Literal('b'))]))((True, False))
+    True
+    """
+    if atoms is None:
+        from utils import get_atoms
+        atoms = sorted(get_atoms(formula))
+    atoms = tuple(atoms)
+
+    if type(formula) == bool:
+        # constants can not be weak keys, compiling them is cheap anyway
+        return CompiledFormula(formula, atoms)
+
+    by_atoms = _compiled.get(formula)
+    if by_atoms is None:
+        by_atoms = _compiled[formula] = {}
+    functions = by_atoms.get(atoms)
+    if functions is None:
+        functions = by_atoms[atoms] = {}
+
+    return CompiledFormula(formula, atoms, functions)
+
+def interpret(formula, values, atoms):
+    """
+    evaluate a formula on values ordered like 'atoms' without compiling it
+
+    >>> interpret(Implication(Literal('a'), Negation(Literal('b'))), (True, True), ('a', 'b'))
+    False
+    """
+    positions = {name: i for i, name in enumerate(atoms)}
+
+    def combine(node, results):
+        if type(node) == Literal:
+            if node.name not in positions:
+                raise ValueError("atom '%s' is not assigned" % node.name)
+            return bool(values[positions[node.name]]) != node.negated
+        elif type(node) == bool:
+            return node
+        elif type(node) == And:
+            return all(results)
+        elif type(node) == Or:
+            return any(results)
+        elif type(node) == Negation:
+            return not results[0]
+        elif type(node) == Implication:
+            return not results[0] or results[1]
+        else:
+            return results[0] == results[1]
+
+    return fold(formula, combine)
+
+def evaluate(formula, values, atoms):
+    """
+    evaluate a formula on values ordered like 'atoms'. A formula is interpreted on its first evaluation and
+    compiled on the next ones, so only formulas evaluated more than once pay for compiling.
+
+    >>> f = Or([Literal('a'), Literal('b')])
+    >>> evaluate(f, (False, True), ('a', 'b')), f in _compiled
+    (True, False)
+    >>> evaluate(f, (False, False), ('a', 'b')), f in _compiled
+    (False, True)
+    """
+    if type(formula) == bool:
+        return formula
+
+    by_atoms = _compiled.get(formula)
+    if (by_atoms is None or tuple(atoms) not in by_atoms) and formula not in _evaluated:
+        _evaluated.add(formula)
+        return interpret(formula, values, atoms)
+
+    return compile_formula(formula, atoms)(values)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -5,7 +5,13 @@ provides printing functionality for formulas
 """
 
 from syntax import *
+from traversal import children
+from instrumentation import stats
 import enum
+import io
+
+# number of characters collected by format_to before they get written
+WRITE_BUFFER_SIZE = 1 << 16
 
 class OperatorSet:
     def __init__(self, true_sym, false_sym, neg_op, conj_op, disj_op, impl_op, equv_op):
@@ -20,37 +26,162 @@ class OperatorSet:
 unicode_ops = OperatorSet('⊤', '⊥', '¬', '∧', '∨', '=>', '<=>')
 ascii_ops = OperatorSet('T', 'F', '~', '*', '+', '=>', '<=>')
 
+# check if the text of a formula needs brackets when nested
+def _needs_brackets(formula):
+    if type(formula) == And or type(formula) == Or:
+        return len(formula.children) > 1
+    return type(formula) == Implication or type(formula) == Equivalence
+
+class _BufferedWriter:
+    def __init__(self, fileobj, size=WRITE_BUFFER_SIZE):
+        self.fileobj = fileobj
+        self.size = size
+        self.chunks = []
+        self.buffered = 0
+        self.written = 0
+
+    def write(self, text):
+        self.chunks.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.size:
+            self.flush()
+
+    # like write(separator.join(texts)), but in slices of about 'size' characters
+    def write_joined(self, separator, texts):
+        start = 0
+        length = self.buffered
+        for end in range(1, len(texts) + 1):
+            length += len(separator) + len(texts[end - 1])
+            if length >= self.size:
+                self.write((separator if start else '') + separator.join(texts[start:end]))
+                start = end
+                length = self.buffered
+        if start < len(texts):
+            self.write((separator if start else '') + separator.join(texts[start:]))
+
+    def flush(self):
+        self.fileobj.write(''.join(self.chunks))
+        self.written += self.buffered
+        self.chunks.clear()
+        self.buffered = 0
+
 class FormulaFormatter:
     def __init__(self, operators=unicode_ops):
         self.operators = operators
 
     def format(self, formula, top_level=True):
-        if isinstance(formula, bool):
-            return (self.operators.true if formula else self.operators.false)
-        elif isinstance(formula, Literal):
+        """
+        get the text of a formula. It is written by format_to, since building the texts of nested subformulas
+        would copy them at every level, which is quadratic in the depth.
+
+        >>> import functools, tracemalloc
+        >>> chain = functools.reduce(Implication, [Literal(f'x{i}') for i in range(20000)])
+        >>> tracemalloc.start()
+        >>> text = get_formatter().format(chain)
+        >>> peak = tracemalloc.get_traced_memory()[1]
+        >>> tracemalloc.stop()
+        >>> len(text), peak < 20 * len(text)
+        (188884, True)
+        """
+        out = io.StringIO()
+        self.format_to(formula, out, top_level)
+        return out.getvalue()
+
+    # text of a node without children, or None
+    def _leaf(self, formula):
+        if type(formula) == Literal:
             return (self.operators.negation if formula.negated else '') + formula.name
-        elif isinstance(formula, And):
-            if len(formula.children) == 0:
-                content = self.operators.true
-            else:
-                content = self.operators.conjunction.join(self.format(child, False) for child in formula.children)
-            return content if top_level or len(formula.children) <= 1 else '(%s)' % content
-        elif isinstance(formula, Or):
-            if len(formula.children) == 0:
-                content = self.operators.false
-            else:
-                content = self.operators.disjunction.join(self.format(child, False) for child in formula.children)
-            return content if top_level or len(formula.children) <= 1 else '(%s)' % content
-        elif isinstance(formula, Negation):
-            return self.operators.negation + self.format(formula.child, False)
-        elif isinstance(formula, Implication):
-            content = self.format(formula.lhs, False) + self.operators.implication + self.format(formula.rhs, False)
-            return content if top_level else '(%s)' % content 
-        elif isinstance(formula, Equivalence):
-            content = self.format(formula.lhs, False) + self.operators.equivalence + self.format(formula.rhs, False)
-            return content if top_level else '(%s)' % content
+        elif type(formula) == bool:
+            return self.operators.true if formula else self.operators.false
+        elif type(formula) == And and not formula.children:
+            return self.operators.true
+        elif type(formula) == Or and not formula.children:
+            return self.operators.false
+        return None
+
+    def _separator(self, formula):
+        if type(formula) == And:
+            return self.operators.conjunction
+        elif type(formula) == Or:
+            return self.operators.disjunction
+        elif type(formula) == Implication:
+            return self.operators.implication
         else:
-            raise SyntaxError("unknown formula type")
+            return self.operators.equivalence
+
+    def format_to(self, formula, fileobj, top_level=True):
+        """
+        write the text of 'format' to a file object in chunks of about WRITE_BUFFER_SIZE characters, without
+        building the text of any subformula. Shared subformulas are written at every occurrence.
+
+        >>> import io
+        >>> out = io.StringIO()
+        >>> get_formatter().format_to(all_ops, out, top_level=False)
+        >>> out.getvalue() == get_formatter().format(all_ops, top_level=False)
+        True
+
+        Long clauses are written in chunks as well:
+
+        >>> class Chunks(list):
+        ...     write = list.append
+        >>> chunks = Chunks()
+        >>> get_formatter().format_to(Or([Literal(f'x{i}') for i in range(100000)]), chunks)
+        >>> max(map(len, chunks)) < 2 * WRITE_BUFFER_SIZE, ''.join(chunks).count('+')
+        (True, 99999)
+        """
+        writer = _BufferedWriter(fileobj)
+        write = writer.write
+
+        # texts of the literals written so far
+        literals = {}
+        def leaf_text(node):
+            text = literals.get(node)
+            if text is None:
+                text = self._leaf(node)
+                if type(node) == Literal:
+                    literals[node] = text
+            return text
+
+        # nodes with the index of their next child and whether they are enclosed in brackets
+        stack = [(formula, 0, not top_level and _needs_brackets(formula))]
+        while stack:
+            node, index, bracketed = stack.pop()
+
+            if index == 0:
+                if bracketed:
+                    write('(')
+                leaf = leaf_text(node)
+                if leaf is not None:
+                    write(leaf)
+                    if bracketed:
+                        write(')')
+                    continue
+                elif type(node) == Negation:
+                    write(self.operators.negation)
+                elif type(node) == And or type(node) == Or:
+                    # terms and clauses of normal forms are written at once
+                    texts = [leaf_text(child) for child in node.children]
+                    if None not in texts:
+                        writer.write_joined(self._separator(node), texts)
+                        if bracketed:
+                            write(')')
+                        continue
+
+            node_children = children(node)
+            if index == len(node_children):
+                if bracketed:
+                    write(')')
+                continue
+            elif index > 0:
+                write(self._separator(node))
+
+            stack.append((node, index + 1, bracketed))
+            child = node_children[index]
+            stack.append((child, 0, _needs_brackets(child)))
+
+        writer.flush()
+        if stats.enabled:
+            stats.count('formatted_characters', writer.written)
 
 
 def get_formatter(unicode=False):
@@ -4,9 +4,18 @@
 Creates formulas (their syntax trees) from strings.
 """
 
-import pyparsing as pp
 import syntax as sx
+from instrumentation import stats
 import functools
+import re
+
+class ParseError(ValueError):
+    """
+    raised if a string is not a well-formed formula
+    """
+    def __init__(self, msg, loc):
+        super().__init__(f"{msg} (at char {loc})")
+        self.loc = loc
 
 def lit_conv(toks):
     return sx.Literal(toks[0])
@@ -30,9 +39,150 @@ def equiv_conv(toks):
     return functools.reduce(sx.Equivalence, toks)
 
 def to_operator(lits):
+    import pyparsing as pp
+
     return functools.reduce(pp.ParserElement.__or__, map(pp.Literal, lits))
 
 
+class PyparsingEngine:
+    """
+    Grammar for the formula parser built with pyparsing.
+    """
+    def __init__(self, neg_ops, or_ops, and_ops, impl_ops, equiv_ops, open_bracket, close_bracket):
+        import pyparsing as pp
+
+        self.and_op = to_operator(and_ops)
+        self.or_op = to_operator(or_ops)
+        self.neg_op = to_operator(neg_ops)
+        self.impl_op = to_operator(impl_ops)
+        self.equiv_op = to_operator(equiv_ops)
+        self.bracket_open = to_operator(open_bracket)
+        self.bracket_close = to_operator(close_bracket)
+        self.literal_chars = pp.alphas
+
+        self.formula = pp.Forward()
+
+        self.literal = pp.Word(self.literal_chars).set_parse_action(lit_conv)
+        self.base_formula = self.literal | (self.bracket_open.suppress() + self.formula + self.bracket_close.suppress())
+        self.neg_formula = (pp.ZeroOrMore(self.neg_op) + self.base_formula).set_parse_action(neg_conv)
+        self.and_formula = pp.DelimitedList(self.neg_formula, self.and_op).set_parse_action(and_conv)
+        self.or_formula = pp.DelimitedList(self.and_formula, self.or_op).set_parse_action(or_conv)
+        self.impl_formula = pp.DelimitedList(self.or_formula, self.impl_op).set_parse_action(impl_conv)
+        self.equiv_formula = pp.DelimitedList(self.impl_formula, self.equiv_op).set_parse_action(equiv_conv)
+        self.formula << self.equiv_formula
+
+    def parse(self, f):
+        import pyparsing as pp
+
+        try:
+            return self.formula.parse_string(f)[0]
+        except pp.ParseBaseException as e:
+            raise ParseError(e.msg, e.loc) from e
+
+
+# levels of the binary operators, ordered by increasing precedence
+_EQUIV, _IMPL, _OR, _AND = range(4)
+
+def _alternatives(ops):
+    return '|'.join(map(re.escape, ops))
+
+def _reduce_level(level, operands):
+    if level == _AND:
+        return sx.And(operands) if len(operands) > 1 else operands[0]
+    elif level == _OR:
+        return sx.Or(operands) if len(operands) > 1 else operands[0]
+    elif level == _IMPL:
+        return functools.reduce(sx.Implication, operands)
+    else:
+        return functools.reduce(sx.Equivalence, operands)
+
+def _reduce_levels(levels, level):
+    # combine the operands of all levels above 'level' into one operand of 'level'
+    for higher in range(_AND, level, -1):
+        levels[higher - 1].append(_reduce_level(higher, levels[higher]))
+        levels[higher] = []
+
+class FastEngine:
+    """
+    Hand-written parser: a tokenizer driven by the parser state and an operator precedence parser, which keeps
+    its state on an explicit stack instead of recursing, so nesting depth is only limited by memory.
+
+    Tokens are matched in the same order as in the pyparsing grammar. Unlike the pyparsing grammar, the whole
+    string has to be a formula.
+    """
+    def __init__(self, neg_ops, or_ops, and_ops, impl_ops, equiv_ops, open_bracket, close_bracket):
+        # tokens allowed where an operand is expected
+        self.operand_re = re.compile(r'[ \n\t\r]*(?:(?P<neg>%s)|(?P<lit>[A-Za-z]+)|(?P<open>%s))'
+                                     % (_alternatives(neg_ops), _alternatives(open_bracket)))
+        # tokens allowed after an operand
+        self.operator_re = re.compile(r'[ \n\t\r]*(?:(?P<and>%s)|(?P<or>%s)|(?P<impl>%s)|(?P<equiv>%s)|(?P<close>%s))'
+                                      % tuple(map(_alternatives, (and_ops, or_ops, impl_ops, equiv_ops, close_bracket))))
+        self.end_re = re.compile(r'[ \n\t\r]*\Z')
+
+    def parse(self, f):
+        operand_match = self.operand_re.match
+        operator_match = self.operator_re.match
+        levels = {'and': _AND, 'or': _OR, 'impl': _IMPL, 'equiv': _EQUIV}
+
+        # operands collected per level of the innermost bracket
+        operands = [[], [], [], []]
+        # negations in front of the next operand
+        negations = 0
+        # state of the enclosing brackets
+        outer = []
+
+        pos = 0
+        while True:
+            # operand
+            m = operand_match(f, pos)
+            if m is None:
+                raise ParseError("expected literal, negation or bracket", pos)
+            pos = m.end()
+            kind = m.lastgroup
+
+            if kind == 'neg':
+                negations += 1
+                continue
+            elif kind == 'open':
+                outer.append((operands, negations))
+                operands, negations = [[], [], [], []], 0
+                continue
+
+            node = sx.Literal(m.group('lit'))
+
+            # operators and closing brackets following the operand
+            while True:
+                for i in range(negations):
+                    node = sx.Negation(node)
+                operands[_AND].append(node)
+
+                m = operator_match(f, pos)
+                if m is None or m.lastgroup != 'close':
+                    break
+                if not outer:
+                    raise ParseError("unexpected closing bracket", pos)
+                pos = m.end()
+
+                _reduce_levels(operands, _EQUIV)
+                node = _reduce_level(_EQUIV, operands[_EQUIV])
+                operands, negations = outer.pop()
+
+            if m is None:
+                if self.end_re.match(f, pos) is None:
+                    raise ParseError("expected operator", pos)
+                if outer:
+                    raise ParseError("expected closing bracket", len(f))
+
+                _reduce_levels(operands, _EQUIV)
+                return _reduce_level(_EQUIV, operands[_EQUIV])
+
+            pos = m.end()
+            negations = 0
+            _reduce_levels(operands, levels[m.lastgroup])
+
+
+ENGINES = {'fast': FastEngine, 'pyparsing': PyparsingEngine}
+
 class FormulaParser:
     """
     Converts a formula from a string into a syntax tree. Currently ASCII-symbols
@@ -60,34 +210,34 @@ class FormulaParser:
     Or(And(Literal(a), Literal(b)), Literal(c))
     >>> FormulaParser(or_ops=("*",), and_ops=("+",)).parse("a*b+c")
     Or(Literal(a), And(Literal(b), Literal(c)))
-    """
-    def __init__(self, neg_ops=("¬", "~"), or_ops=("+", "∨"), and_ops=("*", "∧"), impl_ops=("=>",), equiv_ops=("<=>",), open_bracket=("(",), close_bracket=(")",)):
-        self.and_op = to_operator(and_ops)
-        self.or_op = to_operator(or_ops)
-        self.neg_op = to_operator(neg_ops)
-        self.impl_op = to_operator(impl_ops)
-        self.equiv_op = to_operator(equiv_ops)
-        self.bracket_open = to_operator(open_bracket)
-        self.bracket_close = to_operator(close_bracket)
-        self.literal_chars = pp.alphas
 
-        self.formula = pp.Forward()
+    The default engine is a hand-written parser, the pyparsing grammar is available as fallback:
+    >>> FormulaParser(engine='pyparsing').parse("~(a+b)*~~c")
+    And(Negation(Or(Literal(a), Literal(b))), Negation(Negation(Literal(c))))
+    >>> FormulaParser().parse("~(a+b)*~~c")
+    And(Negation(Or(Literal(a), Literal(b))), Negation(Negation(Literal(c))))
+    >>> FormulaParser().parse("(" * 100000 + "a" + ")" * 100000)
+    Literal(a)
+    >>> FormulaParser().parse("a+(b")
+    Traceback (most recent call last):
+    ...
+    ParseError: expected closing bracket (at char 4)
+    """
+    def __init__(self, neg_ops=("¬", "~"), or_ops=("+", "∨"), and_ops=("*", "∧"), impl_ops=("=>",), equiv_ops=("<=>",), open_bracket=("(",), close_bracket=(")",), engine='fast'):
+        if engine not in ENGINES:
+            raise ValueError(f"unknown parser engine '{engine}'")
 
-        self.literal = pp.Word(self.literal_chars).set_parse_action(lit_conv)
-        self.base_formula = self.literal | (self.bracket_open.suppress() + self.formula + self.bracket_close.suppress())
-        self.neg_formula = (pp.ZeroOrMore(self.neg_op) + self.base_formula).set_parse_action(neg_conv)
-        self.and_formula = pp.DelimitedList(self.neg_formula, self.and_op).set_parse_action(and_conv)
-        self.or_formula = pp.DelimitedList(self.and_formula, self.or_op).set_parse_action(or_conv)
-        self.impl_formula = pp.DelimitedList(self.or_formula, self.impl_op).set_parse_action(impl_conv)
-        self.equiv_formula = pp.DelimitedList(self.impl_formula, self.equiv_op).set_parse_action(equiv_conv)
-        self.formula << self.equiv_formula
+        self.engine = ENGINES[engine](neg_ops, or_ops, and_ops, impl_ops, equiv_ops, open_bracket, close_bracket)
 
     def parse(self, f):
-        return self.formula.parse_string(f)[0]
+        if stats.enabled:
+            stats.count('parsed_formulas')
+            stats.count('parsed_characters', len(f))
+
+        return self.engine.parse(f)
 
 
 if __name__ == '__main__':
     import doctest
 
     doctest.testmod()
-
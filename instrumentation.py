@@ -0,0 +1,115 @@
+#!/usr/bin/python
+
+"""
+Counters and phase timings of the hot paths, disabled by default.
+
+Instrumented code checks 'stats.enabled' before counting and counts once per
+call instead of once per node, so disabled instrumentation costs a single
+attribute lookup per call.
+
+Counters:
+    nodes_visited             nodes of formulas (or other items) visited by traversals
+    truth_tables, truth_table_rows
+                              truth tables computed and their total number of rows
+    assignments_materialized  assignments constructed as namedtuples
+    set_operations            elements inserted into or compared against sets of assignments
+    solver_decisions, solver_conflicts, solver_propagations, solver_restarts
+                              work of the CDCL solver
+    parsed_formulas, parsed_characters, formatted_characters
+                              work of the parser and the formatter
+"""
+
+import collections
+import contextlib
+import json
+import time
+
+class Stats:
+    """
+    collection of named counters and accumulated timings of named phases
+
+    >>> s = Stats()
+    >>> s.count('nodes_visited', 3)
+    >>> s.as_dict()
+    {'counters': {}, 'timings': {}}
+    >>> s.enable()
+    >>> s.count('nodes_visited', 3)
+    >>> with s.phase('parse'):
+    ...     s.count('nodes_visited')
+    >>> s.as_dict()['counters'], list(s.as_dict()['timings'])
+    ({'nodes_visited': 4}, ['parse'])
+    """
+    def __init__(self):
+        self.enabled = False
+        self.counters = collections.Counter()
+        self.timings = collections.defaultdict(float)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.counters.clear()
+        self.timings.clear()
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] += n
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        add the wall time spent in the with-block to the timing of the phase
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+
+    def timed(self, name, function, *args, **kwargs):
+        """
+        call a function within the phase 'name'
+        """
+        with self.phase(name):
+            return function(*args, **kwargs)
+
+    def as_dict(self):
+        return {'counters': dict(sorted(self.counters.items())), 'timings': dict(self.timings)}
+
+    def merge(self, other):
+        """
+        add the counters and timings of another stats object or its 'as_dict' representation
+        """
+        if isinstance(other, Stats):
+            other = other.as_dict()
+
+        self.counters.update(other['counters'])
+        for name, seconds in other['timings'].items():
+            self.timings[name] += seconds
+
+    def format(self):
+        """
+        get the counters and timings as text, one per line
+        """
+        lines = [f"{name}: {value}" for name, value in sorted(self.counters.items())]
+        lines += [f"time {name}: {seconds:.6f}s" for name, seconds in self.timings.items()]
+        return '\n'.join(lines)
+
+    def to_json(self):
+        return json.dumps(self.as_dict())
+
+# the stats of the current process
+stats = Stats()
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
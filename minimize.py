@@ -0,0 +1,288 @@
+#!/usr/bin/python
+
+"""
+Two-level logic minimization of truth tables (see truth_table).
+
+Cubes, i.e. conjunctions of literals, are pairs of bitmasks (value, care): atom i
+occurs in the cube iff bit i of 'care' is set, and it is negated iff bit i of
+'value' is not set. Bits of 'value' outside of 'care' are 0. Up to EXACT_LIMIT
+atoms, minimal covers are computed with Quine-McCluskey and Petrick's method,
+otherwise with an Espresso-like expand/reduce/irredundant loop.
+"""
+
+import math
+import time
+
+from truth_table import full_mask, column_mask, iter_rows
+
+# largest number of atoms, for which the cover is computed exactly
+EXACT_LIMIT = 10
+# largest number of products in Petrick's method, before falling back to a greedy cover
+PETRICK_LIMIT = 1000
+# seconds spent on improving a cover
+TIME_BUDGET = 1.0
+
+def cube_literals(cube):
+    return cube[1].bit_count()
+
+def cube_rows(cube, n_atoms, columns=None):
+    """
+    get the truth table of a cube, 'columns' are the truth tables of the atoms if precomputed
+
+    >>> bin(cube_rows((0b01, 0b11), 2))
+    '0b10'
+    >>> bin(cube_rows((0b00, 0b10), 2))
+    '0b11'
+    """
+    if columns is None:
+        columns = [column_mask(i, n_atoms) for i in range(n_atoms)]
+
+    value, care = cube
+    rows = full_mask(n_atoms)
+
+    for i, column in enumerate(columns):
+        if care >> i & 1:
+            rows &= column if value >> i & 1 else ~column
+
+    return rows
+
+def prime_implicants(table, n_atoms):
+    """
+    get all prime implicants of a truth table (Quine-McCluskey)
+
+    >>> sorted(prime_implicants(0b1110, 2))
+    [(1, 1), (2, 2)]
+    """
+    level = {(row, (1 << n_atoms) - 1) for row in iter_rows(table, n_atoms)}
+    primes = []
+
+    while level:
+        merged = set()
+        next_level = set()
+
+        for value, care in level:
+            for i in range(n_atoms):
+                bit = 1 << i
+                # merge with the cube, which differs only by the positive literal of atom i
+                if care & bit and not value & bit and (value | bit, care) in level:
+                    next_level.add((value, care & ~bit))
+                    merged.add((value, care))
+                    merged.add((value | bit, care))
+
+        primes.extend(cube for cube in level if cube not in merged)
+        level = next_level
+
+    return primes
+
+def _greedy_cover(cubes, masks, uncovered):
+    # repeatedly choose the cube covering the most uncovered rows
+    cover = []
+    while uncovered:
+        best = max(range(len(cubes)), key=lambda j: ((masks[j] & uncovered).bit_count(), -cube_literals(cubes[j])))
+        cover.append(cubes[best])
+        uncovered &= ~masks[best]
+    return cover
+
+def _petrick(cubes, masks, uncovered, n_atoms):
+    # sets of cubes (as bitmasks over their indices) covering each row, rows with equal sets are redundant
+    sums = {sum(1 << j for j, mask in enumerate(masks) if mask >> row & 1) for row in iter_rows(uncovered, n_atoms)}
+
+    products = {0}
+    for cube_set in sorted(sums, key=int.bit_count):
+        products = {product | 1 << j for product in products for j in range(cube_set.bit_length()) if cube_set >> j & 1}
+
+        # absorption: drop products, which contain other products
+        minimal = []
+        for product in sorted(products, key=int.bit_count):
+            if not any(other & product == other for other in minimal):
+                minimal.append(product)
+        products = minimal
+
+        if len(products) > PETRICK_LIMIT:
+            return None
+
+    def cost(product):
+        return (product.bit_count(), sum(cube_literals(cubes[j]) for j in range(len(cubes)) if product >> j & 1))
+
+    best = min(products, key=cost)
+    return [cube for j, cube in enumerate(cubes) if best >> j & 1]
+
+def exact_cover(table, n_atoms):
+    """
+    get a minimal set of prime implicants covering a truth table: essential primes first, then Petrick's
+    method, which falls back to a greedy cover beyond PETRICK_LIMIT products
+    """
+    primes = prime_implicants(table, n_atoms)
+    columns = [column_mask(i, n_atoms) for i in range(n_atoms)]
+    masks = [cube_rows(prime, n_atoms, columns) for prime in primes]
+
+    # rows covered by exactly one prime
+    once = many = 0
+    for mask in masks:
+        many |= once & mask
+        once = (once | mask) & ~many
+
+    cover = [prime for prime, mask in zip(primes, masks) if mask & once]
+    uncovered = table
+    for prime, mask in zip(primes, masks):
+        if mask & once:
+            uncovered &= ~mask
+
+    if uncovered:
+        rest = [(prime, mask) for prime, mask in zip(primes, masks) if mask & uncovered and not mask & once]
+        rest_primes = [prime for prime, mask in rest]
+        rest_masks = [mask for prime, mask in rest]
+
+        chosen = _petrick(rest_primes, rest_masks, uncovered, n_atoms)
+        if chosen is None:
+            chosen = _greedy_cover(rest_primes, rest_masks, uncovered)
+        cover.extend(chosen)
+
+    return cover
+
+# drop literals from a cube in the given order as long as it does not intersect the off-set
+def _expand(cube, rows, off, order):
+    value, care = cube
+
+    for i in order:
+        bit = 1 << i
+        if care & bit:
+            # the rows of the cube with the literal of atom i flipped, which are 2^i rows apart
+            flipped = rows >> bit if value & bit else rows << bit
+            if not flipped & off:
+                value &= ~bit
+                care &= ~bit
+                rows |= flipped
+
+    return (value, care), rows
+
+# get every cube of a cover with its rows and the union of the rows of all later cubes. The truth tables of
+# the cubes are large, so only those of one block of cubes and the unions behind every block are kept.
+def _with_later_rows(cover, rows_of):
+    block = max(1, math.isqrt(len(cover)))
+    starts = range(0, len(cover), block)
+
+    tails = [0] * (len(starts) + 1)
+    for b in reversed(range(len(starts))):
+        tails[b] = tails[b + 1]
+        for cube in cover[starts[b]:starts[b] + block]:
+            tails[b] |= rows_of(cube)
+
+    for b, start in enumerate(starts):
+        cubes = cover[start:start + block]
+        masks = [rows_of(cube) for cube in cubes]
+
+        later = [tails[b + 1]] * len(cubes)
+        for j in range(len(cubes) - 2, -1, -1):
+            later[j] = later[j + 1] | masks[j + 1]
+
+        yield from zip(cubes, masks, later)
+
+# drop cubes, which are covered by the others, None if the deadline passed
+def _irredundant(cover, rows_of, deadline):
+    kept, prefix = [], 0
+
+    for cube, mask, later in _with_later_rows(cover, rows_of):
+        if time.monotonic() >= deadline:
+            return None
+        if mask & ~(prefix | later):
+            kept.append(cube)
+            prefix |= mask
+
+    return kept
+
+# shrink every cube to the smallest cube containing the rows only it covers, None if the deadline passed
+def _reduce(cover, rows_of, columns, deadline):
+    reduced, prefix = [], 0
+
+    for cube, mask, later in _with_later_rows(cover, rows_of):
+        if time.monotonic() >= deadline:
+            return None
+
+        unique = mask & ~(prefix | later)
+        if not unique:
+            continue
+
+        value = care = 0
+        for i, column in enumerate(columns):
+            if not unique & ~column:
+                value |= 1 << i
+                care |= 1 << i
+            elif not unique & column:
+                care |= 1 << i
+
+        reduced.append((value, care))
+        prefix |= rows_of((value, care))
+
+    return reduced
+
+def _cost(cover):
+    return (len(cover), sum(map(cube_literals, cover)))
+
+def heuristic_cover(table, n_atoms, time_budget=TIME_BUDGET):
+    """
+    get a cover of a truth table, which is irredundant but not necessarily minimal (Espresso-like).
+    Improving the cover stops after 'time_budget' seconds, rows not covered by then are covered by minterms.
+    """
+    deadline = time.monotonic() + time_budget
+    off = table ^ full_mask(n_atoms)
+    columns = [column_mask(i, n_atoms) for i in range(n_atoms)]
+    order = list(range(n_atoms))
+
+    def rows_of(cube):
+        return cube_rows(cube, n_atoms, columns)
+
+    # expand the lowest uncovered row into a prime until everything is covered
+    cover = []
+    uncovered = table
+    while uncovered:
+        if time.monotonic() >= deadline:
+            return cover + [(row, (1 << n_atoms) - 1) for row in iter_rows(uncovered, n_atoms)]
+
+        row = (uncovered & -uncovered).bit_length() - 1
+        cube, mask = _expand((row, (1 << n_atoms) - 1), 1 << row, off, order)
+        cover.append(cube)
+        uncovered &= ~mask
+
+    cover = _irredundant(cover, rows_of, deadline) or cover
+
+    # reduce and re-expand with different orders of the literals while the cover gets smaller
+    for rotation in range(1, n_atoms + 1):
+        order = order[1:] + order[:1] if rotation % 2 else order[::-1]
+
+        new_cover = _reduce(cover, rows_of, columns, deadline)
+        if new_cover is None:
+            break
+        new_cover = [_expand(cube, rows_of(cube), off, order)[0] for cube in new_cover]
+        new_cover = _irredundant(new_cover, rows_of, deadline)
+        if new_cover is None:
+            break
+
+        if _cost(new_cover) < _cost(cover):
+            cover = new_cover
+
+    return cover
+
+def minimize(table, n_atoms, exact_limit=EXACT_LIMIT, time_budget=TIME_BUDGET):
+    """
+    get a small list of cubes covering exactly the rows set in a truth table
+
+    >>> minimize(0b1110, 2)
+    [(1, 1), (2, 2)]
+    >>> minimize(0b1110, 2, exact_limit=0)
+    [(1, 1), (2, 2)]
+    >>> minimize(0b1111, 2), minimize(0, 2)
+    ([(0, 0)], [])
+    """
+    if n_atoms <= exact_limit:
+        cover = exact_cover(table, n_atoms)
+    else:
+        cover = heuristic_cover(table, n_atoms, time_budget)
+
+    return sorted(cover, key=lambda cube: (cube_literals(cube), cube[1], cube[0]))
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,184 @@
+#!/usr/bin/python
+
+"""
+Model counting (#SAT) without enumerating assignments.
+
+A DPLL-style counter on integer clauses (see clauses): after unit propagation
+the clauses fall apart into components without common variables, whose counts
+get multiplied, and every component is counted only once (component caching).
+Counting can be projected to a set of variables, all other variables (like the
+helpers of a Tseitsin encoding) are only required to have some satisfying
+value. Components without projected variables are therefore decided by the SAT
+solver instead of being counted.
+"""
+
+from clauses import VariableTable, TseitinEncoder
+import collections
+
+# simplify clauses by unit propagation starting from 'assumption', returns the remaining clauses and the set
+# of assigned literals, or None on a conflict
+def _propagate(clauses, assumption=None):
+    assigned = set()
+    pending = [] if assumption is None else [assumption]
+
+    while True:
+        for lit in pending:
+            if -lit in assigned:
+                return None
+            assigned.add(lit)
+
+        pending = []
+        remaining = []
+        for clause in clauses:
+            if any(lit in assigned for lit in clause):
+                continue
+
+            reduced = tuple(lit for lit in clause if -lit not in assigned)
+            if not reduced:
+                return None
+            elif len(reduced) == 1:
+                pending.append(reduced[0])
+            else:
+                remaining.append(reduced)
+
+        clauses = remaining
+        if not pending:
+            return clauses, assigned
+
+# split clauses into groups without common variables
+def _components(clauses):
+    parent = {}
+
+    def find(var):
+        while parent[var] != var:
+            parent[var] = parent[parent[var]]
+            var = parent[var]
+        return var
+
+    for clause in clauses:
+        for lit in clause:
+            parent.setdefault(abs(lit), abs(lit))
+        root = find(abs(clause[0]))
+        for lit in clause[1:]:
+            other = find(abs(lit))
+            if other != root:
+                parent[other] = root
+
+    groups = collections.defaultdict(list)
+    for clause in clauses:
+        groups[find(abs(clause[0]))].append(clause)
+
+    return list(groups.values())
+
+def _is_satisfiable(clauses):
+    from sat_solver import CDCLSolver
+
+    solver = CDCLSolver()
+    return all(solver.add_clause(clause) for clause in clauses) and solver.solve()
+
+def count_clauses(clauses, projected):
+    """
+    count the assignments to the variables in 'projected', which can be extended to a model of the clauses.
+    Projected variables not occurring in the clauses count as free.
+
+    >>> count_clauses([[1, 2], [-1, 3]], {1, 2, 3})
+    4
+    >>> count_clauses([[1, 2], [-1, 3]], {1, 2})
+    3
+    >>> count_clauses([[1, 2], [4, 5]], {1, 2, 3, 4, 5})
+    18
+    >>> count_clauses([[1], [-1]], {1})
+    0
+    """
+    projected = frozenset(projected)
+    cache = {}
+    results = []
+
+    # frames: ('count', clauses, assumption, scope) propagates an assumption and counts the remaining clauses
+    # with the projected variables in 'scope', ('component', clauses) counts a component, ('sum', key) and
+    # ('product', n, factor) combine the results of the frames pushed after them
+    clauses = [tuple(sorted(set(clause))) for clause in clauses]
+    stack = [('count', [clause for clause in clauses if not any(-lit in clause for lit in clause)], None, projected)]
+
+    while stack:
+        frame = stack.pop()
+
+        if frame[0] == 'count':
+            _, frame_clauses, assumption, scope = frame
+            propagated = _propagate(frame_clauses, assumption)
+            if propagated is None:
+                results.append(0)
+                continue
+
+            remaining, assigned = propagated
+            bound = {abs(lit) for lit in assigned} | {abs(lit) for clause in remaining for lit in clause}
+            components = _components(remaining)
+
+            stack.append(('product', len(components), 1 << len(scope - bound)))
+            stack.extend(('component', component) for component in components)
+        elif frame[0] == 'component':
+            component = frame[1]
+            key = tuple(sorted(component))
+
+            if key in cache:
+                results.append(cache[key])
+                continue
+
+            occurrences = collections.Counter(abs(lit) for clause in component for lit in clause if abs(lit) in projected)
+            if not occurrences:
+                cache[key] = int(_is_satisfiable(component))
+                results.append(cache[key])
+                continue
+
+            var = occurrences.most_common(1)[0][0]
+            scope = frozenset(occurrences)
+            stack.append(('sum', key))
+            stack.append(('count', component, -var, scope))
+            stack.append(('count', component, var, scope))
+        elif frame[0] == 'sum':
+            count = results.pop() + results.pop()
+            cache[frame[1]] = count
+            results.append(count)
+        else:
+            _, n, count = frame
+            for _ in range(n):
+                count *= results.pop()
+            results.append(count)
+
+    return results[0]
+
+def count_models(formula, projected_atoms=None):
+    """
+    count the assignments to 'projected_atoms' (by default the atoms of the formula), which can be extended
+    to a satisfying assignment of the formula. Atoms not occurring in the formula count as free.
+
+    >>> from syntax import *
+    >>> count_models(Or([Literal('a'), Literal('b'), Literal('c')]))
+    7
+    >>> count_models(And([Literal('a'), Literal('b', negated=True)]), ['a', 'b', 'c'])
+    2
+
+    Helpers of a Tseitsin encoding are excluded by projecting to the original atoms:
+
+    >>> from utils import onesided_tseitsin
+    >>> count_models(onesided_tseitsin(Or([Literal('a'), Literal('b')]), 't_%d'), ['a', 'b'])
+    3
+    """
+    import utils
+
+    if projected_atoms is None:
+        projected_atoms = sorted(utils.get_atoms(formula))
+
+    variables = VariableTable(projected_atoms)
+    projected = set(range(1, len(variables) + 1))
+
+    encoder = TseitinEncoder(variables)
+    encoder.add(formula)
+
+    return count_clauses(encoder.clauses, projected)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
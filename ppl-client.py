@@ -0,0 +1,55 @@
+#!/usr/bin/python
+
+if __name__ == '__main__':
+    import argparse
+    import daemon
+
+    arg_parser = argparse.ArgumentParser(description="Send requests to a server started by 'ppl-tool --serve' and print its responses as JSON lines")
+    arg_parser.add_argument('formula', metavar="FORMULA", nargs='?', help="formula in propositional logic, without FORMULA and --dimacs requests are read from stdin")
+    arg_parser.add_argument('--connect', '-c', metavar="ADDRESS", default=daemon.DEFAULT_ADDRESS, help=f"address of the server: HOST:PORT, PORT or the path of a Unix domain socket (default {daemon.DEFAULT_ADDRESS})")
+    arg_parser.add_argument('--all', '-a', action='store_true', help="perform all checks and conversions")
+    arg_parser.add_argument('--equivalent-to', metavar="OTHER_FORMULA", help="check if the formula is equivalent to the other formula")
+    arg_parser.add_argument('--is-satisfiable', action='store_true', help="check if there exists any satisfying assignment to the formula")
+    arg_parser.add_argument('--is-valid', action='store_true', help="check if the formula is valid")
+    arg_parser.add_argument('--to-dnf', action='store_true', help="convert the formula to disjunctive normal form")
+    arg_parser.add_argument('--to-nnf', action='store_true', help="convert the formula to negative normal form")
+    arg_parser.add_argument('--to-cnf', action='store_true', help="convert the formula to conjunctive normal form")
+    arg_parser.add_argument('--minimize', action='store_true', help="minimize the terms of the DNF and the clauses of the CNF")
+    arg_parser.add_argument('--write-dimacs', action='store_true', help="get the Tseitsin encoding of the formula in DIMACS format")
+    arg_parser.add_argument('--dimacs', metavar="FILE", help="check if the CNF in DIMACS format in FILE ('-' for stdin) is satisfiable and get a model")
+    args = arg_parser.parse_args()
+
+    import json
+    import sys
+
+    # the options given override the defaults of the server for every request
+    options = {}
+    checks = [check for check in ('is_satisfiable', 'is_valid', 'to_nnf', 'to_dnf', 'to_cnf') if args.all or getattr(args, check)]
+    if checks:
+        options['checks'] = checks
+    if args.equivalent_to:
+        options['equivalent_to'] = args.equivalent_to
+    if args.minimize:
+        options['minimize'] = True
+    if args.write_dimacs:
+        options['write_dimacs'] = True
+
+    def to_request(line):
+        if not options:
+            return line
+        request = json.loads(line) if line.lstrip().startswith('{') else {'formula': line.strip()}
+        return {**options, **request}
+
+    if args.dimacs:
+        with (sys.stdin if args.dimacs == '-' else open(args.dimacs, encoding='utf-8')) as infile:
+            requests = [{'dimacs': infile.read()}]
+    elif args.formula is not None:
+        requests = [{**options, 'formula': args.formula}]
+    else:
+        requests = (to_request(line) for line in sys.stdin if line.strip())
+
+    try:
+        for response in daemon.send_requests(requests, args.connect):
+            print(json.dumps(response, ensure_ascii=False), flush=True)
+    except OSError as e:
+        sys.exit(f"cannot reach the server on {args.connect}: {e}")
@@ -7,7 +7,7 @@ if __name__ == '__main__':
     import utils
 
     arg_parser = argparse.ArgumentParser(description="Query properties of a formula in propositional logic, provided as parameter")
-    arg_parser.add_argument('formula', metavar="FORMULA", help="formula in propositional logic")
+    arg_parser.add_argument('formula', metavar="FORMULA", nargs='?', help="formula in propositional logic")
     arg_parser.add_argument('--all', '-a', action='store_true', help="perform all checks and conversions")
     arg_parser.add_argument('--equivalent-to', metavar="OTHER_FORMULA", help="check if the formula is equivalent to the other formula")
     arg_parser.add_argument('--is-satisfiable', action='store_true', help="check if there exists any satisfying assignment to the formula")
@@ -15,32 +15,160 @@ if __name__ == '__main__':
     arg_parser.add_argument('--to-dnf', action='store_true', help="convert the formula to disjunctive normal form")
     arg_parser.add_argument('--to-nnf', action='store_true', help="convert the formula to negative normal form")
     arg_parser.add_argument('--to-cnf', action='store_true', help="convert the formula to conjunctive normal form")
+    arg_parser.add_argument('--minimize', action='store_true', help="minimize the terms of the DNF and the clauses of the CNF")
     arg_parser.add_argument('--ascii', action='store_true', help="use only ASCII-characters")
+    arg_parser.add_argument('--batch', metavar="FILE", help="read formulas (one per line, or JSON objects) from FILE ('-' for stdin) and write results as JSON lines")
+    arg_parser.add_argument('--jobs', '-j', metavar="N", type=int, default=1, help="number of worker processes in batch and server mode, or for the satisfiability, validity and equivalence checks of a single formula")
+    arg_parser.add_argument('--cache', metavar="FILE", help="reuse results of earlier runs stored in the database FILE and store new ones")
+    arg_parser.add_argument('--dimacs', metavar="FILE", help="check if the CNF in DIMACS format in FILE ('-' for stdin) is satisfiable and print a model")
+    arg_parser.add_argument('--stats', nargs='?', const='text', choices=('text', 'json'), help="print counters and timings of the run to stderr, as text (default) or JSON")
+    arg_parser.add_argument('--profile', action='store_true', help="profile the run and print the most expensive functions to stderr")
+    arg_parser.add_argument('--write-dimacs', metavar="FILE", help="write the Tseitsin encoding of the formula in DIMACS format to FILE ('-' for stdout)")
+    arg_parser.add_argument('--output', '-o', metavar="FILE", help="write the results to FILE instead of stdout, formulas are written incrementally")
+    arg_parser.add_argument('--load', metavar="FILE", help="take the formula (the first one stored) from FILE in binary format instead of FORMULA")
+    arg_parser.add_argument('--save', metavar="FILE", help="store the formula and the computed NNF, DNF and CNF in this order in FILE in binary format")
+    arg_parser.add_argument('--serve', metavar="ADDRESS", nargs='?', const=True, help="answer requests of ppl-client on ADDRESS (HOST:PORT, PORT or the path of a Unix domain socket, default localhost:7457) until interrupted, the given checks are the defaults for requests")
     args = arg_parser.parse_args()
 
+    import sys
+    from instrumentation import stats
+
+    outfile = sys.stdout if args.output is None else open(args.output, 'w', encoding='utf-8')
+
+    def close_output():
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    if args.stats or args.profile:
+        import atexit
+
+        if args.stats:
+            stats.enable()
+        if args.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        # report also after the early exits of the DIMACS and batch modes
+        @atexit.register
+        def report():
+            if args.profile:
+                profiler.disable()
+                import pstats
+                pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(25)
+            if args.stats:
+                print(stats.to_json() if args.stats == 'json' else stats.format(), file=sys.stderr)
+
+    if args.serve:
+        import batch
+        import daemon
+
+        checks = [check for check in batch.CHECKS if args.all or getattr(args, check)]
+
+        address = daemon.DEFAULT_ADDRESS if args.serve is True else args.serve
+
+        def ready(server):
+            print(f"serving on {address}", file=sys.stderr, flush=True)
+
+        daemon.serve(address, checks, jobs=args.jobs, unicode=(not args.ascii), equivalent_to=args.equivalent_to, minimize=args.minimize, cache_path=args.cache, ready=ready)
+        close_output()
+        sys.exit(0)
+    elif args.dimacs:
+        import dimacs
+        import sat_solver
+
+        clauses, variables = dimacs.read_dimacs(sys.stdin.buffer if args.dimacs == '-' else args.dimacs)
+        solver = sat_solver.CDCLSolver(len(variables))
+        satisfiable = all(solver.add_clause(clause) for clause in clauses) and solver.solve()
+
+        print(f"satisfiable: {satisfiable}", file=outfile)
+        if satisfiable:
+            print(f"model: {variables.to_assignment(solver.model, utils.get_assignment_type(variables.names[1:]))}", file=outfile)
+        close_output()
+        sys.exit(0)
+    elif args.batch:
+        import batch
+
+        checks = [check for check in batch.CHECKS if args.all or getattr(args, check)]
+        infile = sys.stdin if args.batch == '-' else open(args.batch, encoding='utf-8')
+        with infile:
+            batch.write_results(batch.run_batch(infile, checks, jobs=args.jobs, unicode=(not args.ascii), equivalent_to=args.equivalent_to, minimize=args.minimize, cache_path=args.cache), outfile)
+        close_output()
+        sys.exit(0)
+    elif args.formula is None and args.load is None:
+        arg_parser.error("either FORMULA, --load or --batch is required")
+
     fparser = formula_parser.FormulaParser()
     fformatter = formula_formatter.get_formatter(unicode=(False if args.ascii else True))
 
-    f = fparser.parse(args.formula)
+    # formulas are written in chunks, so huge results are never held as text
+    def write_formula(formula):
+        stats.timed('format', fformatter.format_to, formula, outfile)
+
+    def write_result(label, formula):
+        outfile.write(f"{label}: ")
+        write_formula(formula)
+        outfile.write('\n')
+
+    if args.load is None:
+        f = stats.timed('parse', fparser.parse, args.formula)
+    else:
+        import serialization
+        f = stats.timed('load', lambda: serialization.load(args.load)[0])
+
+    # formulas to store with --save
+    saved = [f]
 
-    print(f"formula: {fformatter.format(f)}")
+    if args.cache is None:
+        api = utils
+    else:
+        import formula_cache
+        api = formula_cache.FormulaCache(path=args.cache)
+
+    write_result('formula', f)
+
+    if args.write_dimacs:
+        import clauses
+        import dimacs
+
+        encoder = clauses.TseitinEncoder()
+        encoder.add(f)
+        if args.write_dimacs == '-':
+            dimacs.write_dimacs(encoder.clauses, sys.stdout, encoder.variables)
+        else:
+            with open(args.write_dimacs, 'w', encoding='utf-8') as dimacs_file:
+                dimacs.write_dimacs(encoder.clauses, dimacs_file, encoder.variables)
 
     if args.is_satisfiable or args.all:
-        print(f"satisfiable: {utils.is_satisfiable(f)}")
+        print(f"satisfiable: {stats.timed('satisfiable', api.is_satisfiable, f, jobs=args.jobs)}", file=outfile)
 
     if args.is_valid or args.all:
-        print(f"valid: {utils.is_valid(f)}")
+        print(f"valid: {stats.timed('valid', api.is_valid, f, jobs=args.jobs)}", file=outfile)
 
     if args.to_nnf or args.all:
-        print(f"NNF: {fformatter.format(utils.to_NNF(f))}")
+        saved.append(stats.timed('NNF', api.to_NNF, f))
+        write_result('NNF', saved[-1])
 
     if args.to_dnf or args.all:
-        print(f"DNF: {fformatter.format(utils.to_DNF(f))}")
+        saved.append(stats.timed('DNF', api.to_DNF, f, minimize=args.minimize))
+        write_result('DNF', saved[-1])
 
     if args.to_cnf or args.all:
-        print(f"CNF: {fformatter.format(utils.to_CNF(f))}")
+        saved.append(stats.timed('CNF', api.to_CNF, f, minimize=args.minimize))
+        write_result('CNF', saved[-1])
 
     if args.equivalent_to:
-        other_f = fparser.parse(args.equivalent_to)
-        print(f"formula {fformatter.format(f)} is {"" if utils.are_equivalent(f, other_f) else "not "}equivalent to {fformatter.format(other_f)}")
+        other_f = stats.timed('parse', fparser.parse, args.equivalent_to)
+        equivalent = stats.timed('equivalent', api.are_equivalent, f, other_f, jobs=args.jobs)
+        outfile.write("formula ")
+        write_formula(f)
+        outfile.write(f" is {"" if equivalent else "not "}equivalent to ")
+        write_formula(other_f)
+        outfile.write('\n')
+
+    if args.save:
+        import serialization
+        stats.timed('save', serialization.dump, saved, args.save)
+
+    close_output()
 
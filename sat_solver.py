@@ -0,0 +1,635 @@
+#!/usr/bin/python
+
+"""
+A conflict-driven clause-learning SAT solver.
+
+Clauses are given as lists of DIMACS-style integer literals. Internally the
+literal of variable v is encoded as 2*v (positive) or 2*v+1 (negative), so
+negation is 'lit ^ 1' and all per-literal state lives in flat lists.
+"""
+
+import heapq
+
+from syntax import *
+from clauses import POSITIVE, VariableTable, TseitinEncoder
+from instrumentation import stats
+
+# restart interval (in conflicts) is this unit times the luby sequence
+RESTART_UNIT = 100
+# decay of the variable activities after each conflict
+VAR_DECAY = 0.95
+# decay of the activities of learnt clauses after each conflict
+CLAUSE_DECAY = 0.999
+
+class _Clause:
+    __slots__ = ('lits', 'learnt', 'lbd', 'activity', 'deleted')
+
+    def __init__(self, lits, learnt=False, lbd=0):
+        self.lits = lits
+        self.learnt = learnt
+        self.lbd = lbd
+        self.activity = 0.0
+        self.deleted = False
+
+def _luby(y, x):
+    """
+    get the x-th element of the luby sequence with base y
+
+    >>> [_luby(2, x) for x in range(7)]
+    [1, 1, 2, 1, 1, 2, 4]
+    """
+    size, seq = 1, 0
+    while size < x + 1:
+        seq += 1
+        size = 2 * size + 1
+
+    while size - 1 != x:
+        size = (size - 1) >> 1
+        seq -= 1
+        x = x % size
+
+    return y ** seq
+
+class CDCLSolver:
+    """
+    CDCL solver with two-watched-literal propagation, VSIDS branching with phase saving, first-UIP clause
+    learning, luby restarts and LBD-based reduction of the learnt clauses
+
+    >>> solver = CDCLSolver()
+    >>> solver.add_clause([1, 2])
+    True
+    >>> solver.add_clause([-1, 2])
+    True
+    >>> solver.solve()
+    True
+    >>> solver.model[2]
+    True
+    >>> solver.add_clause([-2])
+    False
+    >>> solver.solve()
+    False
+    """
+    def __init__(self, n_vars=0):
+        self.n_vars = 0
+        self.clauses = []
+        self.learnts = []
+        self.ok = True
+        self.model = None
+        # internal literals decided first in every search, and the one found false by the last solve
+        self.assumptions = []
+        self.failed_assumption = None
+
+        # per literal
+        self.values = [0, 0]
+        self.watches = [[], []]
+        # per variable
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.polarity = [False]
+        self.seen = [False]
+
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.heap = []
+        self.var_inc = 1.0
+        self.clause_inc = 1.0
+        self.max_learnts = 0
+
+        self.decisions = 0
+        self.conflicts = 0
+        self.propagations = 0
+        self.restarts = 0
+
+        while self.n_vars < n_vars:
+            self.new_var()
+
+    def new_var(self):
+        self.n_vars += 1
+        self.values += [0, 0]
+        self.watches += [[], []]
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.polarity.append(False)
+        self.seen.append(False)
+        heapq.heappush(self.heap, (0.0, self.n_vars))
+        return self.n_vars
+
+    def _assign(self, lit, reason):
+        self.values[lit] = 1
+        self.values[lit ^ 1] = -1
+        var = lit >> 1
+        self.levels[var] = len(self.trail_lim)
+        self.reasons[var] = reason
+        self.trail.append(lit)
+
+    def _attach(self, clause):
+        self.watches[clause.lits[0]].append(clause)
+        self.watches[clause.lits[1]].append(clause)
+
+    def add_clause(self, clause):
+        """
+        add a clause of integer literals, returns False if the solver became trivially unsatisfiable
+        """
+        if not self.ok:
+            return False
+        if self.trail_lim:
+            self._cancel_until(0)
+
+        values = self.values
+        lits = set()
+        for int_lit in clause:
+            while abs(int_lit) > self.n_vars:
+                self.new_var()
+            lit = (abs(int_lit) << 1) | (int_lit < 0)
+
+            if values[lit] == 1 or lit ^ 1 in lits:
+                # satisfied at level 0 or tautology
+                return True
+            elif values[lit] == 0:
+                lits.add(lit)
+
+        lits = list(lits)
+        if not lits:
+            self.ok = False
+        elif len(lits) == 1:
+            self._assign(lits[0], None)
+            self.ok = self._propagate() is None
+        else:
+            c = _Clause(lits)
+            self.clauses.append(c)
+            self._attach(c)
+
+        return self.ok
+
+    def _propagate(self):
+        values = self.values
+        watches = self.watches
+        trail = self.trail
+        conflict = None
+
+        while self.qhead < len(trail):
+            false_lit = trail[self.qhead] ^ 1
+            self.qhead += 1
+            self.propagations += 1
+
+            ws = watches[false_lit]
+            i = j = 0
+            n = len(ws)
+            while i < n:
+                c = ws[i]
+                i += 1
+                if c.deleted:
+                    continue
+
+                lits = c.lits
+                # make sure the false literal is at position 1
+                if lits[0] == false_lit:
+                    lits[0] = lits[1]
+                    lits[1] = false_lit
+                first = lits[0]
+
+                if values[first] == 1:
+                    ws[j] = c
+                    j += 1
+                    continue
+
+                # look for a new literal to watch
+                for k in range(2, len(lits)):
+                    if values[lits[k]] != -1:
+                        lits[1] = lits[k]
+                        lits[k] = false_lit
+                        watches[lits[1]].append(c)
+                        break
+                else:
+                    ws[j] = c
+                    j += 1
+                    if values[first] == -1:
+                        conflict = c
+                        while i < n:
+                            ws[j] = ws[i]
+                            j += 1
+                            i += 1
+                    else:
+                        self._assign(first, c)
+
+            del ws[j:]
+            if conflict is not None:
+                self.qhead = len(trail)
+                return conflict
+
+        return None
+
+    def _bump_var(self, var):
+        self.activity[var] += self.var_inc
+        if self.activity[var] > 1e100:
+            self.activity = [act * 1e-100 for act in self.activity]
+            self.var_inc *= 1e-100
+            self.heap = [(-self.activity[v], v) for v in range(1, self.n_vars + 1) if self.values[v << 1] == 0]
+            heapq.heapify(self.heap)
+        elif self.values[var << 1] == 0:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def _bump_clause(self, clause):
+        clause.activity += self.clause_inc
+        if clause.activity > 1e20:
+            for c in self.learnts:
+                c.activity *= 1e-20
+            self.clause_inc *= 1e-20
+
+    def _analyze(self, conflict):
+        seen = self.seen
+        levels = self.levels
+        reasons = self.reasons
+        trail = self.trail
+        level = len(self.trail_lim)
+
+        learnt = [None]
+        path = 0
+        p = None
+        idx = len(trail) - 1
+        c = conflict
+
+        while True:
+            if c.learnt:
+                self._bump_clause(c)
+
+            # the propagated literal is always at position 0 of its reason
+            for q in (c.lits if p is None else c.lits[1:]):
+                var = q >> 1
+                if not seen[var] and levels[var] > 0:
+                    seen[var] = True
+                    self._bump_var(var)
+                    if levels[var] >= level:
+                        path += 1
+                    else:
+                        learnt.append(q)
+
+            while not seen[trail[idx] >> 1]:
+                idx -= 1
+            p = trail[idx]
+            idx -= 1
+            c = reasons[p >> 1]
+            seen[p >> 1] = False
+            path -= 1
+            if path == 0:
+                break
+
+        learnt[0] = p ^ 1
+
+        # drop literals implied by the other literals of the clause
+        minimized = [learnt[0]]
+        for q in learnt[1:]:
+            reason = reasons[q >> 1]
+            if reason is None or not all(seen[r >> 1] or levels[r >> 1] == 0 for r in reason.lits[1:]):
+                minimized.append(q)
+        for q in learnt[1:]:
+            seen[q >> 1] = False
+        learnt = minimized
+
+        # watch the literal of the highest level besides the asserting one
+        backtrack_level = 0
+        if len(learnt) > 1:
+            max_i = max(range(1, len(learnt)), key=lambda i: levels[learnt[i] >> 1])
+            learnt[1], learnt[max_i] = learnt[max_i], learnt[1]
+            backtrack_level = levels[learnt[1] >> 1]
+
+        lbd = len({levels[q >> 1] for q in learnt})
+        return learnt, backtrack_level, lbd
+
+    def _cancel_until(self, level):
+        if len(self.trail_lim) <= level:
+            return
+
+        values = self.values
+        start = self.trail_lim[level]
+        for lit in self.trail[start:]:
+            var = lit >> 1
+            values[lit] = 0
+            values[lit ^ 1] = 0
+            self.reasons[var] = None
+            self.polarity[var] = not (lit & 1)
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = start
+
+    def _pick_branch_lit(self):
+        values = self.values
+        while self.heap:
+            _, var = heapq.heappop(self.heap)
+            if values[var << 1] == 0:
+                return (var << 1) | (not self.polarity[var])
+        return None
+
+    def _locked(self, clause):
+        var = clause.lits[0] >> 1
+        return self.reasons[var] is clause and self.values[clause.lits[0]] == 1
+
+    def _reduce_db(self):
+        self.learnts.sort(key=lambda c: (c.lbd, -c.activity))
+        keep = len(self.learnts) // 2
+
+        remaining = []
+        for i, c in enumerate(self.learnts):
+            if i < keep or c.lbd <= 2 or len(c.lits) == 2 or self._locked(c):
+                remaining.append(c)
+            else:
+                c.deleted = True
+        self.learnts = remaining
+
+        self.watches = [[c for c in ws if not c.deleted] for ws in self.watches]
+
+    def _search(self, conflict_budget):
+        conflicts = 0
+
+        while True:
+            conflict = self._propagate()
+
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.trail_lim:
+                    return False
+
+                learnt, backtrack_level, lbd = self._analyze(conflict)
+                self._cancel_until(backtrack_level)
+
+                if len(learnt) == 1:
+                    self._assign(learnt[0], None)
+                else:
+                    c = _Clause(learnt, learnt=True, lbd=lbd)
+                    self._bump_clause(c)
+                    self.learnts.append(c)
+                    self._attach(c)
+                    self._assign(learnt[0], c)
+
+                self.var_inc /= VAR_DECAY
+                self.clause_inc /= CLAUSE_DECAY
+            else:
+                if conflicts >= conflict_budget:
+                    self.restarts += 1
+                    self._cancel_until(0)
+                    return None
+
+                if len(self.learnts) - len(self.trail) >= self.max_learnts:
+                    self._reduce_db()
+                    self.max_learnts *= 1.1
+
+                lit = None
+                while len(self.trail_lim) < len(self.assumptions):
+                    p = self.assumptions[len(self.trail_lim)]
+                    if self.values[p] == 1:
+                        # already implied, keep the levels aligned with the assumptions
+                        self.trail_lim.append(len(self.trail))
+                    elif self.values[p] == -1:
+                        self.failed_assumption = -(p >> 1) if p & 1 else p >> 1
+                        return False
+                    else:
+                        lit = p
+                        break
+
+                if lit is None:
+                    lit = self._pick_branch_lit()
+                    if lit is None:
+                        return True
+
+                self.decisions += 1
+                self.trail_lim.append(len(self.trail))
+                self._assign(lit, None)
+
+    def solve(self, assumptions=()):
+        """
+        check if the clauses are satisfiable together with the integer literals in 'assumptions', a satisfying
+        assignment is available in 'model' afterwards (indexed by variable). Assumptions only hold for this call,
+        clauses learnt under them stay valid. If an assumption could not be satisfied, it is stored in
+        'failed_assumption'.
+
+        >>> solver = CDCLSolver()
+        >>> solver.add_clause([-1, 2]), solver.add_clause([-2, 3])
+        (True, True)
+        >>> solver.solve([1, -3]), solver.failed_assumption
+        (False, -3)
+        >>> solver.solve([1]), solver.model[3]
+        (True, True)
+        """
+        if not stats.enabled:
+            return self._solve(assumptions)
+
+        before = (self.decisions, self.conflicts, self.propagations, self.restarts)
+        try:
+            return self._solve(assumptions)
+        finally:
+            for name, old, new in zip(('decisions', 'conflicts', 'propagations', 'restarts'), before,
+                                      (self.decisions, self.conflicts, self.propagations, self.restarts)):
+                stats.count('solver_' + name, new - old)
+
+    def _solve(self, assumptions):
+        self.model = None
+        self.failed_assumption = None
+        if not self.ok:
+            return False
+
+        for int_lit in assumptions:
+            while abs(int_lit) > self.n_vars:
+                self.new_var()
+        self.assumptions = [(abs(int_lit) << 1) | (int_lit < 0) for int_lit in assumptions]
+
+        self._cancel_until(0)
+        if self._propagate() is not None:
+            self.ok = False
+            return False
+
+        self.max_learnts = max(len(self.clauses) / 3, 1000)
+        restart = 0
+
+        while True:
+            status = self._search(_luby(2, restart) * RESTART_UNIT)
+            restart += 1
+
+            if status is True:
+                self.model = [None] + [self.values[var << 1] == 1 for var in range(1, self.n_vars + 1)]
+                self._cancel_until(0)
+                return True
+            elif status is False:
+                # without a failed assumption, the clauses themselves are unsatisfiable
+                if self.failed_assumption is None:
+                    self.ok = False
+                self._cancel_until(0)
+                return False
+
+class Solver:
+    """
+    incremental satisfiability checks of a growing set of formulas, which keeps the Tseitsin encodings of
+    subformulas and the learnt clauses between calls
+
+    Formulas added after 'push' are retracted by the matching 'pop': their clauses are guarded by a selector
+    variable, which is assumed true while the scope is open and fixed to false when it gets closed.
+    Assumptions only hold for a single call of 'solve'. They may be literals, formulas, or (partial)
+    assignments like the constraints of 'filter_assignments', whose values of None count as unassigned.
+
+    >>> solver = Solver(Implication(Literal('a'), Literal('b')))
+    >>> solver.solve([Literal('a')]), solver.model
+    (True, Assignment(a=True, b=True))
+    >>> solver.solve([Literal('a'), Literal('b', negated=True)])
+    False
+    >>> solver.push()
+    >>> solver.add(Literal('b', negated=True))
+    >>> solver.solve(), solver.model
+    (True, Assignment(a=False, b=False))
+    >>> solver.solve([{'a': True}])
+    False
+    >>> solver.pop()
+    >>> sorted(solver.iter_models([{'b': True}]))
+    [Assignment(a=False, b=True), Assignment(a=True, b=True)]
+    >>> solver.are_equivalent(Literal('a'), And([Literal('a'), Literal('b')]))
+    True
+    """
+    def __init__(self, formula=None):
+        self.variables = VariableTable()
+        self.encoder = TseitinEncoder(self.variables, polarity_aware=True)
+        self.solver = CDCLSolver()
+        # selector variables of the open scopes
+        self.scopes = []
+        self.model = None
+        # type of the models, rebuilt only when atoms got added
+        self._model_type = None
+
+        if formula is not None:
+            self.add(formula)
+
+    def _flush(self):
+        # definitions of helpers hold in every scope, so they are never guarded
+        for clause in self.encoder.clauses:
+            self.solver.add_clause(clause)
+        self.encoder.clauses.clear()
+
+    def _encode(self, formula, polarity=POSITIVE):
+        lit = self.encoder.encode(formula, polarity)
+        self._flush()
+        return lit
+
+    def add(self, formula):
+        """
+        add a formula to the innermost open scope
+        """
+        if not self.scopes:
+            self.encoder.add(formula)
+            self._flush()
+        else:
+            self.solver.add_clause([-self.scopes[-1], self._encode(formula)])
+
+    def add_clause(self, clause):
+        """
+        add a clause of literals or integer literals over the variables in 'variables' to the innermost open scope
+        """
+        lits = [lit if type(lit) == int else self.variables.literal(lit) for lit in clause]
+        if self.scopes:
+            lits.append(-self.scopes[-1])
+        self.solver.add_clause(lits)
+
+    def push(self):
+        """
+        open a new scope
+        """
+        self.scopes.append(self.variables.new_variable())
+
+    def pop(self):
+        """
+        close the innermost scope and retract the formulas added in it
+        """
+        self.solver.add_clause([-self.scopes.pop()])
+
+    def _assumption_literals(self, assumptions):
+        lits = []
+        for assumption in assumptions:
+            if type(assumption) == int:
+                lits.append(assumption)
+            elif type(assumption) == Literal:
+                lits.append(self.variables.literal(assumption))
+            elif isinstance(assumption, dict) or hasattr(assumption, '_fields'):
+                values = assumption if isinstance(assumption, dict) else assumption._asdict()
+                lits.extend(self.variables.literal(Literal(name, negated=not value))
+                            for name, value in values.items() if value is not None)
+            else:
+                lits.append(self._encode(assumption))
+        return lits
+
+    def _assignment_type(self):
+        if self._model_type is None or len(self._model_type._fields) != len(self.variables.indices):
+            import utils
+            self._model_type = utils.get_assignment_type(sorted(self.variables.indices))
+        return self._model_type
+
+    def solve(self, assumptions=()):
+        """
+        check if the formulas of all open scopes are satisfiable under the assumptions, a satisfying assignment
+        of all atoms is available in 'model' afterwards
+        """
+        lits = self.scopes + self._assumption_literals(assumptions)
+        while self.solver.n_vars < len(self.variables):
+            self.solver.new_var()
+
+        self.model = None
+        if not self.solver.solve(lits):
+            return False
+
+        self.model = self.variables.to_assignment(self.solver.model, self._assignment_type())
+        return True
+
+    def iter_models(self, assumptions=(), limit=None):
+        """
+        iterate lazily over the assignments of all atoms satisfying the formulas under the assumptions, at most
+        'limit' of them. The clauses blocking the found assignments are retracted afterwards.
+        """
+        self.push()
+        try:
+            # the assumptions are encoded once, before the scope gets extended by blocking clauses
+            lits = self._assumption_literals(assumptions)
+            variables = [self.variables.indices[name] for name in self._assignment_type()._fields]
+
+            count = 0
+            while (limit is None or count < limit) and self.solve(lits):
+                yield self.model
+                count += 1
+
+                # the helpers are not blocked, so every assignment of the atoms is found only once
+                model = self.solver.model
+                self.add_clause([-var if model[var] else var for var in variables])
+        finally:
+            self.pop()
+
+    def are_equivalent(self, formula1, formula2):
+        """
+        check if two formulas are equivalent under the formulas of all open scopes
+        """
+        return not self.solve([Negation(Equivalence(formula1, formula2))])
+
+def iter_models(formula):
+    """
+    iterate lazily over the satisfying assignments of a formula using its polarity-aware Tseitsin encoding.
+    After every model, a clause blocking its values of the atoms is added and the solver continues.
+
+    >>> sorted(iter_models(Or([Literal('a'), Literal('b')])))
+    [Assignment(a=False, b=True), Assignment(a=True, b=False), Assignment(a=True, b=True)]
+    """
+    return Solver(formula).iter_models()
+
+def find_model(formula):
+    """
+    get a satisfying assignment of a formula using its polarity-aware Tseitsin encoding, or None if it is unsatisfiable
+
+    >>> find_model(And([Literal('a'), Or([Literal('a', negated=True), Literal('b', negated=True)])]))
+    Assignment(a=True, b=False)
+    >>> find_model(Equivalence(Literal('a'), Negation(Literal('a')))) is None
+    True
+    """
+    return next(iter_models(formula), None)
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
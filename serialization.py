@@ -0,0 +1,315 @@
+#!/usr/bin/python
+
+"""
+Versioned binary format for lists of formulas.
+
+All formulas of a file share one node table (see compact.CompactFormula), so
+every distinct subformula is stored once, and one table of atom names. Flat
+normal forms (conjunctions of disjunctions of literals, or the dual) are
+stored as integer clauses (see clauses.ClauseStore) in sections of their own,
+which can be handed to a solver without creating any formula objects.
+
+Layout (little-endian): a header with magic, version and the number of
+sections, a table of (kind, parameter, offset, length) for every section, and
+the sections, each aligned to 8 bytes:
+
+  ATOMS    number of atoms, the byte lengths of their UTF-8 names, the names
+  NODES    numbers of nodes and arguments, offsets (int64), arguments (int32),
+           opcodes (int8)
+  CLAUSES  (parameter CNF or DNF) numbers of clauses and literals, offsets
+           (int64), 0-terminated literals (int32)
+  ENTRIES  number of formulas, (kind, index) per formula: a root node or the
+           number of a CLAUSES section
+
+Files are loaded through mmap: the arrays are memoryviews of the mapping and
+formulas get materialized from them on first access, only the nodes reachable
+from their roots.
+"""
+
+from syntax import *
+from compact import CompactFormula, build_node, clauses_to_formula, LITERAL, CONSTANT
+from clauses import VariableTable, ClauseStore
+from array import array
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b'PPLF'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sHHI')
+_SECTION = struct.Struct('<IIQQ')
+_COUNTS = struct.Struct('<QQ')
+_ENTRY = struct.Struct('<II')
+
+# kinds of sections
+ATOMS, NODES, CLAUSES, ENTRIES = range(1, 5)
+# parameters of CLAUSES sections, which are also the kinds of their entries
+NODE, CNF, DNF = range(3)
+
+class FormatError(ValueError):
+    pass
+
+def _padding(length):
+    return b'\0' * (-length % 8)
+
+def _to_bytes(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _from_bytes(buffer, typecode):
+    if sys.byteorder != 'little':
+        values = array(typecode, buffer)
+        values.byteswap()
+        return values
+    return buffer.cast(typecode)
+
+# get the clauses and the kind of a flat normal form, or None
+def _flat_clauses(formula, variables):
+    if type(formula) == And:
+        kind, inner = CNF, Or
+    elif type(formula) == Or:
+        kind, inner = DNF, And
+    else:
+        return None
+
+    if not all(type(child) == inner and all(type(lit) == Literal for lit in child.children)
+               for child in formula.children):
+        return None
+
+    literal = variables.literal
+    return kind, ClauseStore([literal(lit) for lit in child.children] for child in formula.children)
+
+def dumps(formulas):
+    """
+    get the binary representation of a list of formulas
+
+    >>> data = dumps([And([Or([Literal('a'), Literal('b', negated=True)])]), Implication(Literal('a'), Literal('c'))])
+    >>> data[:4], len(data)
+    (b'PPLF', 280)
+    """
+    variables = VariableTable()
+    compact = CompactFormula(variables)
+    clause_lists = []
+    entries = []
+
+    for formula in formulas:
+        flat = _flat_clauses(formula, variables)
+        if flat is None:
+            entries.append((NODE, compact.add(formula)))
+        else:
+            entries.append((flat[0], len(clause_lists)))
+            clause_lists.append(flat)
+
+    sections = []
+
+    names = [name.encode('utf-8') for name in variables.names[1:]]
+    sections.append((ATOMS, 0, struct.pack('<Q', len(names)) + _to_bytes(array('I', map(len, names)))
+                     + b''.join(names)))
+
+    nodes = _COUNTS.pack(len(compact.ops), len(compact.args)) + _to_bytes(compact.offsets)
+    nodes += _to_bytes(compact.args) + _padding(len(compact.args) * 4) + compact.ops.tobytes()
+    sections.append((NODES, 0, nodes))
+
+    for kind, clauses in clause_lists:
+        literals = _to_bytes(clauses.literals)
+        sections.append((CLAUSES, kind, _COUNTS.pack(len(clauses), len(clauses.literals))
+                         + _to_bytes(clauses.offsets) + literals))
+
+    sections.append((ENTRIES, 0, struct.pack('<Q', len(entries))
+                     + b''.join(_ENTRY.pack(kind, index) for kind, index in entries)))
+
+    parts = [_HEADER.pack(MAGIC, VERSION, 0, len(sections))]
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    offset += len(_padding(offset))
+    for kind, parameter, data in sections:
+        parts.append(_SECTION.pack(kind, parameter, offset, len(data)))
+        offset += len(data) + len(_padding(len(data)))
+    parts.append(_padding(_HEADER.size + _SECTION.size * len(sections)))
+    for _, _, data in sections:
+        parts.append(data)
+        parts.append(_padding(len(data)))
+
+    return b''.join(parts)
+
+def dump(formulas, file):
+    """
+    write a list of formulas in binary format to a file, given as path or as file object opened in binary mode
+    """
+    if hasattr(file, 'write'):
+        file.write(dumps(formulas))
+    else:
+        with open(file, 'wb') as fileobj:
+            fileobj.write(dumps(formulas))
+
+class FormulaFile:
+    """
+    list of the formulas in a buffer in binary format, which get materialized on first access
+
+    >>> formulas = FormulaFile(dumps([Or([And([Literal('a')]), And([Literal('b'), Literal('c', negated=True)])]), Literal('b')]))
+    >>> len(formulas), formulas.kind(0), formulas[1]
+    (2, 2, Literal(b))
+    >>> [list(clause) for clause in formulas.clauses(0)], formulas.variables.names
+    ([[1], [2, -3]], [None, 'a', 'b', 'c'])
+    >>> formulas[0]
+    Or(And(Literal(a)), And(Literal(b), Literal(!c)))
+    """
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer)
+        if len(self.buffer) < _HEADER.size:
+            raise FormatError("file too short")
+
+        magic, version, _, n_sections = _HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise FormatError("not a formula file")
+        elif version > VERSION:
+            raise FormatError(f"unsupported version {version}")
+
+        self._clause_sections = []
+        for i in range(n_sections):
+            kind, parameter, offset, length = _SECTION.unpack_from(self.buffer, _HEADER.size + i * _SECTION.size)
+            data = self.buffer[offset:offset + length]
+            if kind == ATOMS:
+                self._read_atoms(data)
+            elif kind == NODES:
+                self._read_nodes(data)
+            elif kind == CLAUSES:
+                self._clause_sections.append((parameter, data))
+            elif kind == ENTRIES:
+                n_entries, = struct.unpack_from('<Q', data)
+                self._entries = [_ENTRY.unpack_from(data, 8 + i * _ENTRY.size) for i in range(n_entries)]
+            # unknown sections are skipped, so later minor additions stay readable
+
+        self._nodes = {}
+        self._formulas = {}
+
+    def _read_atoms(self, data):
+        n_atoms, = struct.unpack_from('<Q', data)
+        lengths = _from_bytes(data[8:8 + 4 * n_atoms], 'I')
+        names = []
+        position = 8 + 4 * n_atoms
+        for length in lengths:
+            names.append(str(data[position:position + length], 'utf-8'))
+            position += length
+        self.variables = VariableTable(names)
+
+    def _read_nodes(self, data):
+        n_nodes, n_args = _COUNTS.unpack_from(data)
+        position = _COUNTS.size
+        self.offsets = _from_bytes(data[position:position + 8 * (n_nodes + 1)], 'q')
+        position += 8 * (n_nodes + 1)
+        self.args = _from_bytes(data[position:position + 4 * n_args], 'i')
+        position += 4 * n_args + len(_padding(4 * n_args))
+        self.ops = data[position:position + n_nodes].cast('b')
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def kind(self, index):
+        """
+        get the kind of a formula: NODE, or CNF/DNF for flat normal forms
+        """
+        return self._entries[index][0]
+
+    def clauses(self, index):
+        """
+        get the integer clauses (terms for DNF) of a flat normal form as ClauseStore over 'variables'
+        """
+        kind, section = self._entries[index]
+        if kind == NODE:
+            raise ValueError("formula is not stored as clauses")
+
+        data = self._clause_sections[section][1]
+        n_clauses, n_literals = _COUNTS.unpack_from(data)
+        position = _COUNTS.size + 8 * (n_clauses + 1)
+        return ClauseStore.from_arrays(_from_bytes(data[position:position + 4 * n_literals], 'i'),
+                                       _from_bytes(data[_COUNTS.size:position], 'q'), len(self.variables))
+
+    def node(self, index):
+        """
+        materialize a node of the node table and all nodes below it, which are not materialized yet
+        """
+        nodes, ops, args, offsets = self._nodes, self.ops, self.args, self.offsets
+        to_literal = self.variables.to_literal
+
+        stack = [index]
+        while stack:
+            current = stack[-1]
+            if current in nodes:
+                stack.pop()
+                continue
+
+            op = ops[current]
+            arguments = args[offsets[current]:offsets[current + 1]]
+            if op != LITERAL and op != CONSTANT:
+                missing = [child for child in arguments if child not in nodes]
+                if missing:
+                    stack.extend(missing)
+                    continue
+
+            nodes[current] = build_node(op, arguments, nodes, to_literal)
+            stack.pop()
+
+        return nodes[index]
+
+    def __getitem__(self, index):
+        formula = self._formulas.get(index)
+        if formula is None:
+            kind, position = self._entries[index]
+            if kind == NODE:
+                formula = self.node(position)
+            else:
+                outer, inner = (And, Or) if kind == CNF else (Or, And)
+                formula = clauses_to_formula(self.clauses(index), self.variables, outer, inner)
+            self._formulas[index] = formula
+        return formula
+
+def loads(data):
+    return FormulaFile(data)
+
+def _map(fileobj):
+    # files too short for a header can not be mapped (empty ones) and are no formula files anyway, the header
+    # gets checked by FormulaFile
+    if os.fstat(fileobj.fileno()).st_size < _HEADER.size:
+        raise FormatError("file too short")
+    return mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+
+def load(file):
+    """
+    get the formulas of a file in binary format, given as path or as file object opened in binary mode (like
+    for dump), which get materialized on first access. Files are mapped into memory, file objects without a
+    file descriptor get read.
+
+    >>> import io
+    >>> buffer = io.BytesIO()
+    >>> dump([Literal('a')], buffer)
+    >>> list(load(io.BytesIO(buffer.getvalue())))
+    [Literal(a)]
+    >>> load(io.BytesIO())
+    Traceback (most recent call last):
+    ...
+    FormatError: file too short
+    """
+    if not hasattr(file, 'read'):
+        with open(file, 'rb') as fileobj:
+            return FormulaFile(_map(fileobj))
+
+    try:
+        file.fileno()
+    except (AttributeError, OSError):
+        mappable = False
+    else:
+        mappable = True
+    return FormulaFile(_map(file) if mappable else file.read())
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
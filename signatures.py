@@ -0,0 +1,114 @@
+#!/usr/bin/python
+
+"""
+Random-simulation signatures of formulas.
+
+A signature is the column of values of a formula on a batch of random
+assignments, evaluated bit-parallel (see truth_table.evaluate_columns): the
+column of every atom is a random integer of 'width' bits, which only depends on
+the seed and the name of the atom, so all formulas are simulated on the same
+assignments. Equivalent formulas have equal signatures, so different signatures
+prove non-equivalence without a solver, and grouping formulas by signature
+leaves only formulas with equal signatures to be checked exactly.
+"""
+
+import collections
+import random
+
+from syntax import *
+from truth_table import evaluate_columns
+from instrumentation import stats
+
+# number of random assignments in a signature
+SIGNATURE_WIDTH = 64
+
+class _RandomColumns(dict):
+    # random columns of the atoms, created when first needed
+    def __init__(self, width, seed):
+        self.width = width
+        self.seed = seed
+
+    def __missing__(self, name):
+        column = self[name] = random.Random(f"{self.seed}:{name}").getrandbits(self.width)
+        return column
+
+class Signer:
+    """
+    computes the signatures of formulas on a shared batch of 'width' random assignments
+
+    >>> signer = Signer(width=16, seed=1)
+    >>> signer.signature(Implication(Literal('a'), Literal('b'))) == signer.signature(Or([Literal('a', negated=True), Literal('b')]))
+    True
+    >>> signer.signature(Or([Literal('a'), Literal('a', negated=True)])) == signer.signature(True)
+    True
+    """
+    def __init__(self, width=SIGNATURE_WIDTH, seed=0):
+        self.width = width
+        self.seed = seed
+        self.columns = _RandomColumns(width, seed)
+        self.full = (1 << width) - 1
+
+    def signature(self, formula):
+        if stats.enabled:
+            stats.count('signatures')
+        return evaluate_columns(formula, self.columns, self.full)
+
+def may_be_equivalent(formula1, formula2, width=SIGNATURE_WIDTH, seed=0):
+    """
+    compare the signatures of two formulas, False proves that they are not equivalent
+
+    >>> may_be_equivalent(Literal('a'), And([Literal('a'), Literal('b')]))
+    False
+    >>> may_be_equivalent(Literal('a'), Or([Literal('a'), And([Literal('a'), Literal('b')])]))
+    True
+    """
+    signer = Signer(width, seed)
+    return signer.signature(formula1) == signer.signature(formula2)
+
+def group_by_signature(formulas, width=SIGNATURE_WIDTH, seed=0):
+    """
+    get the lists of formulas with equal signatures, which are candidates for equivalence classes, in the order
+    of their first formulas
+    """
+    signer = Signer(width, seed)
+    groups = collections.defaultdict(list)
+    for formula in formulas:
+        groups[signer.signature(formula)].append(formula)
+
+    return list(groups.values())
+
+def group_equivalent(formulas, width=SIGNATURE_WIDTH, seed=0, jobs=1):
+    """
+    get the equivalence classes of the formulas as lists in the order of their first formulas. Only formulas with
+    equal signatures get compared by utils.are_equivalent, with the first formula of every class so far.
+
+    >>> a, b = Literal('a'), Literal('b')
+    >>> group_equivalent([Implication(a, b), And([a, b]), Or([Negation(a), b]), Negation(Or([Negation(a), Negation(b)]))])
+    [[Implication(Literal(a), Literal(b)), Or(Negation(Literal(a)), Literal(b))], [And(Literal(a), Literal(b)), Negation(Or(Negation(Literal(a)), Negation(Literal(b))))]]
+    >>> group_equivalent([a, b], width=1, seed=3)
+    [[Literal(a)], [Literal(b)]]
+    """
+    import utils
+
+    classes = []
+    for candidates in group_by_signature(formulas, width, seed):
+        representatives = []
+        for formula in candidates:
+            for representative, members in representatives:
+                if utils.are_equivalent(representative, formula, jobs=jobs):
+                    members.append(formula)
+                    break
+            else:
+                representatives.append((formula, [formula]))
+        classes.extend(members for _, members in representatives)
+
+    # classes with equal signatures were collected together, restore the order of their first formulas
+    position = {id(formula): i for i, formula in reversed(list(enumerate(formulas)))}
+    classes.sort(key=lambda members: position[id(members[0])])
+    return classes
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,239 @@
+#!/usr/bin/python
+
+"""
+Equivalence-preserving simplification of formulas.
+
+Every pass rewrites the formula bottom-up in a single fold: nested
+conjunctions (disjunctions) get flattened, their children deduplicated and
+sorted, the constants True/False propagated and complementary children
+detected. Literals among the children of a conjunction are units, which
+satisfy or shorten the disjunctions next to them (dually for disjunctions),
+and children implied by a smaller sibling are absorbed. Passes are repeated
+until the formula does not change anymore, which is an identity check since
+formulas are hash-consed (see syntax).
+
+The result is either a formula without constants or one of the bools
+True/False.
+"""
+
+from syntax import *
+from traversal import children, fold, iter_nodes
+import collections
+import hashlib
+
+# order of the node types among sorted children, literals come first
+_TYPE_RANKS = {Negation: 1, And: 2, Or: 3, Implication: 4, Equivalence: 5}
+
+def _negate(formula):
+    """
+    get the negation of a formula, avoiding double negations
+
+    >>> _negate(Literal('a')), _negate(Negation(And([]))), _negate(False)
+    (Literal(!a), And(), True)
+    """
+    if type(formula) == bool:
+        return not formula
+    elif type(formula) == Literal:
+        return Literal(formula.name, not formula.negated)
+    elif type(formula) == Negation:
+        return formula.child
+    else:
+        return Negation(formula)
+
+# is a formula known to be the complement of one in 'formulas' without building new nodes
+def _has_complement(formula, formulas):
+    if type(formula) == Literal:
+        return Literal(formula.name, not formula.negated) in formulas
+    elif type(formula) == Negation:
+        return formula.child in formulas
+    return False
+
+class _Pass:
+    # deterministic sort keys of all nodes seen by any pass, literals are ordered by name
+    def __init__(self):
+        self.keys = {}
+        self.parents = None
+        self._inputs = None
+
+    def run(self, formula):
+        self.parents = collections.Counter()
+        for node in iter_nodes(formula):
+            self.parents.update(children(node))
+        self._inputs = {}
+
+        return fold(formula, self.combine, self.inputs)
+
+    # get the subformulas, a node gets simplified from: nested conjunctions (disjunctions), which are not
+    # shared, are flattened into their parent, so chains of them are not copied at every level
+    def inputs(self, node):
+        if type(node) != And and type(node) != Or:
+            return children(node)
+
+        inputs = self._inputs.get(node)
+        if inputs is None:
+            inputs = self._inputs[node] = []
+            stack = list(reversed(node.children))
+            while stack:
+                child = stack.pop()
+                if type(child) == type(node) and self.parents[child] == 1:
+                    stack.extend(reversed(child.children))
+                else:
+                    inputs.append(child)
+        return inputs
+
+    def key(self, formula):
+        key = self.keys.get(formula)
+        if key is None:
+            if type(formula) == Literal:
+                key = (0, formula.name, formula.negated)
+            else:
+                digest = hashlib.blake2b(repr([self.key(child) for child in children(formula)]).encode('utf-8'),
+                                         digest_size=16).digest()
+                key = (_TYPE_RANKS[type(formula)], digest)
+            self.keys[formula] = key
+        return key
+
+    def combine(self, node, results):
+        if type(node) == Literal or type(node) == bool:
+            return node
+        elif type(node) == Negation:
+            return _negate(results[0])
+        elif type(node) == And or type(node) == Or:
+            return self.junction(type(node), results)
+        elif type(node) == Implication:
+            return self.implication(*results)
+        else:
+            return self.equivalence(*results)
+
+    def implication(self, lhs, rhs):
+        if lhs is False or rhs is True or lhs is rhs:
+            return True
+        elif lhs is True:
+            return rhs
+        elif rhs is False or _has_complement(rhs, {lhs}):
+            # a=>~a is ~a
+            return _negate(lhs)
+        return Implication(lhs, rhs)
+
+    def equivalence(self, lhs, rhs):
+        if type(lhs) == bool and type(rhs) == bool:
+            return lhs == rhs
+        elif lhs is True or rhs is True:
+            return rhs if lhs is True else lhs
+        elif lhs is False or rhs is False:
+            return _negate(rhs if lhs is False else lhs)
+        elif lhs is rhs:
+            return True
+        elif _has_complement(lhs, {rhs}):
+            return False
+
+        lhs, rhs = sorted((lhs, rhs), key=self.key)
+        return Equivalence(lhs, rhs)
+
+    def junction(self, cls, results):
+        dual = Or if cls == And else And
+        # the neutral constant (True for conjunctions) and the absorbing one
+        neutral = cls == And
+        absorbing = not neutral
+
+        # flatten, drop neutral constants, deduplicate
+        items = {}
+        for child in results:
+            if type(child) == cls:
+                items.update(dict.fromkeys(child.children))
+            elif child is absorbing:
+                return absorbing
+            elif child is not neutral:
+                items[child] = None
+
+        # literals among the children are units, compared by (name, negated) without building their complements
+        units = {(item.name, item.negated) for item in items if type(item) == Literal}
+        if any((item.name, not item.negated) in units if type(item) == Literal else
+               type(item) == Negation and item.child in items for item in items):
+            return absorbing
+
+        # unit propagation: units are fixed in the dual children
+        if units:
+            propagated = {}
+            for item in items:
+                if type(item) != dual:
+                    propagated[item] = None
+                elif any(type(child) == Literal and (child.name, child.negated) in units for child in item.children):
+                    # the unit absorbs the dual child
+                    continue
+                else:
+                    remaining = [child for child in item.children
+                                 if type(child) != Literal or (child.name, not child.negated) not in units]
+                    if not remaining:
+                        return absorbing
+                    propagated[remaining[0] if len(remaining) == 1 else dual(remaining)] = None
+            items = propagated
+
+        items = self.absorb(dual, list(items))
+        items.sort(key=self.key)
+
+        if not items:
+            return neutral
+        elif len(items) == 1:
+            return items[0]
+        return cls(items)
+
+    def absorb(self, dual, items):
+        """
+        remove the items, whose children (as dual) include all children of another item. Every other item counts
+        as its only child, so a*(a+b) is a and (a+b)*(a+b+c) is a+b.
+        """
+        if not any(type(item) == dual for item in items):
+            return items
+
+        sets = [frozenset(item.children) if type(item) == dual else frozenset((item,)) for item in items]
+        occurrences = collections.defaultdict(list)
+        for i, child_set in enumerate(sets):
+            for child in child_set:
+                occurrences[child].append(i)
+
+        # every set removes its supersets, found by the occurrences of its rarest child
+        removed = set()
+        for i in sorted(range(len(sets)), key=lambda i: len(sets[i])):
+            if i in removed or not sets[i]:
+                continue
+            subset = sets[i]
+            rarest = min(subset, key=lambda child: len(occurrences[child]))
+            for j in occurrences[rarest]:
+                if j != i and j not in removed and len(sets[j]) >= len(subset) and subset <= sets[j]:
+                    removed.add(j)
+
+        return [item for i, item in enumerate(items) if i not in removed]
+
+def simplify(formula, max_passes=None):
+    """
+    get an equivalent, simplified formula or a bool, repeating passes until a fixpoint or 'max_passes' is reached
+
+    >>> simplify(And([Literal('b'), And([Literal('a'), Literal('b')]), Or([Literal('c'), False])]))
+    And(Literal(a), Literal(b), Literal(c))
+    >>> simplify(Or([Literal('x'), Negation(Literal('x'))]))
+    True
+    >>> simplify(And([Literal('a'), Or([Literal('a', negated=True), Literal('b')]), Or([Literal('b'), Literal('c')])]))
+    And(Literal(a), Literal(b))
+    >>> simplify(Implication(And([Literal('p'), Literal('q')]), Literal('p')))
+    Implication(And(Literal(p), Literal(q)), Literal(p))
+    >>> simplify(Equivalence(Literal('a'), Negation(Negation(Literal('a', negated=True)))))
+    False
+    """
+    simplifier = _Pass()
+    passes = 0
+
+    while max_passes is None or passes < max_passes:
+        passes += 1
+        simplified = simplifier.run(formula)
+        if simplified is formula:
+            break
+        formula = simplified
+
+    return formula
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
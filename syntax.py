@@ -1,66 +1,141 @@
-class Literal:
-    def __init__(self, name, negated=False):
-        self.name = name
-        self.negated = negated
+import weakref
+
+__all__ = ['Formula', 'Literal', 'And', 'Or', 'Negation', 'Implication', 'Equivalence']
+
+# weak references to all living nodes, keyed by their type and fields
+_unique_table = {}
+
+def _remove_node(ref):
+    if _unique_table.get(ref.key) is ref:
+        del _unique_table[ref.key]
+
+class Formula:
+    """
+    Base class of all formula nodes.
+
+    Nodes are hash-consed: constructing a node, which is structurally equal to an existing one, returns the
+    existing object. Therefore nodes are immutable, equality is identity and formulas are DAGs sharing equal
+    subformulas.
+
+    >>> And([Literal('a'), Negation(Literal('b'))]) is And((Literal('a'), Negation(Literal('b'))))
+    True
+    >>> Literal('a').name = 'b'
+    Traceback (most recent call last):
+    ...
+    AttributeError: formulas are immutable
+    """
+    __slots__ = ('_hash', '__weakref__')
+
+    @classmethod
+    def _intern(cls, key, **fields):
+        # children are part of the key by identity, which is stable as long as the node is alive
+        key = (cls,) + key
+        ref = _unique_table.get(key)
+        node = ref() if ref is not None else None
+
+        if node is None:
+            node = object.__new__(cls)
+            for field_name, value in fields.items():
+                object.__setattr__(node, field_name, value)
+            object.__setattr__(node, '_hash', hash(key))
+
+            new_ref = weakref.KeyedRef(node, _remove_node, key)
+            ref = _unique_table.setdefault(key, new_ref)
+            if ref is not new_ref:
+                # another thread interned the same node in the meantime
+                node = ref() or node
+
+        return node
+
+    def __setattr__(self, name, value):
+        raise AttributeError("formulas are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("formulas are immutable")
 
     def __hash__(self):
-        return hash((self.name, self.negated))
+        return self._hash
 
     def __eq__(self, other):
-        return self.name == other.name and self.negated == other.negated and isinstance(other, Literal)
+        return self is other
+
+class Literal(Formula):
+    __slots__ = ('name', 'negated')
+
+    def __new__(cls, name, negated=False):
+        negated = bool(negated)
+        return cls._intern((name, negated), name=name, negated=negated)
+
+    def __reduce__(self):
+        return (type(self), (self.name, self.negated))
 
     def __repr__(self):
         return f"Literal({"!" if self.negated else ""}{self.name})"
 
-class And:
-    def __init__(self, children):
-        self.children = tuple(children)
+class And(Formula):
+    __slots__ = ('children',)
 
-    def __eq__(self, other):
-        return self.children == other.children and isinstance(other, And)
+    def __new__(cls, children):
+        children = tuple(children)
+        return cls._intern(tuple(map(id, children)), children=children)
+
+    def __reduce__(self):
+        return (type(self), (self.children,))
 
     def __repr__(self):
         return f"And({", ".join(map(repr, self.children))})"
 
-class Or:
-    def __init__(self, children):
-        self.children = tuple(children)
+class Or(Formula):
+    __slots__ = ('children',)
 
-    def __eq__(self, other):
-        return self.children == other.children and isinstance(other, Or)
+    def __new__(cls, children):
+        children = tuple(children)
+        return cls._intern(tuple(map(id, children)), children=children)
+
+    def __reduce__(self):
+        return (type(self), (self.children,))
 
     def __repr__(self):
         return f"Or({", ".join(map(repr, self.children))})"
 
-class Negation:
-    def __init__(self, child):
-        self.child = child
+class Negation(Formula):
+    __slots__ = ('child',)
 
-    def __eq__(self, other):
-        return self.child == other.child and isinstance(other, Negation)
+    def __new__(cls, child):
+        return cls._intern((id(child),), child=child)
+
+    def __reduce__(self):
+        return (type(self), (self.child,))
 
     def __repr__(self):
         return f"Negation({repr(self.child)})"
 
-class Implication:
-    def __init__(self, lhs, rhs):
-        self.lhs = lhs
-        self.rhs = rhs
+class Implication(Formula):
+    __slots__ = ('lhs', 'rhs')
 
-    def __eq__(self, other):
-        return self.rhs == other.rhs and self.lhs == other.lhs and isinstance(other, Implication)
+    def __new__(cls, lhs, rhs):
+        return cls._intern((id(lhs), id(rhs)), lhs=lhs, rhs=rhs)
+
+    def __reduce__(self):
+        return (type(self), (self.lhs, self.rhs))
 
     def __repr__(self):
         return f"Implication({repr(self.lhs)}, {repr(self.rhs)})"
 
-class Equivalence:
-    def __init__(self, lhs, rhs):
-        self.lhs = lhs
-        self.rhs = rhs
+class Equivalence(Formula):
+    __slots__ = ('lhs', 'rhs')
 
-    def __eq__(self, other):
-        return self.rhs == other.rhs and self.lhs == other.lhs and isinstance(other, Equivalence)
+    def __new__(cls, lhs, rhs):
+        return cls._intern((id(lhs), id(rhs)), lhs=lhs, rhs=rhs)
+
+    def __reduce__(self):
+        return (type(self), (self.lhs, self.rhs))
 
     def __repr__(self):
         return f"Equivalence({repr(self.lhs)}, {repr(self.rhs)})"
 
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+
+"""
+Non-recursive traversals of formulas.
+
+Formulas are DAGs (see syntax), so all traversals visit every distinct node
+only once and keep their state on an explicit stack, which makes them work
+for formulas of any depth.
+"""
+
+from syntax import *
+from instrumentation import stats
+
+def children(formula):
+    """
+    get the direct subformulas of a formula
+
+    >>> children(Implication(Literal('a'), Negation(Literal('b'))))
+    (Literal(a), Negation(Literal(b)))
+    """
+    if type(formula) == And or type(formula) == Or:
+        return formula.children
+    elif type(formula) == Negation:
+        return (formula.child,)
+    elif type(formula) == Implication or type(formula) == Equivalence:
+        return (formula.lhs, formula.rhs)
+    elif type(formula) == Literal or type(formula) == bool:
+        return ()
+    else:
+        raise SyntaxError("unknown formula type")
+
+def iter_nodes(root, children=children):
+    """
+    iterate over all distinct nodes reachable from 'root' in depth-first pre-order
+
+    >>> list(iter_nodes(Or([Literal('a'), And([Literal('a'), Literal('b')])])))
+    [Or(Literal(a), And(Literal(a), Literal(b))), Literal(a), And(Literal(a), Literal(b)), Literal(b)]
+    """
+    seen = {root}
+    stack = [root]
+
+    try:
+        while stack:
+            node = stack.pop()
+            yield node
+
+            for child in reversed(children(node)):
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+    finally:
+        if stats.enabled:
+            # every node seen and not on the stack anymore has been yielded
+            stats.count('nodes_visited', len(seen) - len(stack))
+
+def fold(root, combine, children=children):
+    """
+    post-order fold: 'combine(item, results)' gets called exactly once for every distinct item reachable from
+    'root' with the list of the results of its children, the result for 'root' is returned
+
+    Items can be formulas or any other hashable values, 'children' defines the edges between them.
+
+    >>> fold(Implication(Literal('a'), Or([Literal('b'), Literal('a')])), lambda node, results: 1 + sum(results))
+    5
+    """
+    results = {}
+    stack = [(root, False)]
+
+    while stack:
+        item, expanded = stack.pop()
+
+        if item in results:
+            continue
+        elif expanded:
+            results[item] = combine(item, [results[child] for child in children(item)])
+        else:
+            stack.append((item, True))
+            stack.extend((child, False) for child in reversed(children(item)) if child not in results)
+
+    if stats.enabled:
+        stats.count('nodes_visited', len(results))
+
+    return results[root]
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
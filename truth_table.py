@@ -0,0 +1,153 @@
+#!/usr/bin/python
+
+"""
+Bit-parallel truth tables for formulas.
+
+The truth table of a formula over n atoms is stored as a single integer with
+2^n bits: bit r holds the value of the formula in row r, and in row r the atom
+at position i is true iff bit i of r is set.
+"""
+
+from syntax import *
+from traversal import fold
+from instrumentation import stats
+
+def full_mask(n_atoms):
+    """
+    get the truth table of a valid formula over the given number of atoms
+
+    >>> bin(full_mask(2))
+    '0b1111'
+    """
+    return (1 << (1 << n_atoms)) - 1
+
+def column_mask(index, n_atoms):
+    """
+    get the truth table of the atom at the given position
+
+    >>> bin(column_mask(0, 2))
+    '0b1010'
+    >>> bin(column_mask(1, 2))
+    '0b1100'
+    """
+    width = 1 << index
+    period = width << 1
+    block = ((1 << width) - 1) << width
+
+    # repeat the block of 'width' zeros followed by 'width' ones across the table
+    return block * (full_mask(n_atoms) // ((1 << period) - 1))
+
+def evaluate_columns(formula, columns, full):
+    """
+    evaluate a formula bit-parallel on columns of values, given as integers keyed by atom name. 'full' is the
+    column of all true values, whose width is the number of evaluated assignments.
+
+    >>> bin(evaluate_columns(Or([Literal('a'), Literal('b', negated=True)]), {'a': 0b1010, 'b': 0b1100}, 0b1111))
+    '0b1011'
+    """
+    def table(formula, tables):
+        if type(formula) == Literal:
+            return columns[formula.name] ^ full if formula.negated else columns[formula.name]
+        elif type(formula) == bool:
+            return full if formula else 0
+        elif type(formula) == And:
+            res = full
+            for child_table in tables:
+                res &= child_table
+            return res
+        elif type(formula) == Or:
+            res = 0
+            for child_table in tables:
+                res |= child_table
+            return res
+        elif type(formula) == Negation:
+            return tables[0] ^ full
+        elif type(formula) == Implication:
+            return (tables[0] ^ full) | tables[1]
+        else:
+            return tables[0] ^ tables[1] ^ full
+
+    return fold(formula, table)
+
+class _Columns(dict):
+    # truth tables of the atoms, created when first needed
+    def __init__(self, atoms):
+        self.n_atoms = len(atoms)
+        self.positions = {name: i for i, name in enumerate(atoms)}
+
+    def __missing__(self, name):
+        column = self[name] = column_mask(self.positions[name], self.n_atoms)
+        return column
+
+def truth_table(formula, atoms):
+    """
+    get the truth table of a formula wrt. the given order of atoms
+
+    >>> bin(truth_table(Implication(Literal('a'), Literal('b')), ['a', 'b']))
+    '0b1101'
+    >>> bin(truth_table(Equivalence(Literal('a'), Negation(Literal('b'))), ['a', 'b']))
+    '0b110'
+    """
+    n_atoms = len(atoms)
+    if stats.enabled:
+        stats.count('truth_tables')
+        stats.count('truth_table_rows', 1 << n_atoms)
+
+    return evaluate_columns(formula, _Columns(atoms), full_mask(n_atoms))
+
+# indices of the set bits for every possible byte value
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+def iter_rows(table, n_atoms):
+    """
+    get the indices of all rows set in the given truth table in ascending order
+
+    >>> list(iter_rows(0b1101, 2))
+    [0, 2, 3]
+    """
+    data = table.to_bytes(((1 << n_atoms) + 7) // 8, 'little')
+
+    for byte_idx, byte in enumerate(data):
+        if byte:
+            base = byte_idx << 3
+            for bit in _BYTE_BITS[byte]:
+                yield base + bit
+
+def row_to_assignment(row, atoms, assignment_type):
+    """
+    decode a row index to an assignment of the given (namedtuple-)type
+
+    >>> from collections import namedtuple
+    >>> row_to_assignment(0b10, ['a', 'b'], namedtuple('Assignment', ['a', 'b']))
+    Assignment(a=False, b=True)
+    """
+    return assignment_type(**{name: bool(row >> i & 1) for i, name in enumerate(atoms)})
+
+def assignment_to_row(assignment, atoms):
+    """
+    encode an assignment to the index of its row
+
+    >>> from collections import namedtuple
+    >>> assignment_to_row(namedtuple('Assignment', ['a', 'b'])(a=False, b=True), ['a', 'b'])
+    2
+    """
+    return sum(1 << i for i, name in enumerate(atoms) if getattr(assignment, name))
+
+def decode_assignments(table, atoms, assignment_type):
+    """
+    get the assignments of all rows set in the given truth table
+    """
+    n = 0
+    try:
+        for row in iter_rows(table, len(atoms)):
+            n += 1
+            yield row_to_assignment(row, atoms, assignment_type)
+    finally:
+        if stats.enabled and n:
+            stats.count('assignments_materialized', n)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
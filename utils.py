@@ -1,6 +1,58 @@
 #!/usr/bin/python
 
 from syntax import *
+from truth_table import full_mask, truth_table, row_to_assignment, decode_assignments
+from formula_compiler import compile_formula, evaluate
+from traversal import fold, iter_nodes
+from clauses import VariableTable, TseitinEncoder
+from compact import rows_to_clauses, cubes_to_clauses, clauses_to_formula
+from instrumentation import stats
+import itertools
+from operator import itemgetter
+from minimize import minimize as minimal_cover
+from signatures import may_be_equivalent
+from assignment_set import AssignmentSet, encode_assignment
+
+# children of (subformula, negated)-pairs in the negative normal form
+def _nnf_children(item):
+    formula, negated = item
+
+    if type(formula) == Literal or type(formula) == bool:
+        return ()
+    elif type(formula) == And or type(formula) == Or:
+        return [(child, negated) for child in formula.children]
+    elif type(formula) == Negation:
+        return [(formula.child, not negated)]
+    elif type(formula) == Implication:
+        return [(formula.lhs, not negated), (formula.rhs, negated)]
+    elif type(formula) == Equivalence:
+        return [(formula.lhs, True), (formula.rhs, True), (formula.lhs, False), (formula.rhs, False)]
+    else:
+        raise SyntaxError("unsupported formula type")
+
+def _nnf_combine(item, children):
+    formula, negated = item
+
+    if type(formula) == Literal:
+        return Literal(formula.name, formula.negated != negated)
+    elif type(formula) == bool:
+        return formula != negated
+    elif type(formula) == And:
+        return Or(children) if negated else And(children)
+    elif type(formula) == Or:
+        return And(children) if negated else Or(children)
+    elif type(formula) == Negation:
+        return children[0]
+    elif type(formula) == Implication:
+        # a=>b is ~a+b
+        return And(children) if negated else Or(children)
+    else:
+        # a<=>b is (~a*~b)+(a*b), its negation is (a+b)*(~a+~b)
+        neg_lhs, neg_rhs, lhs, rhs = children
+        if negated:
+            return And([Or([lhs, rhs]), Or([neg_lhs, neg_rhs])])
+        else:
+            return Or([And([neg_lhs, neg_rhs]), And([lhs, rhs])])
 
 # transfrom formula to negative normal form
 def to_NNF(formula, negated=False):
@@ -10,31 +62,7 @@ def to_NNF(formula, negated=False):
     >>> to_NNF(formula)
     Or(Literal(!x_1), Or(And(Literal(α), Literal(!β)), And(Literal(!α), Literal(β))))
     """
-    if type(formula) == Literal:
-        if not negated:
-            return Literal(formula.name, formula.negated)
-        else:
-            return Literal(formula.name, not formula.negated)
-    elif type(formula) == And:
-        if not negated:
-            return And([to_NNF(child, negated=False) for child in formula.children])
-        else:
-            return Or([to_NNF(child, negated=True) for child in formula.children])
-    elif type(formula) == Or:
-        if not negated:
-            return Or([to_NNF(child, negated=False) for child in formula.children])
-        else:
-            return And([to_NNF(child, negated=True) for child in formula.children])
-    elif type(formula) == Negation:
-        return to_NNF(formula.child, negated=(not negated))
-    elif type(formula) == Implication:
-        temp_formula = Or([Negation(formula.lhs), formula.rhs])
-        return to_NNF(temp_formula, negated=negated)
-    elif type(formula) == Equivalence:
-        temp_formula = Or([And([Negation(formula.lhs), Negation(formula.rhs)]), And([formula.lhs, formula.rhs])])
-        return to_NNF(temp_formula, negated=negated)
-    else:
-        raise SyntaxError("unsupported formula type")
+    return fold((formula, negated), _nnf_combine, _nnf_children)
 
 def pos(assignment, formula, is_nnf=False):
     """
@@ -53,44 +81,30 @@ def pos(assignment, formula, is_nnf=False):
     if not is_nnf:
         formula = to_NNF(formula)
 
-    if type(formula) == Literal:
-        if getattr(assignment, formula.name) != formula.negated:
-            return {formula}
-        else:
-            return {}
-    elif type(formula) == And:
-        return {pos_lit for child in formula.children for pos_lit in pos(assignment, child)}
-    elif type(formula) == Or:
-        return {pos_lit for child in formula.children for pos_lit in pos(assignment, child)}
-    else:
-        raise SyntaxError("formula is not in NNF")
+    res = set()
+
+    for node in iter_nodes(formula):
+        if type(node) == Literal:
+            if getattr(assignment, node.name) != node.negated:
+                res.add(node)
+        elif type(node) != And and type(node) != Or:
+            raise SyntaxError("formula is not in NNF")
+
+    return res
 
 # evaluate formula on a specific assignment
 def eval_formula(assignment, formula):
     """
     evaluate a given formula wrt. the given assignment
 
+    The formula gets interpreted on its first evaluation and compiled for the fields of the assignment's type
+    on the next ones (see formula_compiler.evaluate), so repeated evaluations of the same formula are cheap.
+
     >>> eval_formula(get_assignment_type(formula)(α=True, β=False, x_1=True), formula)
     True
     """
 
-    if type(formula) == Literal:
-        return getattr(assignment, formula.name) != formula.negated
-    elif type(formula) == And:
-        return all(eval_formula(assignment, child) for child in formula.children)
-    elif type(formula) == Or:
-        return any(eval_formula(assignment, child) for child in formula.children)
-    elif type(formula) == Negation:
-        return not eval_formula(assignment, formula.child)
-    elif type(formula) == Implication:
-        if eval_formula(assignment, formula.lhs):
-            return eval_formula(assignment, formula.rhs)
-        else:
-            return True
-    elif type(formula) == Equivalence:
-        return eval_formula(assignment, formula.lhs) == eval_formula(assignment, formula.rhs)
-    else:
-        raise SyntaxError("unknown formula type")
+    return evaluate(formula, assignment, type(assignment)._fields)
 
 # get all atoms of a formula
 def get_atoms(formula, res=None):
@@ -103,20 +117,9 @@ def get_atoms(formula, res=None):
     if res is None:
         res = set()
 
-    if type(formula) == Literal:
-        res.add(formula.name)
-        return res
-    elif type(formula) == And or type(formula) == Or:
-        for child in formula.children:
-            get_atoms(child, res)
-        return res
-    elif type(formula) == Negation:
-        return get_atoms(formula.child, res)
-    elif type(formula) == Implication or type(formula) == Equivalence:
-        get_atoms(formula.lhs, res)
-        return get_atoms(formula.rhs, res)
-    else:
-        raise SyntaxError("unknown formula type")
+    res.update(node.name for node in iter_nodes(formula) if type(node) == Literal)
+
+    return res
 
 from collections import namedtuple
 
@@ -129,54 +132,128 @@ def get_assignment_type(obj):
 
     return namedtuple('Assignment', atoms, defaults=(None,)*len(atoms))
 
-# get all possible assignments of atoms in a formula
-def get_all_assignments(formula):
+# formulas with more atoms than this are decided by the SAT solver instead of truth tables
+ENUMERATION_LIMIT = 20
+
+def _use_solver(atoms):
+    return len(atoms) > ENUMERATION_LIMIT
+
+# simplify formulas (see simplify) before the checks and the normal form conversions, which do not depend on the
+# set of atoms. Atoms may get lost, e.g. in x+~x, so counts and assignments are never computed on simplified formulas.
+SIMPLIFY = False
+
+def _prepare(formula):
+    if not SIMPLIFY:
+        return formula
+
+    from simplify import simplify
+    return stats.timed('simplify', simplify, formula)
+
+# iterate over all possible assignments of atoms in a formula
+def iter_all_assignments(formula):
+    """
+    iterate lazily over all possible assignments of the atoms in the given formula
+
+    >>> list(iter_all_assignments(simple_formula))
+    [Assignment(x=False), Assignment(x=True)]
+    """
     atoms = sorted(get_atoms(formula))
 
     # construct a namedtuple-based type for Assignments
     # dicts could not be used in sets
     Assignment = get_assignment_type(atoms)
-    res = {Assignment()}
 
-    for atom in atoms:
-        new_res = set()
-        for ass in res:
-            new_res.add(ass._replace(**{atom: False}))
-            new_res.add(ass._replace(**{atom: True}))
-        res = new_res
+    if stats.enabled:
+        stats.count('assignments_materialized', 1 << len(atoms))
+
+    for row in range(1 << len(atoms)):
+        yield row_to_assignment(row, atoms, Assignment)
 
+# collect assignments into a set
+def _collect(assignments):
+    res = set(assignments)
+    if stats.enabled:
+        stats.count('set_operations', len(res))
     return res
 
-import copy
+# get all possible assignments of atoms in a formula
+def get_all_assignments(formula):
+    return _collect(iter_all_assignments(formula))
+
+# get the truth table of a formula together with the order of atoms it refers to
+def _get_truth_table(formula, atoms=None):
+    if atoms is None:
+        atoms = sorted(get_atoms(formula))
+
+    return truth_table(formula, atoms), atoms
+
+# select those of the given assignments, which evaluate the formula to the given value
+def _select_assignments(formula, all_assignments, value):
+    if not all_assignments:
+        return set()
+
+    all_assignments = list(all_assignments)
+    compiled = compile_formula(formula, type(all_assignments[0])._fields)
+    if stats.enabled:
+        stats.count('set_operations', len(all_assignments))
+
+    return {ass for ass, ass_value in zip(all_assignments, compiled.evaluate_many(all_assignments)) if ass_value == value}
+
+# iterate over the assignments to atoms of a formula, which evaluate it to true
+def iter_satisfying_assignments(formula, limit=None):
+    """
+    iterate lazily over the assignments, which satisfy the given formula, stopping after 'limit' of them
+
+    Formulas with up to ENUMERATION_LIMIT atoms are decoded from their truth table, larger ones get
+    enumerated by the CDCL solver (see sat_solver.iter_models), whose propagation prunes partial assignments
+    falsifying a clause. So the first model is available without enumerating all assignments.
+
+    >>> list(iter_satisfying_assignments(Or([Literal('a'), Literal('b')]), limit=2))
+    [Assignment(a=True, b=False), Assignment(a=False, b=True)]
+    >>> next(iter_satisfying_assignments(And([Literal('x_%d' % i) for i in range(ENUMERATION_LIMIT + 1)]))).x_0
+    True
+    """
+    atoms = sorted(get_atoms(formula))
+
+    if _use_solver(atoms):
+        import sat_solver
+        models = sat_solver.iter_models(formula)
+    else:
+        table, atoms = _get_truth_table(formula, atoms)
+        models = decode_assignments(table, atoms, get_assignment_type(atoms))
+
+    yield from itertools.islice(models, limit)
+
+# iterate over the assignments to atoms of a formula, which evaluate it to False
+def iter_violating_assignments(formula, limit=None):
+    """
+    iterate lazily over the assignments, which do not satisfy the given formula, stopping after 'limit' of them
+
+    >>> list(iter_violating_assignments(simple_formula))
+    [Assignment(x=True)]
+    """
+    return iter_satisfying_assignments(Negation(formula), limit)
 
 # get all assignments to atoms of a formula, which evaluate it to true
-def get_satisfying_assignments(formula, is_nnf=False, all_assignments=None):
+def get_satisfying_assignments(formula, is_nnf=False, all_assignments=None, jobs=1):
     """
     get a set of all assignments, which satisfy the given formula
 
+    The assignments are collected from iter_satisfying_assignments, so 'formula' does not need to be in NNF
+    and 'is_nnf' is only kept for compatibility. If 'all_assignments' is given, only those will be considered.
+    With jobs > 1 the assignments are enumerated by a pool of worker processes (see cube_and_conquer).
+
     >>> get_satisfying_assignments(simple_formula)
     {Assignment(x=False)}
     """
 
-    if all_assignments is None:
-        all_assignments = get_all_assignments(formula)
-    if not is_nnf:
-        formula = to_NNF(formula)
+    if all_assignments is not None:
+        return _select_assignments(formula, all_assignments, True)
+    elif jobs > 1:
+        import cube_and_conquer
+        return cube_and_conquer.get_satisfying_assignments(formula, jobs)
 
-    if type(formula) == Literal:
-        return {ass for ass in all_assignments if getattr(ass, formula.name) != formula.negated}
-    elif type(formula) == Or:
-        res = set()
-        for child in formula.children:
-            res |= get_satisfying_assignments(child, True, all_assignments)
-        return res
-    elif type(formula) == And:
-        res = copy.copy(all_assignments)
-        for child in formula.children:
-            res &= get_satisfying_assignments(child, True, res)
-        return res
-    else:
-        raise SyntaxError("formula is not in NNF")
+    return _collect(iter_satisfying_assignments(formula))
 
 # get all assignments to atoms of a formula, which evaluate it to False
 def get_violating_assignments(formula, is_nnf=False, all_assignments=None):
@@ -187,31 +264,62 @@ def get_violating_assignments(formula, is_nnf=False, all_assignments=None):
     {Assignment(x=True)}
     """
 
-    if all_assignments is None:
-        all_assignments = get_all_assignments(formula)
-    if not is_nnf:
-        formula = to_NNF(formula)
+    if all_assignments is not None:
+        return _select_assignments(formula, all_assignments, False)
 
-    if isinstance(formula, Literal):
-        return {ass for ass in all_assignments if getattr(ass, formula.name) == formula.negated}
-    elif isinstance(formula, Or):
-        res = copy.copy(all_assignments)
-        for child in formula.children:
-            res &= get_violating_assignments(child, True, res)
-        return res
-    elif isinstance(formula, And):
-        res = set()
-        for child in formula.children:
-            res |= get_violating_assignments(child, True, all_assignments)
-        return res
-    else:
-        raise SyntaxError("formula is not in NNF")
+    return _collect(iter_violating_assignments(formula))
+
+# find a model of a formula
+def find_model(formula):
+    """
+    get a satisfying assignment of the given formula, or None if it is unsatisfiable
+
+    >>> find_model(simple_formula)
+    Assignment(x=False)
+    >>> find_model(And([Literal('x'), Literal('x', negated=True)])) is None
+    True
+    """
+
+    return next(iter_satisfying_assignments(formula), None)
 
+# count the models of a formula
+def count_models(formula, projected_atoms=None, jobs=1):
+    """
+    get the number of satisfying assignments of the given formula without enumerating them
+
+    If 'projected_atoms' is given, the assignments to these atoms, which can be extended to a satisfying
+    assignment, are counted (see model_counter). Otherwise formulas with up to ENUMERATION_LIMIT atoms are
+    counted on their truth table, and with jobs > 1 by a pool of worker processes (see cube_and_conquer).
+
+    >>> count_models(formula)
+    6
+    >>> count_models(formula, ['α', 'β'])
+    4
+    >>> count_models(Or([Literal('x_%d' % i) for i in range(ENUMERATION_LIMIT + 1)])) == 2 ** (ENUMERATION_LIMIT + 1) - 1
+    True
+    """
+
+    atoms = sorted(get_atoms(formula))
+
+    if projected_atoms is None and jobs > 1:
+        import cube_and_conquer
+        return cube_and_conquer.count_models(formula, jobs)
+    elif projected_atoms is not None or _use_solver(atoms):
+        import model_counter
+        return model_counter.count_models(formula, projected_atoms)
+
+    table, atoms = _get_truth_table(formula, atoms)
+
+    return table.bit_count()
 
 # check, if a formula is satisfiable
-def is_satisfiable(formula):
+def is_satisfiable(formula, jobs=1, manager=None):
     """
-    check if there exists a satisfying assignment for the given formula
+    check if there exists a satisfying assignment for the given formula, stops at the first one
+
+    Formulas with more than ENUMERATION_LIMIT atoms are passed to the CDCL solver. With jobs > 1 the search
+    is split across a pool of worker processes, which stop at the first model (see cube_and_conquer). With a
+    BDD manager (see bdd) the formula is checked on its diagram instead.
 
     >>> is_satisfiable(simple_formula)
     True
@@ -219,13 +327,26 @@ def is_satisfiable(formula):
     False
     >>> is_satisfiable(And([equal_formula1, Negation(equal_formula2)]))
     False
+    >>> is_satisfiable(And([Literal('x_%d' % i) for i in range(ENUMERATION_LIMIT + 1)]))
+    True
     """
 
-    return bool(get_satisfying_assignments(formula))
+    formula = _prepare(formula)
+    if manager is not None:
+        import bdd
+        return bdd.is_satisfiable(formula, manager)
+    elif jobs > 1:
+        import cube_and_conquer
+        return cube_and_conquer.is_satisfiable(formula, jobs)
 
-def is_valid(formula):
+    return find_model(formula) is not None
+
+def is_valid(formula, jobs=1, manager=None):
     """
-    check if formula is satisfied by all possible assignments
+    check if formula is satisfied by all possible assignments, stops at the first counterexample
+
+    With jobs > 1 the counterexample is searched by a pool of worker processes (see cube_and_conquer). With a
+    BDD manager (see bdd) the formula is checked on its diagram instead.
 
     >>> is_valid(Literal('x'))
     False
@@ -235,174 +356,204 @@ def is_valid(formula):
     True
     >>> is_valid(Equivalence(Or([equal_formula1, Literal('a')]), equal_formula2))
     False
+    >>> is_valid(Equivalence(equal_formula1, equal_formula2), jobs=2)
+    True
+    >>> import bdd
+    >>> is_valid(Equivalence(equal_formula1, equal_formula2), manager=bdd.BDD())
+    True
     """
-    return not bool(get_violating_assignments(formula))
+
+    formula = _prepare(formula)
+    if manager is not None:
+        import bdd
+        return bdd.is_valid(formula, manager)
+    elif jobs > 1:
+        import cube_and_conquer
+        return cube_and_conquer.is_valid(formula, jobs)
+
+    return next(iter_violating_assignments(formula), None) is None
 
 # transform a formula to disjunctive normal form
-def to_DNF(formula):
+def to_DNF(formula, minimize=False):
     """
     convert given formula to disjunctive normal form
 
+    Without 'minimize' every satisfying assignment becomes a minterm, otherwise the terms are a small cover
+    of the satisfying assignments computed by minimize.minimize. The terms are built as integer cubes (see
+    compact) and converted to literals once.
+
     >>> to_DNF(formula)
-    Or(And(Literal(x_1), Literal(!α), Literal(β)), And(Literal(x_1), Literal(α), Literal(!β)), And(Literal(!x_1), Literal(α), Literal(!β)), And(Literal(!x_1), Literal(!α), Literal(!β)), And(Literal(!x_1), Literal(!α), Literal(β)), And(Literal(!x_1), Literal(α), Literal(β)))
+    Or(And(Literal(!x_1), Literal(!α), Literal(!β)), And(Literal(!x_1), Literal(α), Literal(!β)), And(Literal(x_1), Literal(α), Literal(!β)), And(Literal(!x_1), Literal(!α), Literal(β)), And(Literal(x_1), Literal(!α), Literal(β)), And(Literal(!x_1), Literal(α), Literal(β)))
+    >>> to_DNF(formula, minimize=True)
+    Or(And(Literal(!x_1)), And(Literal(α), Literal(!β)), And(Literal(!α), Literal(β)))
     """
 
-    satisfying_assignments = get_satisfying_assignments(formula)
+    table, atoms = _get_truth_table(_prepare(formula))
 
-    return Or([And([Literal(name, negated=(not getattr(assignment, name)))
-                    for name in assignment._fields])
-               for assignment in satisfying_assignments])
+    if minimize:
+        cubes = cubes_to_clauses(minimal_cover(table, len(atoms)), len(atoms))
+    else:
+        cubes = rows_to_clauses(table, len(atoms))
+
+    return clauses_to_formula(cubes, VariableTable(atoms), outer=Or, inner=And)
 
-def to_CNF(formula):
+def to_CNF(formula, minimize=False):
     """
     convert given formula to conjunctive normal form
 
+    Without 'minimize' every violating assignment becomes a maxterm, otherwise the clauses are the negated
+    cubes of a small cover of the violating assignments computed by minimize.minimize.
+
     >>> to_CNF(formula)
     And(Or(Literal(!x_1), Literal(α), Literal(β)), Or(Literal(!x_1), Literal(!α), Literal(!β)))
+    >>> to_CNF(Or([And([Literal('a'), Literal('b')]), And([Literal('a'), Literal('b', negated=True)])]), minimize=True)
+    And(Or(Literal(a)))
     """
-    violating_assignments = get_violating_assignments(formula)
 
-    return And([Or([Literal(name, negated=(getattr(assignment, name)))
-                    for name in assignment._fields])
-                for assignment in violating_assignments])
+    table, atoms = _get_truth_table(_prepare(formula))
+    table ^= full_mask(len(atoms))
+
+    if minimize:
+        clauses = cubes_to_clauses(minimal_cover(table, len(atoms)), len(atoms), negated=True)
+    else:
+        clauses = rows_to_clauses(table, len(atoms), negated=True)
+
+    return clauses_to_formula(clauses, VariableTable(atoms))
 
 # check equivalence of two formulas
-def are_equivalent(formula1, formula2):
+def are_equivalent(formula1, formula2, jobs=1, manager=None):
     """
     check if the given formulas are equivalent
 
+    Formulas with different random-simulation signatures (see signatures) are rejected without a search. With
+    jobs > 1 a counterexample is searched by a pool of worker processes (see cube_and_conquer). With a BDD
+    manager (see bdd) the diagrams of the formulas are compared, the manager keeps them for later checks of
+    related formulas.
+
     >>> are_equivalent(simple_formula, simple_formula_equivalent)
     True
+    >>> are_equivalent(equal_formula1, Or([equal_formula2, Literal('h')]), jobs=2)
+    False
+    >>> import bdd
+    >>> manager = bdd.BDD()
+    >>> are_equivalent(simple_formula, simple_formula_equivalent, manager=manager)
+    True
+    >>> are_equivalent(equal_formula1, equal_formula2, manager=manager)
+    True
     """
 
-    return get_satisfying_assignments(formula1) == get_satisfying_assignments(formula2)
-
-def _tseitsin_substitute(formula, helper_name_format, helper_idx):
-    if type(formula) == Literal:
-        return Literal(formula.name, formula.negated)
-    else:
-        return Literal(helper_name_format % next(helper_idx))
-
-def _tseitsin_child(connector, helper_name_format, formula, substituter, helper_idx, clauses):
-    if type(formula) == Literal:
-        clauses.append(connector(substituter, Literal(formula.name, formula.negated)))
-    elif type(formula) == Or:
-        children_substituters = [_tseitsin_substitute(child, helper_name_format, helper_idx) for child in formula.children]
-
-        clauses.append(connector(substituter, Or(children_substituters)))
-        for (child_substituter, child_formula) in zip(children_substituters, formula.children):
-            if type(child_formula) != Literal:
-                _tseitsin_child(connector, helper_name_format, child_formula, child_substituter, helper_idx, clauses)
-    elif type(formula) == And:
-        children_substituters = [_tseitsin_substitute(child, helper_name_format, helper_idx) for child in formula.children]
-
-        clauses.append(connector(substituter, And(children_substituters)))
-        for (child_substituter, child_formula) in zip(children_substituters, formula.children):
-            if type(child_formula) != Literal:
-                _tseitsin_child(connector, helper_name_format, child_formula, child_substituter, helper_idx, clauses)
-    elif type(formula) == Negation:
-        child_substituter = _tseitsin_substitute(formula.child, helper_name_format, helper_idx)
-
-        clauses.append(connector(substituter, Literal(child_substituter.name, negated=True)))
-        if type(formula.child) != Literal:
-            _tseitsin_child(connector, helper_name_format, formula.child, child_substituter, helper_idx, clauses)
-    elif type(formula) == Implication:
-        lhs_substituter = _tseitsin_substitute(formula.lhs, helper_name_format, helper_idx)
-        rhs_substituter = _tseitsin_substitute(formula.rhs, helper_name_format, helper_idx)
-
-        clauses.append(connector(substituter, Implication(lhs_substituter, rhs_substituter)))
-        if type(formula.lhs) != Literal:
-            _tseitsin_child(connector, helper_name_format, formula.lhs, lhs_substituter, helper_idx, clauses)
-        if type(formula.rhs) != Literal:
-            _tseitsin_child(connector, helper_name_format, formula.rhs, rhs_substituter, helper_idx, clauses)
-    elif type(formula) == Equivalence:
-        lhs_substituter = _tseitsin_substitute(formula.lhs, helper_name_format, helper_idx)
-        rhs_substituter = _tseitsin_substitute(formula.rhs, helper_name_format, helper_idx)
-
-        clauses.append(connector(substituter, Equivalence(lhs_substituter, rhs_substituter)))
-        if type(formula.lhs) != Literal:
-            _tseitsin_child(connector, helper_name_format, formula.lhs, lhs_substituter, helper_idx, clauses)
-        if type(formula.rhs) != Literal:
-            _tseitsin_child(connector, helper_name_format, formula.rhs, rhs_substituter, helper_idx, clauses)
+    formula1, formula2 = _prepare(formula1), _prepare(formula2)
+    if not may_be_equivalent(formula1, formula2):
+        return False
+    elif manager is not None:
+        import bdd
+        return bdd.are_equivalent(formula1, formula2, manager)
+    elif jobs > 1:
+        import cube_and_conquer
+        return cube_and_conquer.are_equivalent(formula1, formula2, jobs)
 
-    return clauses
+    # the formulas are equivalent iff their miter has no model, which would be a counterexample
+    return next(iter_satisfying_assignments(Negation(Equivalence(formula1, formula2))), None) is None
 
-def _tseitsin_toplevel(connector, helper_name_format, formula):
-    clauses = []
+def _tseitsin_toplevel(polarity_aware, helper_name_format, formula):
+    encoder = TseitinEncoder(polarity_aware=polarity_aware, helper_name_format=helper_name_format)
+    encoder.add(_prepare(formula))
 
-    import itertools
-    helper_idx = itertools.count()
-    substituter = _tseitsin_substitute(formula, helper_name_format, helper_idx)
-    clauses.append(substituter)
-
-    if type(formula) != Literal:
-        _tseitsin_child(connector, helper_name_format, formula, substituter, helper_idx, clauses)
-
-    return And(clauses)
+    to_literal = encoder.variables.to_literal
+    return And([to_literal(clause[0]) if len(clause) == 1 else Or([to_literal(lit) for lit in clause])
+                for clause in encoder.clauses])
 
 def onesided_tseitsin(formula, helper_name_format='x_%d'):
     """
-    convert formula to onesided Tseitsin encoding
+    convert formula to the onesided (Plaisted-Greenbaum) Tseitsin encoding in CNF, which is equisatisfiable
+    to the formula, see clauses.TseitinEncoder
 
     >>> onesided_tseitsin(Literal('a'))
     And(Literal(a))
     >>> onesided_tseitsin(formula, helper_name_format='t_%d')
-    And(Literal(t_0), Implication(Literal(t_0), Implication(Literal(x_1), Literal(t_1))), Implication(Literal(t_1), Literal(!t_2)), Implication(Literal(t_2), And(Literal(t_3), Literal(t_4))), Implication(Literal(t_3), Or(Literal(!α), Literal(β))), Implication(Literal(t_4), Or(Literal(α), Literal(!β))))
+    And(Or(Literal(!t_0), Literal(α)), Or(Literal(!t_0), Literal(!β)), Or(Literal(!t_1), Literal(!α)), Or(Literal(!t_1), Literal(β)), Or(Literal(t_2), Literal(t_0), Literal(t_1)), Or(Literal(!x_1), Literal(!t_2)))
     """
-    return _tseitsin_toplevel(Implication, helper_name_format, formula)
+    return _tseitsin_toplevel(True, helper_name_format, formula)
 
 def tseitsin(formula, helper_name_format='x_%d'):
     """
-    convert formula to Tseitsin encoding
+    convert formula to the Tseitsin encoding in CNF, in which every helper variable is equivalent to the
+    subformula it replaces, see clauses.TseitinEncoder
 
     >>> tseitsin(formula, helper_name_format='t_%d')
-    And(Literal(t_0), Equivalence(Literal(t_0), Implication(Literal(x_1), Literal(t_1))), Equivalence(Literal(t_1), Literal(!t_2)), Equivalence(Literal(t_2), And(Literal(t_3), Literal(t_4))), Equivalence(Literal(t_3), Or(Literal(!α), Literal(β))), Equivalence(Literal(t_4), Or(Literal(α), Literal(!β))))
+    And(Or(Literal(!t_0), Literal(α)), Or(Literal(!t_0), Literal(!β)), Or(Literal(t_0), Literal(!α), Literal(β)), Or(Literal(!t_1), Literal(!α)), Or(Literal(!t_1), Literal(β)), Or(Literal(t_1), Literal(α), Literal(!β)), Or(Literal(!t_2), Literal(!t_0)), Or(Literal(!t_2), Literal(!t_1)), Or(Literal(t_2), Literal(t_0), Literal(t_1)), Or(Literal(!x_1), Literal(!t_2)))
     """
-    return _tseitsin_toplevel(Equivalence, helper_name_format, formula)
+    return _tseitsin_toplevel(False, helper_name_format, formula)
 
 def convert_assignments(asss, new_ass_type):
     """
     map assignments of variables with the same name from one assignment type to another
 
-    If not all values of the destination type will get assigned, the namedtuple-type needs to define defaults.
+    Fields of the destination type, which are missing in the old assignment type, get the defaults of the
+    destination type. If they have none, a TypeError is raised.
 
     >>> convert_assignments({namedtuple('Assignment', ['x', 'y'])(True, False)}, namedtuple('Assignment', ['x', 'z'], defaults=(None,)*2))
     {Assignment(x=True, z=None)}
+    >>> convert_assignments({namedtuple('Assignment', ['x', 'y'])(True, False)}, namedtuple('B', ['x', 'z'], defaults=(False,)*2))
+    {B(x=True, z=False)}
+    >>> convert_assignments({namedtuple('Assignment', ['x', 'y'])(True, False)}, namedtuple('C', ['x', 'z']))
+    Traceback (most recent call last):
+    ...
+    TypeError: fields without values or defaults: z
     """
 
     if not asss:
         return set()
 
-    old_ass_type = type(next(iter(asss)))
-    fields_to_copy = set(old_ass_type._fields).intersection(new_ass_type._fields)
-
-    return {new_ass_type(**{field_name:getattr(ass, field_name) for field_name in fields_to_copy}) for ass in asss}
+    old_fields = type(next(iter(asss)))._fields
+    if stats.enabled:
+        stats.count('set_operations', len(asss))
+        stats.count('assignments_materialized', len(asss))
+
+    # missing fields are taken from their defaults appended to every assignment
+    old_positions = {field_name: i for i, field_name in enumerate(old_fields)}
+    missing = [field_name for field_name in new_ass_type._fields if field_name not in old_positions]
+    defaults = new_ass_type._field_defaults
+    without_defaults = [field_name for field_name in missing if field_name not in defaults]
+    if without_defaults:
+        raise TypeError(f"fields without values or defaults: {', '.join(without_defaults)}")
+
+    old_positions.update((field_name, len(old_fields) + i) for i, field_name in enumerate(missing))
+    positions = [old_positions[field_name] for field_name in new_ass_type._fields]
+    make = new_ass_type._make
+    padding = tuple(defaults[field_name] for field_name in missing)
+
+    if not positions:
+        return {make(())}
+    elif len(positions) == 1:
+        position = positions[0]
+        return {make(((ass + padding)[position],)) for ass in asss}
+
+    pick = itemgetter(*positions)
+    return {make(pick(ass + padding)) for ass in asss}
 
 def filter_assignments(asss, constrs):
     """
     return only those assignments, which have identical values for all assigned values in an element of 'constrs'. Elements with value 'None' count as unassigned.
 
+    The assignments are indexed by the values of the variables assigned by the constraints, so every
+    constraint is a lookup instead of a comparison with every assignment.
+
     >>> Assg = namedtuple('Assignment', ['x', 'z'], defaults=(None,)*2)
     >>> filter_assignments({Assg(x=True, z=False), Assg(x=False, z=True), Assg(x=True, z=True)}, [Assg(x=True)])
     {Assignment(x=True, z=False), Assignment(x=True, z=True)}
+    >>> filter_assignments({Assg(x=True, z=False)}, [namedtuple('Assignment', ['z'])(False)])
+    {Assignment(x=True, z=False)}
     """
 
     if not asss or not constrs:
         return set()
 
-    target_type = type(next(iter(constrs)))
-
-    if target_type != type(next(iter(constrs))):
-        constrs = convert_assignments(constrs, target_type)
+    # the masks of distinct assignments of the same type are distinct, so the originals can be returned
+    originals = {encode_assignment(ass): ass for ass in asss}
+    assignments = AssignmentSet(type(next(iter(asss)))._fields, originals)
 
-    res = set()
-
-    for constr in constrs:
-        for ass in asss:
-            if all(getattr(constr, field_name) == getattr(ass, field_name) for field_name in constr._fields if getattr(constr, field_name) is not None):
-                res.add(ass)
-
-    return res
+    return {originals[masks] for masks in assignments.filter(AssignmentSet.from_assignments(constrs))}
 
 
 if __name__ == '__main__':